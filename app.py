@@ -6,11 +6,21 @@ import random
 from functools import wraps
 import os
 import json
+import csv
 import time
+import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bisect
+import hashlib
+import itertools
+from array import array
+from collections import deque
 from googleapiclient.discovery import build
 from google.oauth2.service_account import Credentials as ServiceAccountCredentials
 from openpyxl import load_workbook
 from google.oauth2.service_account import Credentials
+from bulk_db import bulk_executemany, bulk_import
 
 # --- FLASK APP ---
 
@@ -22,46 +32,22 @@ app.secret_key = "supersecretkey"  # needed for session
 def debug_attendance_status(rollno):
     conn_local = sqlite3.connect('school.db')
     cur = conn_local.cursor()
-    cur.execute("SELECT date, status FROM attendance WHERE rollno=? ORDER BY date", (rollno,))
+    cur.execute(f"SELECT date, status_code, status_raw FROM {attendance_source()} WHERE rollno=? ORDER BY date_iso, date", (rollno,))
     records = cur.fetchall()
+    stats = get_attendance_stats(cur, "rollno = ?", (rollno,)).get(rollno) or _empty_attendance_stats()
     conn_local.close()
-    
-    # Calculate attendance stats with the new logic
-    def present_status(s):
-        if not s or not s.strip():
-            return False
-    status = s.strip().upper()
-    # Normalize some noisy variations
-    if status in ('1', 'YES', 'Y', 'PRESENT', 'P'):
-        return True
-    return False
-    
-    def absent_status(s):
-        if not s or not s.strip():
-            return False
-    status = s.strip().upper()
-    if status in ('0', 'NO', 'N', 'ABSENT', 'A'):
-        return True
-    return False
-    
-    def valid_status(s):
-        return s and s.strip() != ''
-    
-    total_days = sum(1 for record in records if valid_status(record[1]))
-    present_days = sum(1 for record in records if present_status(record[1]))
-    absent_days = sum(1 for record in records if absent_status(record[1]))
-    
+
     return jsonify({
         "rollno": rollno,
         "attendance_records": [
-            {"date": r[0], "status": r[1]} for r in records
+            {"date": r[0], "status": attendance_status_label(r[1], r[2]), "status_code": r[1]} for r in records
         ],
         "total_records": len(records),
         "calculated_stats": {
-            "total_days": total_days,
-            "present_days": present_days,
-            "absent_days": absent_days,
-            "attendance_percentage": round((present_days / total_days * 100) if total_days > 0 else 0, 2)
+            "total_days": stats["total_days"],
+            "present_days": stats["present_days"],
+            "absent_days": stats["absent_days"],
+            "attendance_percentage": stats["attendance_average"]
         }
     })
 
@@ -70,11 +56,11 @@ def debug_attendance_status(rollno):
 def debug_attendance_statuses():
     conn_local = sqlite3.connect('school.db')
     cur = conn_local.cursor()
-    cur.execute("SELECT DISTINCT status FROM attendance WHERE status IS NOT NULL AND status != ''")
+    cur.execute(f"SELECT DISTINCT status_code, status_raw FROM {attendance_source()} WHERE status_code != {STATUS_BLANK}")
     records = cur.fetchall()
     conn_local.close()
     
-    unique_statuses = [r[0] for r in records]
+    unique_statuses = list({attendance_status_label(code, raw) for code, raw in records})
     return jsonify({
         "unique_statuses": sorted(unique_statuses),
         "count": len(unique_statuses)
@@ -83,41 +69,747 @@ def debug_attendance_statuses():
 # --- DATABASE SETUP ---
 conn = sqlite3.connect('school.db', check_same_thread=False)
 c = conn.cursor()
+
+# Syncs read and write through their own connection: `conn`/`c` belong to the request
+# handlers, and an import's transaction must never be committed or rolled back by them
+SYNC_DB_TIMEOUT_SECONDS = float(os.environ.get("SYNC_DB_TIMEOUT_SECONDS", "30"))
+_sync_conn = None
+_sync_conn_lock = threading.Lock()
+
+def get_sync_connection():
+    """The sync jobs' connection, opened on first use in WAL mode so request handlers
+    keep reading while an import writes. Syncs hold _sync_lock, one at a time."""
+    global _sync_conn
+    with _sync_conn_lock:
+        if _sync_conn is None:
+            db = sqlite3.connect('school.db', timeout=SYNC_DB_TIMEOUT_SECONDS, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            _sync_conn = db
+    return _sync_conn
+
+# -------------------------------
+# Attendance aggregation
+# -------------------------------
+# Attendance statuses are stored as small integer codes (attendance.status_code).
+# Values outside the vocabulary are stored as STATUS_UNKNOWN with the original
+# text kept in attendance.status_raw.
+STATUS_BLANK = 0
+STATUS_PRESENT = 1
+STATUS_ABSENT = 2
+STATUS_OD = 3
+STATUS_LEAVE = 4
+STATUS_HOLIDAY = 5
+STATUS_UNKNOWN = 6
+
+# code -> (label, counts as a working day)
+ATTENDANCE_STATUS_CODES = {
+    STATUS_BLANK: ('', False),
+    STATUS_PRESENT: ('P', True),
+    STATUS_ABSENT: ('A', True),
+    STATUS_OD: ('OD', True),
+    STATUS_LEAVE: ('L', True),
+    STATUS_HOLIDAY: ('H', False),
+    STATUS_UNKNOWN: ('?', True),
+}
+WORKING_DAY_CODES = tuple(code for code, (_, working) in ATTENDANCE_STATUS_CODES.items() if working)
+
+# Default vocabulary (upper-cased sheet value -> code); seeded into attendance_status_vocab
+DEFAULT_ATTENDANCE_STATUS_VOCAB = {
+    '': STATUS_BLANK,
+    'P': STATUS_PRESENT, 'PRESENT': STATUS_PRESENT, '1': STATUS_PRESENT, 'YES': STATUS_PRESENT, 'Y': STATUS_PRESENT,
+    'A': STATUS_ABSENT, 'ABSENT': STATUS_ABSENT, '0': STATUS_ABSENT, 'NO': STATUS_ABSENT, 'N': STATUS_ABSENT,
+    'OD': STATUS_OD, 'ON DUTY': STATUS_OD,
+    'L': STATUS_LEAVE, 'LEAVE': STATUS_LEAVE,
+    'H': STATUS_HOLIDAY, 'HOLIDAY': STATUS_HOLIDAY,
+}
+_attendance_status_vocab = dict(DEFAULT_ATTENDANCE_STATUS_VOCAB)
+
+def normalize_attendance_status(value):
+    """Map a raw sheet cell to (status_code, status_raw). status_raw is only kept
+    for values outside the vocabulary."""
+    raw = '' if value is None else str(value).strip()
+    code = _attendance_status_vocab.get(raw.upper())
+    if code is None:
+        return STATUS_UNKNOWN, raw
+    return code, None
+
+def attendance_status_label(code, raw=None) -> str:
+    """Display label for a stored status (the raw text for unknown values)."""
+    if code == STATUS_UNKNOWN and raw:
+        return raw
+    return ATTENDANCE_STATUS_CODES.get(code, ('', False))[0]
+
+def _sql_in_list(values) -> str:
+    return ", ".join(str(int(v)) for v in values)
+
+def _empty_attendance_stats() -> dict:
+    return {"total_days": 0, "present_days": 0, "absent_days": 0, "attendance_average": 0}
+
+def _students_where_sql(where: str) -> str:
+    """Turn a WHERE clause over the students table into a predicate on attendance.rollno."""
+    return f"rollno IN (SELECT rollno FROM students WHERE {where})"
+
+# The cells every stats path (summary, matrix, prefix sums) counts: date columns only.
+# A sheet's non-date columns (name, branch) are stored as cells too, with a NULL date_iso.
+ATTENDANCE_COUNTED_CELLS = "date_iso IS NOT NULL"
+
+def _attendance_stats_sql(where=None) -> str:
+    """SELECT rollno, total_days, present_days, absent_days, last_date grouped by rollno,
+    over ATTENDANCE_COUNTED_CELLS."""
+    return f"""
+        SELECT rollno,
+               SUM(status_code IN ({_sql_in_list(WORKING_DAY_CODES)})) AS total_days,
+               SUM(status_code = {STATUS_PRESENT}) AS present_days,
+               SUM(status_code = {STATUS_ABSENT}) AS absent_days,
+               MAX(date_iso) AS last_date
+        FROM {attendance_source()}
+        WHERE {ATTENDANCE_COUNTED_CELLS} {f"AND ({where})" if where else ""}
+        GROUP BY rollno
+    """
+
+def get_attendance_stats(cur, where=None, params=()) -> dict:
+    """Compute total/present/absent/percentage per rollno in a single GROUP BY pass.
+
+    `where` is an optional predicate over the attendance table (e.g. "rollno = ?" or
+    the output of _students_where_sql). Codes in WORKING_DAY_CODES count as working days.
+    Returns {rollno: stats}; students without attendance rows are absent from the dict.
+    """
+    cur.execute(_attendance_stats_sql(where), tuple(params))
+    stats = {}
+    for rollno, total_days, present_days, absent_days, _last_date in cur.fetchall():
+        total_days = int(total_days or 0)
+        present_days = int(present_days or 0)
+        stats[rollno] = {
+            "total_days": total_days,
+            "present_days": present_days,
+            "absent_days": int(absent_days or 0),
+            "attendance_average": round((present_days / total_days * 100) if total_days > 0 else 0, 2)
+        }
+    return stats
+
+def refresh_attendance_summary(cur, rollnos=None):
+    """Recompute attendance_summary rows from the attendance table.
+
+    With `rollnos` only those students are recomputed (a sync passes the students
+    whose cells changed); without it the whole summary is rebuilt.
+    """
+    upsert = """
+        INSERT OR REPLACE INTO attendance_summary (rollno, total_days, present_days, absent_days, last_date, pct)
+        SELECT rollno, total_days, present_days, absent_days, last_date,
+               ROUND(CASE WHEN total_days > 0 THEN present_days * 100.0 / total_days ELSE 0 END, 2)
+        FROM ({})
+    """
+    if rollnos is None:
+        cur.execute("DELETE FROM attendance_summary")
+        cur.execute(upsert.format(_attendance_stats_sql()))
+        return
+    rollnos = list(rollnos)
+    # Chunk to stay under SQLite's bound-parameter limit
+    for i in range(0, len(rollnos), 500):
+        chunk = rollnos[i:i + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        # Students that lost all their cells drop out of the summary
+        cur.execute(f"DELETE FROM attendance_summary WHERE rollno IN ({placeholders})", chunk)
+        cur.execute(upsert.format(_attendance_stats_sql(f"rollno IN ({placeholders})")), chunk)
+
+def _dept_daily_rollup_sql(days_where=None) -> str:
+    """INSERT ... SELECT of dept_daily_rollup rows, optionally limited by a predicate on a.date_iso."""
+    return f"""
+        INSERT INTO dept_daily_rollup (dept, day, present, absent, blank)
+        SELECT s.dept, a.date_iso,
+               SUM(a.status_code = {STATUS_PRESENT}),
+               SUM(a.status_code = {STATUS_ABSENT}),
+               SUM(a.status_code = {STATUS_BLANK})
+        FROM {attendance_source()} a
+        JOIN (
+            SELECT rollno, {_department_case_sql()} AS dept
+            FROM students
+        ) s ON s.rollno = a.rollno
+        WHERE a.date_iso IS NOT NULL {"AND " + days_where if days_where else ""}
+        GROUP BY s.dept, a.date_iso
+    """
+
+def refresh_dept_daily_rollup(cur, days=None):
+    """Recompute dept_daily_rollup: present/absent/blank counts per department per day.
+
+    With `days` (ISO dates) only those days are recomputed, and an empty `days` is a
+    no-op; without it the whole rollup is rebuilt (used after department changes)."""
+    if days is None:
+        cur.execute("DELETE FROM dept_daily_rollup")
+        cur.execute(_dept_daily_rollup_sql())
+        return
+    for chunk in _chunks(day for day in days if day):
+        placeholders = ", ".join("?" for _ in chunk)
+        cur.execute(f"DELETE FROM dept_daily_rollup WHERE day IN ({placeholders})", chunk)
+        cur.execute(_dept_daily_rollup_sql(f"a.date_iso IN ({placeholders})"), chunk)
+
+def get_attendance_summary(cur, where=None, params=()) -> dict:
+    """Read precomputed per-student stats from attendance_summary.
+
+    Same return shape as get_attendance_stats (plus last_date); `where` is a
+    predicate over attendance_summary.rollno.
+    """
+    cur.execute(
+        "SELECT rollno, total_days, present_days, absent_days, last_date, pct FROM attendance_summary"
+        + (f" WHERE {where}" if where else ""),
+        tuple(params)
+    )
+    return {
+        rollno: {
+            "total_days": total_days or 0,
+            "present_days": present_days or 0,
+            "absent_days": absent_days or 0,
+            "attendance_average": pct or 0,
+            "last_date": last_date
+        }
+        for rollno, total_days, present_days, absent_days, last_date, pct in cur.fetchall()
+    }
+
+def _attendance_average_entry(student, stats_by_rollno) -> dict:
+    """Row shape shared by the *_all_students_attendance_averages endpoints.
+    `student` is (id, name, rollno, reg_no, current_semester)."""
+    student_id, name, rollno, reg_no, student_class = student
+    return {
+        "student_id": student_id,
+        "name": name,
+        "rollno": rollno,
+        "reg_no": reg_no,
+        "class": student_class,
+        **(stats_by_rollno.get(rollno) or _empty_attendance_stats())
+    }
+
+def resolve_daily_absent(cur, target_date, student_where=None, params=(), include_no_record=True) -> list:
+    """Students absent on `target_date` in one LEFT JOIN over students x attendance.
+    With include_no_record, students without a cell for that date are reported too."""
+    where_sql = f"WHERE {student_where}" if student_where else ""
+    having = "absent = 1 OR records = 0" if include_no_record else "absent = 1"
+    cur.execute(f"""
+        SELECT s.rollno, s.name, s.current_semester,
+               COUNT(a.rollno) AS records,
+               MAX(a.status_code = {STATUS_ABSENT}) AS absent
+        FROM students s
+        LEFT JOIN {attendance_source()} a ON a.rollno = s.rollno AND a.date_iso = ?
+        {where_sql}
+        GROUP BY s.id
+        HAVING {having}
+        ORDER BY s.id
+    """, (target_date, *params))
+    return [
+        {
+            "rollno": rollno,
+            "name": name,
+            "class": current_semester,
+            "status": "Absent" if records else "No record"
+        }
+        for rollno, name, current_semester, records, absent in cur.fetchall()
+    ]
+
+# -------------------------------
+# Attendance storage
+# -------------------------------
+# 'row'    : one attendance row per (rollno, date) cell (default)
+# 'packed' : one attendance_packed row per student per term; its `codes` BLOB holds one
+#            ASCII digit per day of the term (' ' for no cell) and attendance_dates maps
+#            each date_iso to its (term, col) slot. Readers select from the
+#            attendance_cells view, which unpacks the BLOBs back into cells.
+ATTENDANCE_STORAGE = os.environ.get("ATTENDANCE_STORAGE", "row").strip().lower()
+PACKED_NO_CELL = b' '
+
+def attendance_source() -> str:
+    """Table or view that attendance readers select cells from."""
+    return "attendance_cells" if ATTENDANCE_STORAGE == "packed" else "attendance"
+
+def _attendance_term(date_iso: str) -> str:
+    """Half-year term of a date, e.g. '2025-2' for July-December 2025."""
+    return f"{date_iso[:4]}-{1 if date_iso[5:7] <= '06' else 2}"
+
+# Two interchangeable index name sets: a shadow table is indexed under whichever set
+# the live attendance table is not using, so both can be fully indexed at once
+_ATTENDANCE_INDEX_NAMES = (
+    ("idx_attendance_rollno_date_code", "idx_attendance_date"),
+    ("idx_attendance_rollno_date_code_b", "idx_attendance_date_b"),
+)
+ATTENDANCE_FULL_RELOAD_RATIO = float(os.environ.get("ATTENDANCE_FULL_RELOAD_RATIO", "0.5"))
+
+def _attendance_index_names(cur, table) -> set:
+    cur.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=?", (table,))
+    return {row[0] for row in cur.fetchall()}
+
+def _create_attendance_indexes(cur, table, names):
+    rollno_index, date_index = names
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {rollno_index} ON {table} (rollno, date_iso, status_code)")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {date_index} ON {table} (date_iso)")
+
+def _reload_attendance_table(cur, cells):
+    """Full reload for row storage: fill attendance_next and build its indexes beside the
+    live table, then swap it in with DROP + RENAME. Everything runs in the caller's
+    transaction, so readers keep seeing the previous complete table until the caller
+    commits, and a rollback leaves the live table untouched."""
+    if not cur.connection.in_transaction:
+        cur.execute("BEGIN")  # sqlite3 does not open a transaction before DDL by itself
+    cur.execute("DROP TABLE IF EXISTS attendance_next")
+    cur.execute('''
+    CREATE TABLE attendance_next (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        rollno TEXT,
+        reg_no TEXT,
+        date TEXT,
+        date_iso TEXT,
+        status TEXT,
+        status_code INTEGER,
+        status_raw TEXT
+    )
+    ''')
+    bulk_executemany(
+        cur,
+        "INSERT INTO attendance_next (rollno, date, date_iso, status_code, status_raw) VALUES (?, ?, ?, ?, ?)",
+        cells
+    )
+    live_indexes = _attendance_index_names(cur, "attendance")
+    names = next(
+        (names for names in _ATTENDANCE_INDEX_NAMES if not set(names) & live_indexes),
+        _ATTENDANCE_INDEX_NAMES[0]
+    )
+    _create_attendance_indexes(cur, "attendance_next", names)
+    cur.execute("DROP TABLE attendance")
+    cur.execute("ALTER TABLE attendance_next RENAME TO attendance")
+
+def _packed_date_slots(cells):
+    """Date dictionary for `cells`: ({date_iso: label}, {date_iso: (term, col)}, {term: width}).
+    Each term's dates get consecutive columns in date order."""
+    labels = {}
+    for _rollno, date_label, date_iso, _code, _raw in cells:
+        if date_iso:
+            labels.setdefault(date_iso, date_label)
+    slots = {}
+    term_width = {}
+    for date_iso in sorted(labels):
+        term = _attendance_term(date_iso)
+        slots[date_iso] = (term, term_width.get(term, 0))
+        term_width[term] = term_width.get(term, 0) + 1
+    return labels, slots, term_width
+
+def _write_packed_rows(cur, cells, slots, term_width):
+    """Insert attendance_packed/_raw rows for `cells` (callers delete the old rows first)."""
+    packed = {}
+    raws = []
+    for rollno, _date_label, date_iso, status_code, status_raw in cells:
+        if not date_iso:
+            continue  # non-date columns have no slot in the date dictionary
+        term, col = slots[date_iso]
+        codes = packed.get((rollno, term))
+        if codes is None:
+            codes = packed[(rollno, term)] = bytearray(PACKED_NO_CELL * term_width[term])
+        codes[col] = ord('0') + status_code  # status codes are single digits
+        if status_raw is not None:
+            raws.append((rollno, date_iso, status_raw))
+    bulk_executemany(
+        cur,
+        "INSERT INTO attendance_packed (rollno, term, codes) VALUES (?, ?, ?)",
+        ((rollno, term, bytes(codes)) for (rollno, term), codes in packed.items())
+    )
+    bulk_executemany(cur, "INSERT OR REPLACE INTO attendance_packed_raw (rollno, date_iso, raw) VALUES (?, ?, ?)", raws)
+
+def write_attendance_cells(cur, cells):
+    """Replace every stored cell with `cells`, a list of
+    (rollno, date_label, date_iso, status_code, status_raw). Does not commit."""
+    if ATTENDANCE_STORAGE != "packed":
+        _reload_attendance_table(cur, cells)
+        return
+    labels, slots, term_width = _packed_date_slots(cells)
+    cur.execute("DELETE FROM attendance_packed")
+    cur.execute("DELETE FROM attendance_packed_raw")
+    cur.execute("DELETE FROM attendance_dates")
+    cur.executemany(
+        "INSERT INTO attendance_dates (date_iso, label, term, col) VALUES (?, ?, ?, ?)",
+        [(date_iso, labels[date_iso], term, col) for date_iso, (term, col) in slots.items()]
+    )
+    _write_packed_rows(cur, cells, slots, term_width)
+
+def _attendance_row_digest(row_cells: dict) -> str:
+    """Content hash of one student's cells ({date_label: (date_iso, status_code, status_raw)})."""
+    return hashlib.sha1(repr(sorted(row_cells.items())).encode('utf-8')).hexdigest()
+
+def _chunks(values, size=500):
+    """Split a list to stay under SQLite's bound-parameter limit."""
+    values = list(values)
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+def sync_attendance_cells(cur, cells) -> dict:
+    """Bring stored attendance in line with `cells` by touching only what changed.
+
+    Students whose row digest (attendance_row_hashes) matches are skipped; for the rest
+    the stored cells are diffed per (rollno, date) and only inserted, updated or
+    deleted cells are written. Does not commit. Returns the counts plus the sets of
+    changed rollnos under "changed" and of their changed dates under "days"."""
+    if ATTENDANCE_STORAGE == "packed":
+        cells = [cell for cell in cells if cell[2]]  # packed storage only keeps date columns
+    new_rows = {}
+    duplicates = []
+    for rollno, date_label, date_iso, status_code, status_raw in cells:
+        row_cells = new_rows.setdefault(rollno, {})
+        if date_label in row_cells:
+            duplicates.append((rollno, date_label))
+        row_cells[date_label] = (date_iso, status_code, status_raw)
+    if duplicates:
+        # A repeated date header, or a roll number listed in two merged sheets
+        print(f"[WARNING] {len(duplicates)} attendance cells repeat a (roll number, date) pair; "
+              f"the last value wins. First ones: {duplicates[:5]}")
+    new_digests = {rollno: _attendance_row_digest(row_cells) for rollno, row_cells in new_rows.items()}
+
+    source = attendance_source()
+    cur.execute("SELECT rollno, digest FROM attendance_row_hashes")
+    stored_digests = dict(cur.fetchall())
+    cur.execute(f"SELECT DISTINCT rollno FROM {source}")
+    stored_rollnos = {row[0] for row in cur.fetchall()}
+    changed = {rollno for rollno, digest in new_digests.items() if stored_digests.get(rollno) != digest}
+    changed |= stored_rollnos - set(new_rows)
+
+    old_rows = {}
+    for chunk in _chunks(changed):
+        placeholders = ", ".join("?" for _ in chunk)
+        cur.execute(
+            f"SELECT rollno, date, date_iso, status_code, status_raw FROM {source} WHERE rollno IN ({placeholders})",
+            chunk
+        )
+        for rollno, date_label, date_iso, status_code, status_raw in cur.fetchall():
+            old_rows.setdefault(rollno, {})[date_label] = (date_iso, status_code, status_raw)
+
+    inserts, updates, deletes = [], [], []
+    for rollno in changed:
+        old_cells = old_rows.get(rollno, {})
+        new_cells = new_rows.get(rollno, {})
+        for date_label, value in new_cells.items():
+            if date_label not in old_cells:
+                inserts.append((rollno, date_label) + value)
+            elif old_cells[date_label] != value:
+                updates.append(value + (rollno, date_label))
+        deletes.extend((rollno, date_label) for date_label in old_cells if date_label not in new_cells)
+    # Students re-checked only because their digest was missing are not really changed
+    changed = {rollno for rollno in changed if old_rows.get(rollno, {}) != new_rows.get(rollno, {})}
+    days = {cell[2] for cell in inserts} | {update[0] for update in updates}
+    days |= {old_rows[rollno][date_label][0] for rollno, date_label in deletes}
+    days.discard(None)
+
+    touched = len(inserts) + len(updates) + len(deletes)
+    if ATTENDANCE_STORAGE != "packed" and (
+        not stored_rollnos or touched > ATTENDANCE_FULL_RELOAD_RATIO * max(len(cells), 1)
+    ):
+        # First import or a mostly rewritten sheet: reload through a shadow table
+        _reload_attendance_table(cur, [
+            (rollno, date_label) + value
+            for rollno, row_cells in new_rows.items()
+            for date_label, value in row_cells.items()
+        ])
+    elif ATTENDANCE_STORAGE != "packed":
+        bulk_executemany(
+            cur,
+            "INSERT INTO attendance (rollno, date, date_iso, status_code, status_raw) VALUES (?, ?, ?, ?, ?)",
+            inserts
+        )
+        bulk_executemany(
+            cur,
+            "UPDATE attendance SET date_iso=?, status_code=?, status_raw=? WHERE rollno=? AND date=?",
+            updates
+        )
+        bulk_executemany(cur, "DELETE FROM attendance WHERE rollno=? AND date=?", deletes)
+    else:
+        labels, slots, term_width = _packed_date_slots(cells)
+        cur.execute("SELECT date_iso, label, term, col FROM attendance_dates")
+        stored_slots = {date_iso: (label, term, col) for date_iso, label, term, col in cur.fetchall()}
+        if stored_slots != {d: (labels[d],) + slots[d] for d in slots}:
+            # Columns moved (a date was added or removed): repack everyone
+            write_attendance_cells(cur, cells)
+        else:
+            for chunk in _chunks(changed):
+                placeholders = ", ".join("?" for _ in chunk)
+                cur.execute(f"DELETE FROM attendance_packed WHERE rollno IN ({placeholders})", chunk)
+                cur.execute(f"DELETE FROM attendance_packed_raw WHERE rollno IN ({placeholders})", chunk)
+            _write_packed_rows(cur, [cell for cell in cells if cell[0] in changed], slots, term_width)
+
+    removed = [rollno for rollno in stored_digests if rollno not in new_rows]
+    for chunk in _chunks(removed):
+        placeholders = ", ".join("?" for _ in chunk)
+        cur.execute(f"DELETE FROM attendance_row_hashes WHERE rollno IN ({placeholders})", chunk)
+    cur.executemany(
+        "INSERT OR REPLACE INTO attendance_row_hashes (rollno, digest) VALUES (?, ?)",
+        [(rollno, digest) for rollno, digest in new_digests.items() if stored_digests.get(rollno) != digest]
+    )
+    return {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "deleted": len(deletes),
+        "changed": changed,
+        "days": days,
+        "duplicates": len(duplicates)
+    }
+
+# -------------------------------
+# In-memory attendance matrix
+# -------------------------------
+# Optional read path for the dashboards: one byte per (student, date) cell holding the
+# status code, rows ordered by rollno and columns by get_attendance_dates(). Rebuilt
+# after every attendance sync and swapped in with a single assignment.
+ATTENDANCE_MATRIX_ENABLED = os.environ.get("ATTENDANCE_MATRIX", "0") in ("1", "true", "True")
+MATRIX_NO_CELL = 0xFF  # (student, date) pair with no attendance row
+
+_attendance_matrix = None
+# Held while rebuilding, so requests arriving after a sync wait for one rebuild
+_attendance_matrix_lock = threading.Lock()
+
+def build_attendance_matrix(cur) -> dict:
+    """Pack the attendance table into a rollno x date bytearray."""
+    version = _attendance_sync_version
+    source = attendance_source()
+    cur.execute(f"SELECT DISTINCT date_iso FROM {source} WHERE {ATTENDANCE_COUNTED_CELLS} ORDER BY date_iso")
+    dates = [row[0] for row in cur.fetchall()]
+    cur.execute(f"SELECT DISTINCT rollno FROM {source} WHERE {ATTENDANCE_COUNTED_CELLS} ORDER BY rollno")
+    rollnos = [row[0] for row in cur.fetchall()]
+    col_of = {date_iso: j for j, date_iso in enumerate(dates)}
+    row_of = {rollno: i for i, rollno in enumerate(rollnos)}
+    width = len(dates)
+    cells = bytearray([MATRIX_NO_CELL]) * (len(rollnos) * width)
+    cur.execute(f"SELECT rollno, date_iso, status_code FROM {source} WHERE {ATTENDANCE_COUNTED_CELLS}")
+    for rollno, date_iso, status_code in cur.fetchall():
+        cells[row_of[rollno] * width + col_of[date_iso]] = status_code or STATUS_BLANK
+    return {
+        "version": version,
+        "dates": dates,
+        "rollnos": rollnos,
+        "row_of": row_of,
+        "col_of": col_of,
+        "width": width,
+        "cells": cells
+    }
+
+def rebuild_attendance_matrix():
+    """Rebuild the matrix from school.db and publish it (no-op unless enabled)."""
+    global _attendance_matrix
+    if not ATTENDANCE_MATRIX_ENABLED:
+        return None
+    conn_local = sqlite3.connect('school.db')
+    try:
+        matrix = build_attendance_matrix(conn_local.cursor())
+    finally:
+        conn_local.close()
+    _attendance_matrix = matrix
+    print(f"[DEBUG] Attendance matrix rebuilt: {len(matrix['rollnos'])} students x {matrix['width']} dates")
+    return matrix
+
+def get_attendance_matrix():
+    """Current matrix, rebuilt if a sync happened since it was built; None when disabled."""
+    if not ATTENDANCE_MATRIX_ENABLED:
+        return None
+    matrix = _attendance_matrix
+    if matrix is None or matrix["version"] != _attendance_sync_version:
+        with _attendance_matrix_lock:
+            matrix = _attendance_matrix
+            if matrix is None or matrix["version"] != _attendance_sync_version:
+                try:
+                    matrix = rebuild_attendance_matrix()
+                except Exception as e:
+                    print(f"[ERROR] Attendance matrix rebuild failed: {e}")
+                    return None
+    return matrix
+
+_MATRIX_WORKING_CODES = [bytes([code]) for code in WORKING_DAY_CODES]
+
+def _matrix_row_stats(matrix, i) -> dict:
+    """Stats for row i of the matrix."""
+    width = matrix["width"]
+    row = matrix["cells"][i * width:(i + 1) * width]
+    total_days = sum(row.count(code) for code in _MATRIX_WORKING_CODES)
+    present_days = row.count(bytes([STATUS_PRESENT]))
+    last = len(row.rstrip(bytes([MATRIX_NO_CELL])))
+    return {
+        "total_days": total_days,
+        "present_days": present_days,
+        "absent_days": row.count(bytes([STATUS_ABSENT])),
+        "attendance_average": round((present_days / total_days * 100) if total_days > 0 else 0, 2),
+        "last_date": matrix["dates"][last - 1] if last else None
+    }
+
+def matrix_attendance_stats(matrix, rollnos=None) -> dict:
+    """Same shape as get_attendance_summary, computed from matrix rows.
+
+    Stats for every student are computed once per matrix (a matrix is never modified
+    after it is built, so they stay valid until the next sync); with `rollnos` only
+    those rows are computed."""
+    if rollnos is not None:
+        row_of = matrix["row_of"]
+        return {rollno: _matrix_row_stats(matrix, row_of[rollno]) for rollno in rollnos if rollno in row_of}
+    stats = matrix.get("stats")
+    if stats is None:
+        # Two requests may both compute it; either result is the same
+        stats = {rollno: _matrix_row_stats(matrix, i) for i, rollno in enumerate(matrix["rollnos"])}
+        matrix["stats"] = stats
+    return stats
+
+def matrix_absent_on(matrix, date_iso) -> set:
+    """Rollnos marked absent on `date_iso` (one column of the matrix)."""
+    j = matrix["col_of"].get(date_iso)
+    if j is None:
+        return set()
+    column = matrix["cells"][j::matrix["width"]] if matrix["width"] else b""
+    rollnos = matrix["rollnos"]
+    return {rollnos[i] for i, code in enumerate(column) if code == STATUS_ABSENT}
+
+def get_attendance_stats_cached(cur, where=None, params=()) -> dict:
+    """Per-student stats from the matrix when enabled, else from attendance_summary.
+    On the matrix path a "rollno = ?" filter computes just that student; any other
+    `where` returns every student and callers look up by rollno."""
+    matrix = get_attendance_matrix()
+    if matrix is not None:
+        if where == "rollno = ?":
+            return matrix_attendance_stats(matrix, params)
+        return matrix_attendance_stats(matrix)
+    return get_attendance_summary(cur, where, params)
+
+# -------------------------------
+# Attendance prefix sums (date-window stats)
+# -------------------------------
+# For every student, cumulative working/present/absent counts over the sorted
+# attendance dates: the counts for dates[lo:hi] are prefix[hi] - prefix[lo].
+_attendance_prefix = None
+
+def build_attendance_prefix_sums(cur) -> dict:
+    """Per-student prefix arrays of (total, present, absent) keyed by day number."""
+    version = _attendance_sync_version
+    source = attendance_source()
+    cur.execute(f"SELECT DISTINCT date_iso FROM {source} WHERE {ATTENDANCE_COUNTED_CELLS} ORDER BY date_iso")
+    dates = [row[0] for row in cur.fetchall()]
+    day_of = {date_iso: j for j, date_iso in enumerate(dates)}
+    counts = {}
+    cur.execute(f"SELECT rollno, date_iso, status_code FROM {source} WHERE {ATTENDANCE_COUNTED_CELLS}")
+    for rollno, date_iso, status_code in cur.fetchall():
+        if status_code not in WORKING_DAY_CODES:
+            continue
+        total, present, absent = counts.get(rollno) or counts.setdefault(
+            rollno, ([0] * len(dates), [0] * len(dates), [0] * len(dates))
+        )
+        j = day_of[date_iso]
+        total[j] += 1
+        if status_code == STATUS_PRESENT:
+            present[j] += 1
+        elif status_code == STATUS_ABSENT:
+            absent[j] += 1
+    rows = {
+        rollno: tuple(array('I', itertools.accumulate(per_day, initial=0)) for per_day in per_student)
+        for rollno, per_student in counts.items()
+    }
+    return {"version": version, "dates": dates, "rows": rows}
+
+def get_attendance_prefix_sums():
+    """Current prefix sums, rebuilt if a sync happened since they were built."""
+    global _attendance_prefix
+    prefix = _attendance_prefix
+    if prefix is None or prefix["version"] != _attendance_sync_version:
+        conn_local = sqlite3.connect('school.db')
+        try:
+            prefix = build_attendance_prefix_sums(conn_local.cursor())
+        finally:
+            conn_local.close()
+        _attendance_prefix = prefix
+    return prefix
+
+def _attendance_window_bounds(dates, date_from=None, date_to=None):
+    """Day-number range [lo, hi) of the sorted dates falling in [date_from, date_to]."""
+    lo = bisect.bisect_left(dates, date_from) if date_from else 0
+    hi = bisect.bisect_right(dates, date_to) if date_to else len(dates)
+    return lo, max(lo, hi)
+
+def attendance_window_stats(prefix, date_from=None, date_to=None, rollnos=None) -> dict:
+    """Stats per rollno over attendance dates in [date_from, date_to] (ISO, inclusive),
+    for every student or only those in `rollnos`."""
+    lo, hi = _attendance_window_bounds(prefix["dates"], date_from, date_to)
+    rows = prefix["rows"]
+    if rollnos is not None:
+        rows = {rollno: rows[rollno] for rollno in rollnos if rollno in rows}
+    stats = {}
+    for rollno, (total, present, absent) in rows.items():
+        total_days = total[hi] - total[lo]
+        present_days = present[hi] - present[lo]
+        stats[rollno] = {
+            "total_days": total_days,
+            "present_days": present_days,
+            "absent_days": absent[hi] - absent[lo],
+            "attendance_average": round((present_days / total_days * 100) if total_days > 0 else 0, 2)
+        }
+    return stats
+
+def attendance_diff_changed(sync_result) -> bool:
+    """True when a sync_attendance_cells result wrote any cell."""
+    return bool(sync_result["inserted"] or sync_result["updated"] or sync_result["deleted"])
+
+def refresh_attendance_caches():
+    """Rebuild the in-memory read models after an attendance sync."""
+    get_attendance_matrix()
+    try:
+        get_attendance_prefix_sums()
+    except Exception as e:
+        print(f"[ERROR] Attendance prefix sums rebuild failed: {e}")
+
+# Departments whose students are also recognised by roll number prefix, whatever
+# current_semester says. Every department filter and the rollup derive from these.
+DEPARTMENT_ROLLNO_PREFIXES = {'IT': '323UIT', 'AI & ML': '323UAM'}
+_DEPARTMENT_SPELLINGS = {'IT': 'IT', 'AI&ML': 'AI & ML', 'AIML': 'AI & ML', 'AIANDML': 'AI & ML'}
+
+def canonical_department(dept):
+    """'IT' / 'AI & ML' for their usual spellings ('AIML', 'ai & ml'), else the name as given."""
+    name = (dept or '').strip()
+    return _DEPARTMENT_SPELLINGS.get(name.upper().replace(' ', ''), name)
+
+def _department_students_where(dept, alias="s"):
+    """(where, params) over students (aliased `alias`, "" for none) for a department:
+    current_semester matches, or the rollno has the department's prefix."""
+    dept = canonical_department(dept)
+    if not dept:
+        return None, ()
+    col = f"{alias}." if alias else ""
+    prefix = DEPARTMENT_ROLLNO_PREFIXES.get(dept)
+    if prefix:
+        return f"({col}current_semester = ? OR {col}rollno LIKE '{prefix}%')", (dept,)
+    return f"{col}current_semester = ?", (dept,)
+
+def _department_case_sql() -> str:
+    """SQL CASE over students naming each student's department by the same rules."""
+    whens = " ".join(
+        f"WHEN rollno LIKE '{prefix}%' OR current_semester = '{dept}' THEN '{dept}'"
+        for dept, prefix in DEPARTMENT_ROLLNO_PREFIXES.items()
+    )
+    return f"CASE {whens} ELSE COALESCE(NULLIF(TRIM(current_semester), ''), 'Other') END"
+
+def count_department_students(cur, dept) -> int:
+    where, params = _department_students_where(dept, alias="")
+    cur.execute("SELECT COUNT(*) FROM students" + (f" WHERE {where}" if where else ""), params)
+    return int(cur.fetchone()[0] or 0)
+
 # -------------------------------
 # Attendance Helper Functions
 # -------------------------------
 def get_today_absent_students(department=None):
     """Get list of students absent today"""
-    target_date_variants = _get_target_date_variants_for_attendance()
+    target_date = _get_target_attendance_date()
     
     conn_local = sqlite3.connect('school.db')
     cur = conn_local.cursor()
     
-    # Get all students from the department
-    # Be robust: use rollno prefix OR current_semester match
-    if department == 'IT':
-        cur.execute("SELECT rollno, name FROM students WHERE rollno LIKE '323UIT%' OR current_semester = 'IT'")
-    elif department == 'AI & ML':
-        cur.execute("SELECT rollno, name FROM students WHERE rollno LIKE '323UAM%' OR current_semester = 'AI & ML'")
-    else:
-        cur.execute("SELECT rollno, name FROM students")
+    # Students of the department (rollno prefix OR current_semester match)
+    student_where, params = _department_students_where(department)
     
-    students = cur.fetchall()
-    absent_students = []
-    
-    for student in students:
-        rollno = student[0]
-        name = student[1]
-        
-        # Check today's attendance
-        for date_var in target_date_variants:
-            cur.execute("SELECT status FROM attendance WHERE rollno=? AND LOWER(date)=?", (rollno, date_var))
-            record = cur.fetchone()
-            if record and record[0]:
-                status = str(record[0]).strip().upper()
-                if status in ('0', 'NO', 'N', 'ABSENT', 'A'):
-                    absent_students.append({'rollno': rollno, 'name': name})
-                break
+    matrix = get_attendance_matrix()
+    if matrix is not None:
+        absent_rollnos = matrix_absent_on(matrix, target_date)
+        cur.execute("SELECT s.rollno, s.name FROM students s" + (f" WHERE {student_where}" if student_where else "") + " ORDER BY s.id", params)
+        absent_students = [
+            {'rollno': rollno, 'name': name}
+            for rollno, name in cur.fetchall() if rollno in absent_rollnos
+        ]
+    else:
+        absent_students = [
+            {'rollno': row['rollno'], 'name': row['name']}
+            for row in resolve_daily_absent(cur, target_date, student_where, params, include_no_record=False)
+        ]
     
     conn_local.close()
     return absent_students
@@ -128,35 +820,23 @@ def get_low_attendance_students(threshold=75, department=None):
     cur = conn_local.cursor()
     
     # Get all students from the department
-    if department == 'IT':
-        cur.execute("SELECT rollno, name FROM students WHERE rollno LIKE '323UIT%'")
-    elif department == 'AI & ML':
-        cur.execute("SELECT rollno, name FROM students WHERE rollno LIKE '323UAM%'")
-    else:
-        cur.execute("SELECT rollno, name FROM students")
-    
+    student_where, params = _department_students_where(department, alias="")
+    cur.execute("SELECT rollno, name FROM students" + (f" WHERE {student_where}" if student_where else ""), params)
     students = cur.fetchall()
+    stats_by_rollno = get_attendance_stats_cached(cur, _students_where_sql(student_where) if student_where else None, params)
     low_attendance_students = []
     
-    for student in students:
-        rollno = student[0]
-        name = student[1]
-        
-        # Get attendance records
-        cur.execute("SELECT status FROM attendance WHERE rollno=? AND status IS NOT NULL AND status != ''", (rollno,))
-        records = cur.fetchall()
-        
-        if records:
-            total_days = len(records)
-            present_days = sum(1 for r in records if str(r[0]).strip().upper() in ('1', 'YES', 'Y', 'PRESENT', 'P'))
-            attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
-            
-            if attendance_percentage < threshold:
-                low_attendance_students.append({
-                    'rollno': rollno,
-                    'name': name,
-                    'attendance': round(attendance_percentage, 1)
-                })
+    for rollno, name in students:
+        stats = stats_by_rollno.get(rollno)
+        if not stats or stats["total_days"] == 0:
+            continue
+        attendance_percentage = stats["present_days"] / stats["total_days"] * 100
+        if attendance_percentage < threshold:
+            low_attendance_students.append({
+                'rollno': rollno,
+                'name': name,
+                'attendance': round(attendance_percentage, 1)
+            })
     
     conn_local.close()
     return sorted(low_attendance_students, key=lambda x: x['attendance'])
@@ -166,12 +846,8 @@ def get_department_students(department):
     conn_local = sqlite3.connect('school.db')
     cur = conn_local.cursor()
     
-    if department == 'IT':
-        cur.execute("SELECT * FROM students WHERE rollno LIKE '323UIT%' OR current_semester = 'IT'")
-    elif department == 'AI & ML':
-        cur.execute("SELECT * FROM students WHERE rollno LIKE '323UAM%' OR current_semester = 'AI & ML'")
-    else:
-        cur.execute("SELECT * FROM students")
+    student_where, params = _department_students_where(department, alias="")
+    cur.execute("SELECT * FROM students" + (f" WHERE {student_where}" if student_where else ""), params)
     
     students = cur.fetchall()
     columns = [desc[0] for desc in cur.description]
@@ -238,77 +914,79 @@ def get_all_students():
 # -------------------------------
 # Attendance date resolution
 # -------------------------------
-def _format_variants(dt: datetime.date) -> list:
-    try:
-        return [
-            dt.strftime('%Y-%m-%d').lower(),
-            dt.strftime('%d-%m-%Y').lower(),
-            dt.strftime('%d-%b-%Y').lower(),
-            dt.strftime('%d-%b-%y').lower(),
-        ]
-    except Exception:
-        # Fallback to today if format fails
-        today = datetime.date.today()
-        return [
-            today.strftime('%Y-%m-%d').lower(),
-            today.strftime('%d-%m-%Y').lower(),
-            today.strftime('%d-%b-%Y').lower(),
-            today.strftime('%d-%b-%y').lower(),
-        ]
+# Header formats seen in the attendance sheets ('2025-07-01', '30-06-25', '1-Jul-25', ...)
+# '%Y-%m-%d %H:%M:%S' is how read_excel_values renders datetime header cells
+_ATTENDANCE_DATE_FORMATS = (
+    '%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y', '%d-%m-%y', '%d-%b-%Y', '%d-%b-%y', '%d/%m/%Y', '%d/%m/%y'
+)
 
 def _parse_date_maybe(s: str):
     if not s:
         return None
+    if isinstance(s, datetime.datetime):
+        return s.date()
+    if isinstance(s, datetime.date):
+        return s
     s = str(s).strip()
-    for fmt in ('%Y-%m-%d', '%d-%m-%Y', '%d-%b-%Y', '%d-%b-%y'):
+    for fmt in _ATTENDANCE_DATE_FORMATS:
         try:
             return datetime.datetime.strptime(s, fmt).date()
         except Exception:
             continue
     return None
 
-def _get_target_date_variants_for_attendance() -> list:
-    """Return a list of acceptable string variants for the target date to use when
-    checking daily-absent. Preference order:
-    1) Today (any accepted format) if the attendance table has any row with today's date
-    2) Otherwise, the latest date present in attendance not in the future.
+def _to_date_iso(label):
+    """Canonical 'YYYY-MM-DD' for a sheet date header, or None if it is not a date."""
+    parsed = _parse_date_maybe(label)
+    return parsed.isoformat() if parsed else None
+
+# Sorted distinct attendance dates, rebuilt lazily once per attendance sync.
+# Loaders call bump_attendance_sync_version() after committing new cells.
+_attendance_sync_version = 0
+_attendance_date_index = (None, [])
+
+def bump_attendance_sync_version():
+    global _attendance_sync_version
+    _attendance_sync_version += 1
+
+def get_attendance_dates(cur=None) -> list:
+    """Sorted ISO dates present in attendance, cached per sync version."""
+    global _attendance_date_index
+    version, dates = _attendance_date_index
+    if version != _attendance_sync_version:
+        version = _attendance_sync_version
+        conn_local = None if cur is not None else sqlite3.connect('school.db')
+        try:
+            cur = cur or conn_local.cursor()
+            cur.execute(f"SELECT DISTINCT date_iso FROM {attendance_source()} WHERE {ATTENDANCE_COUNTED_CELLS} ORDER BY date_iso")
+            dates = [row[0] for row in cur.fetchall()]
+        finally:
+            if conn_local is not None:
+                conn_local.close()
+        _attendance_date_index = (version, dates)
+    return dates
+
+def _get_target_attendance_date() -> str:
+    """Return the ISO date to use when checking daily-absent. Preference order:
+    1) The latest date present in attendance not in the future (today if it has rows)
+    2) Otherwise, the latest date present at all (sheet dated ahead of the server clock)
+    3) Otherwise, today
     """
+    today = datetime.date.today().isoformat()
     try:
-        # Collect all distinct dates
-        c.execute("SELECT DISTINCT LOWER(date) FROM attendance WHERE date IS NOT NULL AND TRIM(date) != ''")
-        rows = [r[0] for r in c.fetchall() if r and r[0]]
-        if not rows:
-            return _format_variants(datetime.date.today())
-        today = datetime.date.today()
-        today_variants = _format_variants(today)
-        # If any row equals today's variant, use today
-        if any(r in today_variants for r in rows):
-            return today_variants
-        # Else choose latest date <= today
-        parsed = [(r, _parse_date_maybe(r)) for r in rows]
-        parsed_valid = [p for p in parsed if p[1] is not None]
-        if not parsed_valid:
-            return today_variants
-        parsed_valid.sort(key=lambda x: x[1])
-        # filter not in future
-        not_future = [p for p in parsed_valid if p[1] <= today]
-        chosen = (not_future[-1][1] if not_future else parsed_valid[-1][1])
-        return _format_variants(chosen)
+        dates = get_attendance_dates()
     except Exception:
-        return _format_variants(datetime.date.today())
+        return today
+    idx = bisect.bisect_right(dates, today)
+    if idx:
+        return dates[idx - 1]
+    if dates:
+        return dates[-1]
+    return today
 
 # Identify if a header looks like a date column (from Google Sheet)
 def _is_date_header(label: str) -> bool:
-    if not label:
-        return False
-    s = str(label).strip()
-    for fmt in ('%Y-%m-%d', '%d-%m-%Y', '%d-%b-%Y', '%d-%b-%y'):
-        try:
-            datetime.datetime.strptime(s, fmt)
-            return True
-        except Exception:
-            continue
-    return False
+    return _parse_date_maybe(label) is not None
 
 
 # Create students table
@@ -383,6 +1061,12 @@ def ensure_students_schema():
         if col not in existing_columns:
             c.execute(f"ALTER TABLE students ADD COLUMN {col} TEXT")
             print(f"Added column {col} to students table")
+    # The import upserts ON CONFLICT(rollno); migrated tables may lack the UNIQUE constraint
+    try:
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_students_rollno ON students(rollno)")
+    except sqlite3.IntegrityError as e:
+        print(f"[WARNING] Duplicate roll numbers prevent a unique rollno index: {e}")
+        print("[WARNING] Student imports fall back to separate INSERT/UPDATE statements until the duplicates are removed")
     conn.commit()
 
 # Create teachers table (must exist before running teacher schema migrations)
@@ -404,7 +1088,215 @@ CREATE TABLE IF NOT EXISTS attendance (
     rollno TEXT,
     reg_no TEXT,
     date TEXT,
-    status TEXT
+    date_iso TEXT,
+    status TEXT,
+    status_code INTEGER,
+    status_raw TEXT
+)
+''')
+conn.commit()
+
+# Status vocabulary: code definitions plus the raw-value aliases the normalizer accepts
+c.execute('''
+CREATE TABLE IF NOT EXISTS attendance_status_codes (
+    code INTEGER PRIMARY KEY,
+    label TEXT,
+    is_working_day INTEGER
+)
+''')
+c.execute('''
+CREATE TABLE IF NOT EXISTS attendance_status_vocab (
+    raw TEXT PRIMARY KEY,
+    code INTEGER
+)
+''')
+conn.commit()
+
+def ensure_attendance_status_vocab():
+    """Seed the vocabulary tables and load aliases (including any added directly in the DB)."""
+    c.executemany(
+        "INSERT OR REPLACE INTO attendance_status_codes (code, label, is_working_day) VALUES (?, ?, ?)",
+        [(code, label, int(working)) for code, (label, working) in ATTENDANCE_STATUS_CODES.items()]
+    )
+    c.executemany(
+        "INSERT OR IGNORE INTO attendance_status_vocab (raw, code) VALUES (?, ?)",
+        list(DEFAULT_ATTENDANCE_STATUS_VOCAB.items())
+    )
+    conn.commit()
+    c.execute("SELECT raw, code FROM attendance_status_vocab")
+    _attendance_status_vocab.clear()
+    _attendance_status_vocab.update({str(raw).strip().upper(): int(code) for raw, code in c.fetchall()})
+
+ensure_attendance_status_vocab()
+
+def ensure_attendance_schema():
+    """Add the canonical date_iso and status_code columns, backfill them from the
+    free-text date headers / status strings and create the lookup indexes.
+    Returns True when any rows were backfilled."""
+    c.execute("PRAGMA table_info(attendance)")
+    existing = {row[1] for row in c.fetchall()}
+    for col, col_type in (('date_iso', 'TEXT'), ('status_code', 'INTEGER'), ('status_raw', 'TEXT')):
+        if col not in existing:
+            c.execute(f"ALTER TABLE attendance ADD COLUMN {col} {col_type}")
+            print(f"Added column {col} to attendance table")
+    # Parse each distinct header once, then update all rows sharing it
+    c.execute("SELECT DISTINCT date FROM attendance WHERE date_iso IS NULL AND date IS NOT NULL")
+    backfilled = 0
+    updates = []
+    for (label,) in c.fetchall():
+        iso = _to_date_iso(label)
+        if iso:
+            updates.append((iso, label))
+    if updates:
+        c.executemany("UPDATE attendance SET date_iso=? WHERE date=? AND date_iso IS NULL", updates)
+        print(f"Backfilled date_iso for {len(updates)} attendance dates")
+        backfilled += len(updates)
+    # Normalize legacy text statuses (older rows, or rows written by the generator
+    # scripts) once, then drop the text so only the integer code is stored
+    c.execute("SELECT DISTINCT status FROM attendance WHERE status_code IS NULL")
+    updates = []
+    for (status,) in c.fetchall():
+        code, raw = normalize_attendance_status(status)
+        updates.append((code, raw, status))
+    if updates:
+        c.executemany(
+            "UPDATE attendance SET status_code=?, status_raw=?, status=NULL WHERE status IS ? AND status_code IS NULL",
+            updates
+        )
+        print(f"Backfilled status_code for {len(updates)} distinct attendance statuses")
+        backfilled += len(updates)
+    c.execute("DROP INDEX IF EXISTS idx_attendance_rollno_date")
+    # After a shadow-table reload the live table may carry the alternate index names
+    live_indexes = _attendance_index_names(c, "attendance")
+    if not any(set(names) <= live_indexes for names in _ATTENDANCE_INDEX_NAMES):
+        _create_attendance_indexes(c, "attendance", _ATTENDANCE_INDEX_NAMES[0])
+    conn.commit()
+    return bool(backfilled)
+
+_attendance_backfilled = ensure_attendance_schema()
+
+def ensure_attendance_storage():
+    """Create the packed-storage tables and move cells into the configured storage.
+
+    In packed mode any rows in the attendance table (a previous row-mode deployment,
+    or an external script writing rows directly) replace the packed cells and are
+    then removed; in row mode an empty attendance table is refilled from the packed
+    cells. Returns True when cells were moved."""
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS attendance_dates (
+        date_iso TEXT PRIMARY KEY,
+        label TEXT,
+        term TEXT,
+        col INTEGER
+    )
+    ''')
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS attendance_packed (
+        rollno TEXT,
+        term TEXT,
+        codes BLOB,
+        PRIMARY KEY (rollno, term)
+    )
+    ''')
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS attendance_packed_raw (
+        rollno TEXT,
+        date_iso TEXT,
+        raw TEXT,
+        PRIMARY KEY (rollno, date_iso)
+    )
+    ''')
+    # Per-student content hash of the last synced cells, used to skip unchanged students
+    c.execute('''
+    CREATE TABLE IF NOT EXISTS attendance_row_hashes (
+        rollno TEXT PRIMARY KEY,
+        digest TEXT
+    )
+    ''')
+    c.execute('''
+    CREATE VIEW IF NOT EXISTS attendance_cells AS
+    SELECT p.rollno AS rollno,
+           d.label AS date,
+           d.date_iso AS date_iso,
+           CAST(substr(p.codes, d.col + 1, 1) AS INTEGER) AS status_code,
+           r.raw AS status_raw
+    FROM attendance_packed p
+    JOIN attendance_dates d ON d.term = p.term AND d.col < length(p.codes)
+    LEFT JOIN attendance_packed_raw r ON r.rollno = p.rollno AND r.date_iso = d.date_iso
+    WHERE substr(p.codes, d.col + 1, 1) != CAST(' ' AS BLOB)
+    ''')
+    moved = 0
+    if ATTENDANCE_STORAGE == "packed":
+        c.execute("SELECT rollno, date, date_iso, status_code, status_raw FROM attendance")
+        rows = c.fetchall()
+        if rows:
+            write_attendance_cells(c, rows)
+            c.execute("DELETE FROM attendance")
+            moved = len(rows)
+            print(f"Packed {moved} attendance rows into attendance_packed")
+    else:
+        c.execute("SELECT COUNT(*) FROM attendance")
+        if c.fetchone()[0] == 0:
+            c.execute('''
+            INSERT INTO attendance (rollno, date, date_iso, status_code, status_raw)
+            SELECT rollno, date, date_iso, status_code, status_raw FROM attendance_cells
+            ''')
+            moved = c.rowcount if c.rowcount > 0 else 0
+            if moved:
+                c.execute("DELETE FROM attendance_packed")
+                c.execute("DELETE FROM attendance_packed_raw")
+                c.execute("DELETE FROM attendance_dates")
+                print(f"Unpacked {moved} attendance cells into the attendance table")
+    if moved:
+        c.execute("DELETE FROM attendance_row_hashes")
+    conn.commit()
+    return bool(moved)
+
+_attendance_backfilled = ensure_attendance_storage() or _attendance_backfilled
+
+# Per-student attendance totals, maintained incrementally by the attendance loaders
+c.execute('''
+CREATE TABLE IF NOT EXISTS attendance_summary (
+    rollno TEXT PRIMARY KEY,
+    total_days INTEGER,
+    present_days INTEGER,
+    absent_days INTEGER,
+    last_date TEXT,
+    pct REAL
+)
+''')
+conn.commit()
+
+def ensure_attendance_summary(force=False):
+    """Build the summary from scratch when it is out of step with the attendance
+    table (first run, migrated rows, or attendance written by an external script)."""
+    c.execute(f"""
+        SELECT COUNT(DISTINCT rollno), COALESCE(SUM(status_code IN ({_sql_in_list(WORKING_DAY_CODES)})), 0)
+        FROM {attendance_source()} WHERE {ATTENDANCE_COUNTED_CELLS}
+    """)
+    attendance_students, working_cells = c.fetchone()
+    # Summaries from before ATTENDANCE_COUNTED_CELLS also counted non-date cells
+    c.execute("SELECT COUNT(*), COALESCE(SUM(total_days), 0) FROM attendance_summary")
+    if force or c.fetchone() != (attendance_students, working_cells):
+        refresh_attendance_summary(c)
+        conn.commit()
+        print(f"Rebuilt attendance_summary for {attendance_students} students")
+
+ensure_attendance_summary(force=_attendance_backfilled)
+if _attendance_backfilled:
+    # Rows were rewritten outside the sync engine; re-diff every student next sync
+    c.execute("DELETE FROM attendance_row_hashes")
+    conn.commit()
+
+# Department x day attendance counts for the principal's trend charts, rebuilt on import
+c.execute('''
+CREATE TABLE IF NOT EXISTS dept_daily_rollup (
+    dept TEXT,
+    day TEXT,
+    present INTEGER,
+    absent INTEGER,
+    blank INTEGER,
+    PRIMARY KEY (dept, day)
 )
 ''')
 conn.commit()
@@ -498,6 +1390,12 @@ conn.commit()
 ensure_teachers_schema()
 ensure_students_schema()
 
+# Seed the rollup once students carry every column it groups on (legacy tables are migrated above)
+c.execute("SELECT COUNT(*) FROM dept_daily_rollup")
+if c.fetchone()[0] == 0 or _attendance_backfilled:
+    refresh_dept_daily_rollup(c)
+conn.commit()
+
 # --- Ensure default admin teacher exists ---
 def ensure_default_teacher():
     c.execute("SELECT 1 FROM teachers WHERE user_id = ?", ("admin",))
@@ -524,6 +1422,153 @@ def generate_password():
     return str(random.randint(100000, 999999))
 
 
+# -------------------------------
+# Sync run metrics
+# -------------------------------
+# Each sync run records per-phase timings and counters. The last runs are kept
+# in memory for /health and /sync/status, and all of them go into sync_runs.
+SYNC_RUNS_HISTORY = int(os.environ.get("SYNC_RUNS_HISTORY", "50"))
+SYNC_RUNS_TABLE_LIMIT = int(os.environ.get("SYNC_RUNS_TABLE_LIMIT", "2000"))
+
+c.execute('''
+CREATE TABLE IF NOT EXISTS sync_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job TEXT NOT NULL,
+    started_at INTEGER NOT NULL,
+    duration REAL,
+    status TEXT NOT NULL,
+    rows INTEGER,
+    cells INTEGER,
+    bytes_fetched INTEGER,
+    api_calls INTEGER,
+    skip_reason TEXT,
+    error TEXT,
+    phases_json TEXT
+)
+''')
+c.execute("PRAGMA table_info(sync_runs)")
+if "bytes_fetched" not in [col[1] for col in c.fetchall()]:
+    c.execute("ALTER TABLE sync_runs ADD COLUMN bytes_fetched INTEGER")
+conn.commit()
+
+_sync_runs = deque(maxlen=SYNC_RUNS_HISTORY)
+# The run in progress; syncs are serialized, but fetch threads report into it too
+_current_sync_run = None
+_sync_metrics_lock = threading.Lock()
+
+def _note_sync(**counts):
+    """Add to the current run's counters (no-op outside a run)."""
+    run = _current_sync_run
+    if run is None:
+        return
+    with _sync_metrics_lock:
+        for key, value in counts.items():
+            run[key] = run.get(key, 0) + value
+
+def note_sync_noop():
+    """Leave the current run unrecorded: it had nothing to do (no source configured,
+    nothing fetched). Failed runs are recorded regardless."""
+    run = _current_sync_run
+    if run is not None:
+        run["noop"] = True
+
+def note_sync_skip(reason):
+    run = _current_sync_run
+    if run is not None:
+        run["status"] = "skipped"
+        run["skip_reason"] = reason
+
+def mark_sync_phase(phase, started):
+    """Add the time since `started` to a phase of the current run (phases add up)."""
+    run = _current_sync_run
+    if run is not None:
+        with _sync_metrics_lock:
+            run["phases"][phase] = round(run["phases"].get(phase, 0) + time.time() - started, 4)
+
+@contextlib.contextmanager
+def sync_phase(phase):
+    started = time.time()
+    try:
+        yield
+    finally:
+        mark_sync_phase(phase, started)
+
+def api_execute(request):
+    """Execute a Google API request, counting the call and the response body size."""
+    postproc = getattr(request, "postproc", None)
+    if postproc is None:
+        result = request.execute()
+        _note_sync(api_calls=1)
+        return result
+    received = []
+
+    def _measure(resp, content):
+        # Body as received (after any transport decompression); content-length if it is missing
+        received.append(len(content) if content is not None else int(resp.get('content-length') or 0))
+        return postproc(resp, content)
+    request.postproc = _measure
+    result = request.execute()
+    _note_sync(api_calls=1, bytes_fetched=sum(received))
+    return result
+
+@contextlib.contextmanager
+def sync_run(job):
+    """Record one sync run: timings, counters, outcome."""
+    global _current_sync_run
+    run = {
+        "job": job, "started_at": int(time.time()), "duration": None, "status": "ok",
+        "rows": 0, "cells": 0, "bytes_fetched": 0, "api_calls": 0,
+        "skip_reason": None, "error": None, "phases": {}, "noop": False
+    }
+    previous, _current_sync_run = _current_sync_run, run
+    started = time.time()
+    try:
+        yield run
+    except Exception as e:
+        run["status"] = "error"
+        run["error"] = str(e)
+        raise
+    finally:
+        run["duration"] = round(time.time() - started, 3)
+        _current_sync_run = previous
+        if not run["noop"] or run["status"] == "error":
+            _sync_runs.append(run)
+            _store_sync_run(run)
+
+def _store_sync_run(run):
+    # Own connection: the caller's transaction on the global one must stay untouched
+    try:
+        conn_local = sqlite3.connect('school.db', timeout=5)
+        with conn_local:
+            cur = conn_local.execute('''
+                INSERT INTO sync_runs (job, started_at, duration, status, rows, cells, bytes_fetched,
+                                       api_calls, skip_reason, error, phases_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                run["job"], run["started_at"], run["duration"], run["status"], run["rows"], run["cells"],
+                run["bytes_fetched"], run["api_calls"], run["skip_reason"], run["error"], json.dumps(run["phases"])
+            ))
+            if cur.lastrowid % 100 == 0:
+                conn_local.execute("DELETE FROM sync_runs WHERE id <= ?", (cur.lastrowid - SYNC_RUNS_TABLE_LIMIT,))
+        conn_local.close()
+    except Exception as e:
+        print(f"[WARNING] Could not store sync run metrics: {e}")
+
+def sync_metrics(limit=None) -> dict:
+    """Recent runs (newest first) plus per-job averages of duration and phases."""
+    runs = list(_sync_runs)[::-1]
+    averages = {}
+    for run in runs:
+        entry = averages.setdefault(run["job"], {"runs": 0, "duration": 0.0, "phases": {}})
+        entry["runs"] += 1
+        entry["duration"] += run["duration"] or 0
+        for phase, seconds in run["phases"].items():
+            entry["phases"][phase] = entry["phases"].get(phase, 0) + seconds
+    for entry in averages.values():
+        entry["duration"] = round(entry["duration"] / entry["runs"], 3)
+        entry["phases"] = {phase: round(total / entry["runs"], 4) for phase, total in entry["phases"].items()}
+    return {"recent": runs[:limit] if limit else runs, "averages": averages}
+
 # --- GOOGLE SHEETS INTEGRATION ---
 # Prefer explicit env var, otherwise auto-detect local credentials file names
 def _find_credentials_file():
@@ -554,54 +1599,143 @@ _DEFAULT_ATTENDANCE_IDS = ",".join([
 ])
 STUDENTS_SHEET_ID = os.environ.get("STUDENTS_SHEET_ID", _DEFAULT_STUDENTS_IDS)
 ATTENDANCE_SHEET_ID = os.environ.get("ATTENDANCE_SHEET_ID", _DEFAULT_ATTENDANCE_IDS)
+# Tab names tried first for each kind of sheet, before the spreadsheet's own tabs
+SHEET_TAB_CANDIDATES = {
+    "students": ["Student_Details", "Students", "Student Details", "Sheet1", "Data"],
+    "attendance": ["attendance", "Attendance", "Sheet1", "Data"],
+}
+# Resolved tab titles/ranges are trusted this long (or until a read with them fails)
+SHEET_RANGE_CACHE_TTL_SECONDS = int(os.environ.get("SHEET_RANGE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+c.execute('''
+CREATE TABLE IF NOT EXISTS sheet_range_cache (
+    spreadsheet_id TEXT NOT NULL,
+    range_type TEXT NOT NULL,
+    a1_range TEXT NOT NULL,
+    resolved_at INTEGER NOT NULL,
+    PRIMARY KEY (spreadsheet_id, range_type)
+)
+''')
+conn.commit()
+
+# (spreadsheet_id, range_type) -> (a1_range, resolved_at); range_type "" holds the
+# first tab's title, used for ranges given without a tab name
+_sheet_range_cache = {
+    (row[0], row[1]): (row[2], row[3])
+    for row in c.execute("SELECT spreadsheet_id, range_type, a1_range, resolved_at FROM sheet_range_cache")
+}
+_sheet_range_cache_lock = threading.Lock()
+
+def _column_range(a1_range):
+    return a1_range.split('!', 1)[1] if '!' in a1_range else a1_range
+
+def _cached_sheet_range(spreadsheet_id, range_type):
+    with _sheet_range_cache_lock:
+        entry = _sheet_range_cache.get((spreadsheet_id, range_type))
+    if entry and time.time() - entry[1] < SHEET_RANGE_CACHE_TTL_SECONDS:
+        return entry[0]
+    return None
+
+def _store_sheet_range(spreadsheet_id, range_type, a1_range):
+    now = int(time.time())
+    with _sheet_range_cache_lock:
+        _sheet_range_cache[(spreadsheet_id, range_type)] = (a1_range, now)
+    # Own connection: the syncs may hold a transaction open on the global one
+    try:
+        conn_local = sqlite3.connect('school.db', timeout=5)
+        with conn_local:
+            conn_local.execute(
+                "INSERT OR REPLACE INTO sheet_range_cache (spreadsheet_id, range_type, a1_range, resolved_at) "
+                "VALUES (?, ?, ?, ?)",
+                (spreadsheet_id, range_type, a1_range, now)
+            )
+        conn_local.close()
+    except Exception as e:
+        print(f"[WARNING] Could not persist sheet range for {spreadsheet_id}: {e}")
+
+def invalidate_sheet_range(spreadsheet_id, range_type=None):
+    """Forget cached ranges for a spreadsheet (one range type, or all of them)."""
+    with _sheet_range_cache_lock:
+        for key in [k for k in _sheet_range_cache if k[0] == spreadsheet_id and range_type in (None, k[1])]:
+            del _sheet_range_cache[key]
+    try:
+        conn_local = sqlite3.connect('school.db', timeout=5)
+        with conn_local:
+            if range_type is None:
+                conn_local.execute("DELETE FROM sheet_range_cache WHERE spreadsheet_id = ?", (spreadsheet_id,))
+            else:
+                conn_local.execute(
+                    "DELETE FROM sheet_range_cache WHERE spreadsheet_id = ? AND range_type = ?",
+                    (spreadsheet_id, range_type)
+                )
+        conn_local.close()
+    except Exception as e:
+        print(f"[WARNING] Could not clear cached sheet range for {spreadsheet_id}: {e}")
+
+def _first_sheet_title(spreadsheet_id):
+    """Title of the spreadsheet's first tab (cached)."""
+    cached = _cached_sheet_range(spreadsheet_id, "")
+    if cached is not None:
+        return cached
+    meta = api_execute(get_sheets_service().spreadsheets().get(
+        spreadsheetId=spreadsheet_id, fields='sheets(properties(title))'
+    ))
+    sheets = meta.get('sheets', [])
+    if not sheets:
+        raise ValueError('No sheets found in spreadsheet')
+    title = sheets[0]['properties']['title']
+    _store_sheet_range(spreadsheet_id, "", title)
+    return title
+
 def get_sheet_range(spreadsheet_id, default_range, range_type="data"):
-    """Get the correct sheet range by trying common sheet names and fallbacks"""
+    """Get the correct sheet range by trying common sheet names and fallbacks.
+
+    The resolved range is cached per spreadsheet (in memory and in sheet_range_cache),
+    so the tabs are only probed again after SHEET_RANGE_CACHE_TTL_SECONDS or after
+    invalidate_sheet_range()."""
+    column_range = _column_range(default_range)
+    cached = _cached_sheet_range(spreadsheet_id, range_type)
+    if cached is not None and _column_range(cached) == column_range:
+        return cached
+    with sync_phase("resolve"):
+        return _resolve_sheet_range(spreadsheet_id, default_range, column_range, range_type)
+
+def _resolve_sheet_range(spreadsheet_id, default_range, column_range, range_type):
     service = get_sheets_service()
-
-    # Get actual sheet names
     try:
-        meta = service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields='sheets(properties(title))').execute()
-        sheets = meta.get('sheets', [])
-        sheet_names = [sheet['properties']['title'] for sheet in sheets]
-
-        # Try common sheet names in order of likelihood
-        candidate_names = []
-
-        if range_type == "students":
-            # For students, try these names in order
-            candidate_names = ["Student_Details", "Students", "Student Details", "Sheet1", "Data"]
-        elif range_type == "attendance":
-            # For attendance, try these names in order
-            candidate_names = ["attendance", "Attendance", "Sheet1", "Data"]
-
-        # Add actual sheet names if they're not already in the list
-        for name in sheet_names:
-            if name not in candidate_names:
-                candidate_names.append(name)
-
-        # Try each candidate name
+        meta = api_execute(service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields='sheets(properties(title))'))
+        sheet_names = [sheet['properties']['title'] for sheet in meta.get('sheets', [])]
+        if sheet_names:
+            _store_sheet_range(spreadsheet_id, "", sheet_names[0])
+
+        # Preferred names first, then the remaining tabs; only tabs that exist are probed
+        candidate_names = [n for n in SHEET_TAB_CANDIDATES.get(range_type, []) if n in sheet_names]
+        candidate_names += [n for n in sheet_names if n not in candidate_names]
+
+        probe_failed = False
         for sheet_name in candidate_names:
             try:
-                # Extract column range from default_range (e.g., "A:AZ" from "Sheet1!A:AZ")
-                column_range = default_range.split('!', 1)[1] if '!' in default_range else default_range
-                test_range = f"{sheet_name}!{column_range}"
-
-                # Test if this range works
-                result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=test_range).execute()
+                # A couple of rows are enough to tell whether the tab has data
+                probe = f"{sheet_name}!1:2"
+                result = api_execute(service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=probe))
                 if result.get('values'):
                     print(f"[DEBUG] Successfully found {range_type} data in sheet '{sheet_name}'")
-                    return test_range
-
+                    resolved = f"{sheet_name}!{column_range}"
+                    _store_sheet_range(spreadsheet_id, range_type, resolved)
+                    return resolved
             except Exception as e:
+                probe_failed = True
                 print(f"[DEBUG] Sheet '{sheet_name}' not accessible or empty: {e}")
                 continue
 
         # If no sheet works, fall back to the first available sheet
         if sheet_names:
-            fallback_sheet = sheet_names[0]
-            column_range = default_range.split('!', 1)[1] if '!' in default_range else default_range
-            fallback_range = f"{fallback_sheet}!{column_range}"
-            print(f"[FALLBACK] Using first available sheet '{fallback_sheet}' for {range_type}")
+            fallback_range = f"{sheet_names[0]}!{column_range}"
+            print(f"[FALLBACK] Using first available sheet '{sheet_names[0]}' for {range_type}")
+            # Only cache it when every tab really was empty; after a failed probe (429, 5xx)
+            # the next sync probes again instead of trusting the wrong tab for the whole TTL
+            if not probe_failed:
+                _store_sheet_range(spreadsheet_id, range_type, fallback_range)
             return fallback_range
 
     except Exception as e:
@@ -611,6 +1745,20 @@ def get_sheet_range(spreadsheet_id, default_range, range_type="data"):
     print(f"[FALLBACK] Using original range: {default_range}")
     return default_range
 
+def read_sheet_range(spreadsheet_id, default_range, range_type="data"):
+    """Read a sheet through its cached range: one values request in the steady state.
+    If the cached range stops working, it is resolved again and the read retried once."""
+    was_cached = _cached_sheet_range(spreadsheet_id, range_type) is not None
+    a1_range = get_sheet_range(spreadsheet_id, default_range, range_type)
+    try:
+        return read_sheet_values(spreadsheet_id, a1_range)
+    except Exception as e:
+        if not was_cached:
+            raise
+        print(f"[FALLBACK] Cached range '{a1_range}' failed for {spreadsheet_id}, re-resolving: {e}")
+        invalidate_sheet_range(spreadsheet_id)
+        return read_sheet_values(spreadsheet_id, get_sheet_range(spreadsheet_id, default_range, range_type))
+
 # Update the range detection to use the smart function
 STUDENTS_RANGE = os.environ.get("STUDENTS_RANGE", "A:AZ")  # Will be enhanced by get_sheet_range
 ATTENDANCE_RANGE = os.environ.get("ATTENDANCE_RANGE", "A:ZZ")  # Will be enhanced by get_sheet_range
@@ -618,6 +1766,16 @@ ATTENDANCE_RANGE = os.environ.get("ATTENDANCE_RANGE", "A:ZZ")  # Will be enhance
 STUDENTS_XLSX = os.environ.get("STUDENTS_XLSX", os.path.join(os.getcwd(), "students.xlsx"))
 ATTENDANCE_XLSX = os.environ.get("ATTENDANCE_XLSX", os.path.join(os.getcwd(), "attendance.xlsx"))
 USE_EXCEL_ONLY = os.environ.get("USE_EXCEL_ONLY", "0") in ("1", "true", "True")
+COURSES_XLSX = os.environ.get("COURSES_XLSX", os.path.join(os.getcwd(), "courses.xlsx"))
+# Where the sync loaders read sheets from: google, xlsx, csv or fixture (see get_sheet_source)
+SHEET_SOURCE = os.environ.get("SHEET_SOURCE", "google").strip().lower()
+# csv source: {range_type}.csv files in this directory
+SHEET_CSV_DIR = os.environ.get("SHEET_CSV_DIR", os.getcwd())
+# fixture source: {range_type}.json captures; SHEET_RECORD=1 captures Google fetches there
+SHEET_FIXTURE_DIR = os.environ.get("SHEET_FIXTURE_DIR", os.path.join(os.getcwd(), "fixtures", "sheets"))
+SHEET_RECORD = os.environ.get("SHEET_RECORD", "0") in ("1", "true", "True")
+# Replays import the captured sheets every time instead of skipping them as unchanged
+SHEET_FIXTURE_IGNORE_FINGERPRINTS = os.environ.get("SHEET_FIXTURE_IGNORE_FINGERPRINTS", "1") in ("1", "true", "True")
 
 # Courses sheet config (from user's link)
 COURSES_SHEET_ID = os.environ.get(
@@ -626,20 +1784,27 @@ COURSES_SHEET_ID = os.environ.get(
 )
 COURSES_RANGE = os.environ.get("COURSES_RANGE", "Sheet1!A:C")
 
-_sheets_service = None
+# googleapiclient services are not thread-safe: one per thread, sharing the credentials
+_sheets_local = threading.local()
+_sheets_credentials = None
 _last_students_sync_ts = 0
 _last_attendance_sync_ts = 0
+# Ask Drive for each spreadsheet's modifiedTime before fetching (needs the
+# drive.metadata.readonly scope granted to the service account)
+SHEETS_CHECK_MODIFIED_TIME = os.environ.get("SHEETS_CHECK_MODIFIED_TIME", "0") in ("1", "true", "True")
 SYNC_TTL_SECONDS = int(os.environ.get("GSHEETS_SYNC_TTL_SECONDS", "60")) # You can set this environment variable to a lower value if needed
 
-def get_sheets_service():
-    global _sheets_service
-    if _sheets_service is not None:
-        return _sheets_service
+def _get_sheets_credentials():
+    global _sheets_credentials
+    if _sheets_credentials is not None:
+        return _sheets_credentials
     if not os.path.exists(GOOGLE_CREDENTIALS_FILE):
         raise FileNotFoundError(f"Google credentials file not found at {GOOGLE_CREDENTIALS_FILE}")
     scopes = [
         "https://www.googleapis.com/auth/spreadsheets.readonly"
     ]
+    if SHEETS_CHECK_MODIFIED_TIME:
+        scopes.append("https://www.googleapis.com/auth/drive.metadata.readonly")
     # Enforce service-account only to avoid unverified OAuth consent issues
     with open(GOOGLE_CREDENTIALS_FILE, 'r') as f:
         cred_json = json.load(f)
@@ -649,9 +1814,16 @@ def get_sheets_service():
             "Create a Service Account JSON in Google Cloud Console and place it as credentials.json, "
             "then share your Google Sheet with the service account's client_email."
         )
-    credentials = ServiceAccountCredentials.from_service_account_file(GOOGLE_CREDENTIALS_FILE, scopes=scopes)
-    _sheets_service = build('sheets', 'v4', credentials=credentials)
-    return _sheets_service
+    _sheets_credentials = ServiceAccountCredentials.from_service_account_file(GOOGLE_CREDENTIALS_FILE, scopes=scopes)
+    return _sheets_credentials
+
+def get_sheets_service():
+    """Sheets API service for the calling thread."""
+    service = getattr(_sheets_local, "service", None)
+    if service is None:
+        service = build('sheets', 'v4', credentials=_get_sheets_credentials())
+        _sheets_local.service = service
+    return service
 
 def _split_ids(ids: str):
     # Allow comma-separated multiple spreadsheet IDs
@@ -663,18 +1835,364 @@ def read_sheet_values(spreadsheet_id, a1_range):
     effective_range = a1_range
     try:
         if '!' not in a1_range:
-            meta = service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields='sheets(properties(title))').execute()
-            sheets = meta.get('sheets', [])
-            if not sheets:
-                raise ValueError('No sheets found in spreadsheet')
-            first_title = sheets[0]['properties']['title']
-            effective_range = f"{first_title}!{a1_range}"
-        result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=effective_range).execute()
+            effective_range = f"{_first_sheet_title(spreadsheet_id)}!{a1_range}"
+        result = api_execute(service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=effective_range))
         return result.get('values', [])
     except Exception as e:
         # Provide clearer hint when the file is not a Google Sheet
         raise RuntimeError(f"Failed to read range '{effective_range}' from spreadsheet '{spreadsheet_id}': {e}")
 
+# Upper bound on spreadsheets read at once during a sync
+SHEETS_FETCH_WORKERS = int(os.environ.get("SHEETS_FETCH_WORKERS", "4"))
+# One long-lived pool, so each worker's Sheets service (see get_sheets_service) is built
+# once and reused by later syncs. Work run on it must not wait on the pool itself.
+_sheets_fetch_pool = ThreadPoolExecutor(max_workers=max(1, SHEETS_FETCH_WORKERS), thread_name_prefix="sheets-fetch")
+
+def _map_sheets(fn, spreadsheet_ids, range_type):
+    """fn(spreadsheet_id) for each id on the fetch pool, results in input order."""
+    if len(spreadsheet_ids) <= 1:
+        return [fn(sid) for sid in spreadsheet_ids]
+    started = time.time()
+    results = list(_sheets_fetch_pool.map(fn, spreadsheet_ids))
+    print(f"[DEBUG] Fetched {len(spreadsheet_ids)} {range_type} spreadsheets in {time.time() - started:.2f}s")
+    return results
+
+def fetch_sheet_ranges(spreadsheet_ids, default_range, range_type="data"):
+    """Read the same range from several spreadsheets concurrently.
+
+    Returns [(spreadsheet_id, values, error)] in the order of spreadsheet_ids, with
+    exactly one of values/error set, so merging stays deterministic."""
+    def _fetch(sid):
+        try:
+            return sid, read_sheet_range(sid, default_range, range_type), None
+        except Exception as e:
+            return sid, None, e
+
+    return _map_sheets(_fetch, spreadsheet_ids, range_type)
+
+def _sheet_sources():
+    """range_type -> (spreadsheet ids, default column range) for each synced sheet kind."""
+    return {
+        "students": (_split_ids(STUDENTS_SHEET_ID), "A:AZ"),
+        "attendance": (_split_ids(ATTENDANCE_SHEET_ID), "A:ZZ"),
+        "courses": (_split_ids(COURSES_SHEET_ID), "A:C"),
+    }
+
+def batch_fetch_sheet_ranges(range_types):
+    """Fetch several sheet kinds with one values.batchGet call per spreadsheet.
+
+    Returns {range_type: [(spreadsheet_id, values, error)]} in the same shape and
+    order as fetch_sheet_ranges. If a batch fails, that spreadsheet's ranges are
+    read one by one, which also re-resolves stale cached ranges."""
+    sources = _sheet_sources()
+    by_sheet = {}
+    for range_type in range_types:
+        ids, default_range = sources[range_type]
+        for sid in ids:
+            by_sheet.setdefault(sid, []).append((range_type, default_range))
+
+    def _fetch(item):
+        sid, wanted = item
+        try:
+            ranges = [get_sheet_range(sid, default_range, range_type) for range_type, default_range in wanted]
+            result = api_execute(get_sheets_service().spreadsheets().values().batchGet(
+                spreadsheetId=sid, ranges=ranges
+            ))
+            value_ranges = result.get('valueRanges', [])
+            if len(value_ranges) != len(wanted):
+                raise ValueError(f"batchGet returned {len(value_ranges)} ranges, expected {len(wanted)}")
+            return sid, {
+                range_type: (vr.get('values', []), None)
+                for (range_type, _), vr in zip(wanted, value_ranges)
+            }
+        except Exception as e:
+            print(f"[FALLBACK] batchGet failed for {sid}, reading ranges one by one: {e}")
+            fetched = {}
+            for range_type, default_range in wanted:
+                try:
+                    fetched[range_type] = (read_sheet_range(sid, default_range, range_type), None)
+                except Exception as e2:
+                    fetched[range_type] = (None, e2)
+            return sid, fetched
+
+    started = time.time()
+    items = list(by_sheet.items())
+    per_sheet = dict(_sheets_fetch_pool.map(_fetch, items))
+    print(f"[DEBUG] batchGet of {', '.join(range_types)} from {len(items)} spreadsheets in {time.time() - started:.2f}s")
+
+    return {
+        range_type: [(sid, *per_sheet[sid][range_type]) for sid in sources[range_type][0]]
+        for range_type in range_types
+    }
+
+# -------------------------------
+# Sheet fingerprints (skip imports when nothing changed)
+# -------------------------------
+c.execute('''
+CREATE TABLE IF NOT EXISTS sheet_fingerprints (
+    range_type TEXT NOT NULL,
+    spreadsheet_id TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    modified_time TEXT,
+    imported_at INTEGER NOT NULL,
+    PRIMARY KEY (range_type, spreadsheet_id)
+)
+''')
+conn.commit()
+
+# range_type -> imports skipped since startup because the sheets were unchanged
+_sheet_skip_counts = {}
+
+def _values_digest(values) -> str:
+    return hashlib.sha1(json.dumps(values, separators=(',', ':'), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _stored_fingerprints(cur, range_type) -> dict:
+    cur.execute("SELECT spreadsheet_id, digest, modified_time FROM sheet_fingerprints WHERE range_type = ?", (range_type,))
+    return {sid: (digest, modified_time) for sid, digest, modified_time in cur.fetchall()}
+
+def get_drive_modified_times(spreadsheet_ids) -> dict:
+    """spreadsheet_id -> Drive modifiedTime (None when unknown); {} unless
+    SHEETS_CHECK_MODIFIED_TIME is on."""
+    if not SHEETS_CHECK_MODIFIED_TIME:
+        return {}
+    drive = getattr(_sheets_local, "drive", None)
+    if drive is None:
+        drive = build('drive', 'v3', credentials=_get_sheets_credentials())
+        _sheets_local.drive = drive
+    modified = {}
+    for sid in spreadsheet_ids:
+        try:
+            modified[sid] = api_execute(drive.files().get(fileId=sid, fields='modifiedTime')).get('modifiedTime')
+        except Exception as e:
+            print(f"[DEBUG] No Drive modifiedTime for {sid}: {e}")
+            modified[sid] = None
+    return modified
+
+def sheets_unmodified(cur, range_type, spreadsheet_ids, modified_times) -> bool:
+    """True when Drive reports every spreadsheet unmodified since its last import."""
+    if not spreadsheet_ids or not modified_times:
+        return False
+    stored = _stored_fingerprints(cur, range_type)
+    return set(stored) == set(spreadsheet_ids) and all(
+        modified_times.get(sid) and stored[sid][1] == modified_times.get(sid) for sid in spreadsheet_ids
+    )
+
+def sheets_unchanged(cur, range_type, fetched) -> bool:
+    """True when every fetched sheet hashes to the fingerprint of the last import."""
+    if not fetched or any(error is not None for _, _, error in fetched):
+        return False
+    stored = _stored_fingerprints(cur, range_type)
+    return set(stored) == {sid for sid, _, _ in fetched} and all(
+        stored[sid][0] == _values_digest(vals) for sid, vals, _ in fetched
+    )
+
+def record_sheet_fingerprints(cur, range_type, fetched, modified_times=None):
+    """Remember what was imported; call inside the import's transaction."""
+    now = int(time.time())
+    cur.execute("DELETE FROM sheet_fingerprints WHERE range_type = ?", (range_type,))
+    cur.executemany(
+        "INSERT INTO sheet_fingerprints (range_type, spreadsheet_id, digest, modified_time, imported_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (range_type, sid, _values_digest(vals), (modified_times or {}).get(sid), now)
+            for sid, vals, error in fetched if error is None
+        ]
+    )
+
+def clear_sheet_fingerprints(cur, range_type):
+    """Forget fingerprints after the table was written from another source (Excel, generator)."""
+    cur.execute("DELETE FROM sheet_fingerprints WHERE range_type = ?", (range_type,))
+
+def _note_sheet_skip(range_type, reason="unchanged"):
+    _sheet_skip_counts[range_type] = _sheet_skip_counts.get(range_type, 0) + 1
+    note_sync_skip(reason)
+    print(f"[DEBUG] {range_type} sheets {reason} since last import; skipping parse and write")
+
+def sheet_fingerprint_status(cur) -> dict:
+    """Per-sheet fingerprints and skip counts, for /health."""
+    cur.execute("SELECT range_type, spreadsheet_id, digest, modified_time, imported_at FROM sheet_fingerprints")
+    status = {
+        range_type: {"skipped_imports": count, "sheets": {}} for range_type, count in _sheet_skip_counts.items()
+    }
+    for range_type, sid, digest, modified_time, imported_at in cur.fetchall():
+        entry = status.setdefault(range_type, {"skipped_imports": 0, "sheets": {}})
+        entry["sheets"][sid[:6] + '...' + sid[-4:]] = {
+            "digest": digest[:12],
+            "modified_time": modified_time,
+            "imported_at": imported_at
+        }
+    return status
+
+# -------------------------------
+# Incremental attendance fetch
+# -------------------------------
+# Attendance sheets grow to the right, one date column per day. With a snapshot of the
+# last imported grid, a sync reads only the identifier columns plus the newest date
+# columns and stitches them onto the snapshot; a full read reconciles older edits.
+ATTENDANCE_INCREMENTAL_FETCH = os.environ.get("ATTENDANCE_INCREMENTAL_FETCH", "1") in ("1", "true", "True")
+# Date columns re-read before the first new one (today's column is filled in during the day)
+ATTENDANCE_REFETCH_COLUMNS = int(os.environ.get("ATTENDANCE_REFETCH_COLUMNS", "2"))
+ATTENDANCE_FULL_RECONCILE_SECONDS = int(os.environ.get("ATTENDANCE_FULL_RECONCILE_SECONDS", str(6 * 3600)))
+
+c.execute('''
+CREATE TABLE IF NOT EXISTS attendance_sheet_snapshots (
+    spreadsheet_id TEXT PRIMARY KEY,
+    key_width INTEGER NOT NULL,
+    values_json TEXT NOT NULL,
+    full_at INTEGER NOT NULL
+)
+''')
+conn.commit()
+
+ROLLNO_HEADER_PATTERNS = [
+    'roll no', 'rollno', 'roll_no', 'roll number', 'rollnumber',
+    'reg no', 'regno', 'registration no', 'registration number',
+    'student id', 'student_id', 'student roll', 'student_roll',
+    'enrollment no', 'enrollment_no', 'enroll no', 'enroll_no'
+]
+
+def find_rollno_column(headers):
+    """Index of the roll number column in an attendance header row, or None."""
+    for i, header in enumerate(headers):
+        header_lower = str(header).strip().lower()
+        for pattern in ROLLNO_HEADER_PATTERNS:
+            if pattern in header_lower or header_lower in pattern:
+                return i
+    return None
+
+def _column_letter(idx) -> str:
+    """A1 column letters for a 0-based column index (0 -> A, 26 -> AA)."""
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def _attendance_key_width(headers):
+    """Number of identifier columns (up to the first date after the roll number), or
+    None when the sheet layout does not allow incremental reads."""
+    rollno_idx = find_rollno_column(headers)
+    if rollno_idx is None:
+        return None
+    for i in range(rollno_idx + 1, len(headers)):
+        if _to_date_iso(headers[i]):
+            return i
+    return None
+
+def _fetch_attendance_incremental(sid, snapshot):
+    """Read identifier and newest columns and stitch them onto the snapshot grid.
+    Returns None when the sheet must be read in full (layout changed, new student)."""
+    key_width, old_values, _ = snapshot
+    old_headers = old_values[0]
+    resolved = get_sheet_range(sid, "A:ZZ", "attendance")
+    if '!' not in resolved:
+        return None
+    tab = resolved.split('!', 1)[0]
+    tail_start = max(key_width, len(old_headers) - ATTENDANCE_REFETCH_COLUMNS)
+    result = api_execute(get_sheets_service().spreadsheets().values().batchGet(
+        spreadsheetId=sid,
+        ranges=[f"{tab}!A:{_column_letter(key_width - 1)}", f"{tab}!{_column_letter(tail_start)}:ZZ"]
+    ))
+    value_ranges = result.get('valueRanges', [])
+    if len(value_ranges) != 2:
+        return None
+    id_rows = value_ranges[0].get('values', [])
+    tail_rows = value_ranges[1].get('values', [])
+
+    def _pad(row, width):
+        return list(row[:width]) + [""] * (width - len(row[:width]))
+
+    if not id_rows or [str(h).strip() for h in _pad(id_rows[0], key_width)] != [str(h).strip() for h in _pad(old_headers, key_width)]:
+        return None
+    rollno_idx = find_rollno_column(old_headers)
+    old_by_rollno = {
+        str(row[rollno_idx]).strip(): row for row in old_values[1:] if rollno_idx < len(row)
+    }
+    stitched = []
+    for i, id_row in enumerate(id_rows):
+        if i == 0:
+            old_row = old_headers
+        else:
+            rollno = str(id_row[rollno_idx]).strip() if rollno_idx < len(id_row) else ""
+            old_row = old_by_rollno.get(rollno, []) if rollno else []
+            if rollno and rollno not in old_by_rollno:
+                return None
+        row = _pad(id_row, key_width) + _pad(old_row[key_width:tail_start], tail_start - key_width)
+        row += list(tail_rows[i]) if i < len(tail_rows) else []
+        # Match the API, which drops trailing empty cells
+        while row and row[-1] == "":
+            row.pop()
+        stitched.append(row)
+    return stitched
+
+def attendance_incremental_ready(spreadsheet_ids) -> bool:
+    """True when every sheet has a snapshot recent enough for an incremental read."""
+    if not ATTENDANCE_INCREMENTAL_FETCH or not spreadsheet_ids:
+        return False
+    placeholders = ", ".join("?" for _ in spreadsheet_ids)
+    cur = get_sync_connection().cursor()
+    cur.execute(
+        f"SELECT COUNT(*) FROM attendance_sheet_snapshots WHERE spreadsheet_id IN ({placeholders}) AND full_at >= ?",
+        (*spreadsheet_ids, int(time.time()) - ATTENDANCE_FULL_RECONCILE_SECONDS)
+    )
+    return cur.fetchone()[0] == len(set(spreadsheet_ids))
+
+def fetch_attendance_ranges(spreadsheet_ids):
+    """fetch_sheet_ranges for attendance, reading incrementally where a fresh snapshot
+    exists. Returns (fetched, ids that were read in full)."""
+    snapshots = {}
+    if ATTENDANCE_INCREMENTAL_FETCH and spreadsheet_ids:
+        placeholders = ", ".join("?" for _ in spreadsheet_ids)
+        cur = get_sync_connection().cursor()
+        cur.execute(
+            f"SELECT spreadsheet_id, key_width, values_json, full_at FROM attendance_sheet_snapshots "
+            f"WHERE spreadsheet_id IN ({placeholders})",
+            list(spreadsheet_ids)
+        )
+        cutoff = time.time() - ATTENDANCE_FULL_RECONCILE_SECONDS
+        snapshots = {
+            sid: (key_width, json.loads(values_json), full_at)
+            for sid, key_width, values_json, full_at in cur.fetchall() if full_at >= cutoff
+        }
+    full_ids = set()
+
+    def _fetch(sid):
+        if sid in snapshots:
+            try:
+                vals = _fetch_attendance_incremental(sid, snapshots[sid])
+                if vals is not None:
+                    return sid, vals, None
+                print(f"[DEBUG] Attendance sheet {sid} changed layout or gained students; reading it in full")
+            except Exception as e:
+                print(f"[FALLBACK] Incremental attendance read failed for {sid}: {e}")
+        full_ids.add(sid)
+        try:
+            return sid, read_sheet_range(sid, "A:ZZ", "attendance"), None
+        except Exception as e:
+            return sid, None, e
+
+    return _map_sheets(_fetch, spreadsheet_ids, "attendance"), full_ids
+
+def record_attendance_snapshots(cur, fetched, full_ids):
+    """Store the imported grids as the base for the next incremental read; call inside
+    the import's transaction. full_at only moves for sheets read in full."""
+    now = int(time.time())
+    for sid, vals, error in fetched:
+        if error is not None:
+            continue
+        key_width = _attendance_key_width(vals[0]) if vals else None
+        if key_width is None:
+            cur.execute("DELETE FROM attendance_sheet_snapshots WHERE spreadsheet_id = ?", (sid,))
+            continue
+        cur.execute('''
+            INSERT INTO attendance_sheet_snapshots (spreadsheet_id, key_width, values_json, full_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(spreadsheet_id) DO UPDATE SET
+                key_width = excluded.key_width,
+                values_json = excluded.values_json,
+                full_at = CASE WHEN ? THEN excluded.full_at ELSE attendance_sheet_snapshots.full_at END
+        ''', (sid, key_width, json.dumps(vals, separators=(',', ':'), ensure_ascii=False), now, sid in full_ids))
+
 def read_excel_values(xlsx_path):
     if not os.path.exists(xlsx_path):
         raise FileNotFoundError(f"Excel file not found: {xlsx_path}")
@@ -688,38 +2206,453 @@ def read_excel_values(xlsx_path):
         values.pop()
     return values
 
+# -------------------------------
+# Sheet sources
+# -------------------------------
+class SheetSource:
+    """Where the sync loaders read their sheets from.
 
-# --- LOADERS (Google Sheets only) ---
+    fetch(range_type) returns [(sheet_id, values, error)] in a fixed order, values being
+    the sheet's rows with the header row first and exactly one of values/error set.
+    range_type is "students", "attendance" or "courses". With use_fingerprints off the
+    loaders import every fetch instead of skipping sheets unchanged since the last one."""
+    name = "base"
+    use_fingerprints = True
 
+    def ids(self, range_type):
+        return []
 
-def load_students_from_gsheets():
-    global _last_students_sync_ts
-    if not STUDENTS_SHEET_ID:
-        return
+    def configured(self, range_type):
+        return bool(self.ids(range_type))
+
+    def fetch(self, range_type):
+        raise NotImplementedError
 
-    # Get the correct sheet range for students
-    students_range = get_sheet_range(STUDENTS_SHEET_ID, "A:AZ", "students")
-    print(f"[DEBUG] Using students range: {students_range}")
+    def fetch_attendance(self):
+        """(fetched, ids read in full); only Google reads attendance partially."""
+        fetched = self.fetch("attendance")
+        return fetched, {sid for sid, _, error in fetched if error is None}
 
-    # Merge rows from all provided sheet IDs (first row of the first sheet is treated as headers)
+    def fetch_many(self, range_types):
+        """Prefetch several kinds together where that saves round trips; kinds left out
+        of the result are fetched by their loaders."""
+        return {}
+
+    def modified_times(self, range_type):
+        return {}
+
+class GoogleSheetSource(SheetSource):
+    """The configured spreadsheets, through the cached ranges and fetch pool above."""
+    name = "google"
+
+    def ids(self, range_type):
+        return _sheet_sources().get(range_type, ([], None))[0]
+
+    def fetch(self, range_type):
+        ids, default_range = _sheet_sources()[range_type]
+        return fetch_sheet_ranges(ids, default_range, range_type)
+
+    def fetch_attendance(self):
+        return fetch_attendance_ranges(self.ids("attendance"))
+
+    def fetch_many(self, range_types):
+        # Attendance is left to its own incremental read whenever one is possible
+        batched = [
+            rt for rt in range_types
+            if not (rt == "attendance" and attendance_incremental_ready(self.ids(rt)))
+        ]
+        return batch_fetch_sheet_ranges(batched) if len(batched) > 1 else {}
+
+    def modified_times(self, range_type):
+        return get_drive_modified_times(self.ids(range_type))
+
+class FileSheetSource(SheetSource):
+    """One local file per kind; the file path doubles as the sheet id."""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def ids(self, range_type):
+        path = self.paths.get(range_type)
+        return [path] if path and os.path.exists(path) else []
+
+    def read(self, path):
+        raise NotImplementedError
+
+    def fetch(self, range_type):
+        results = []
+        for path in self.ids(range_type):
+            try:
+                results.append((path, self.read(path), None))
+                _note_sync(bytes_fetched=os.path.getsize(path))
+            except Exception as e:
+                results.append((path, None, e))
+        return results
+
+class XlsxSheetSource(FileSheetSource):
+    name = "xlsx"
+
+    def read(self, path):
+        return read_excel_values(path)
+
+class CsvSheetSource(FileSheetSource):
+    name = "csv"
+
+    def read(self, path):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            values = [row for row in csv.reader(f)]
+        # Trim trailing empty rows, as read_excel_values does
+        while values and all(v == "" for v in values[-1]):
+            values.pop()
+        return values
+
+class FixtureSheetSource(SheetSource):
+    """Replays fetches captured as {directory}/{range_type}.json. With record_from, fetches
+    from that source instead and captures what it returned, for offline runs later."""
+    name = "fixture"
+
+    def __init__(self, directory, record_from=None):
+        self.directory = directory
+        self.record_from = record_from
+        self.use_fingerprints = record_from is not None or not SHEET_FIXTURE_IGNORE_FINGERPRINTS
+
+    def _path(self, range_type):
+        return os.path.join(self.directory, f"{range_type}.json")
+
+    def _load(self, range_type):
+        path = self._path(range_type)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        _note_sync(bytes_fetched=os.path.getsize(path))
+        return [
+            (sheet["id"], sheet.get("values"), RuntimeError(sheet["error"]) if sheet.get("error") else None)
+            for sheet in data.get("sheets", [])
+        ]
+
+    def _save(self, range_type, fetched):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(range_type), 'w', encoding='utf-8') as f:
+            json.dump({
+                "range_type": range_type,
+                "recorded_at": int(time.time()),
+                "sheets": [
+                    {"id": sid, "values": values, "error": None if error is None else str(error)}
+                    for sid, values, error in fetched
+                ]
+            }, f, ensure_ascii=False)
+
+    def ids(self, range_type):
+        if self.record_from is not None:
+            return self.record_from.ids(range_type)
+        return [sid for sid, _, _ in self._load(range_type)]
+
+    def fetch(self, range_type):
+        if self.record_from is None:
+            return self._load(range_type)
+        fetched = self.record_from.fetch(range_type)
+        self._save(range_type, fetched)
+        return fetched
+
+    def fetch_attendance(self):
+        if self.record_from is None:
+            return super().fetch_attendance()
+        fetched, full_ids = self.record_from.fetch_attendance()
+        self._save("attendance", fetched)
+        return fetched, full_ids
+
+    def fetch_many(self, range_types):
+        if self.record_from is None:
+            return {}
+        prefetched = self.record_from.fetch_many(range_types)
+        for range_type, fetched in prefetched.items():
+            self._save(range_type, fetched)
+        return prefetched
+
+    def modified_times(self, range_type):
+        return self.record_from.modified_times(range_type) if self.record_from is not None else {}
+
+# Local Excel files, also the fallback when the configured source fails
+EXCEL_SOURCE = XlsxSheetSource({"students": STUDENTS_XLSX, "attendance": ATTENDANCE_XLSX, "courses": COURSES_XLSX})
+_sheet_source = None
+
+def get_sheet_source() -> SheetSource:
+    """The source selected by SHEET_SOURCE (built once per process)."""
+    global _sheet_source
+    if _sheet_source is None:
+        if SHEET_SOURCE == "xlsx":
+            _sheet_source = EXCEL_SOURCE
+        elif SHEET_SOURCE == "csv":
+            _sheet_source = CsvSheetSource({
+                range_type: os.path.join(SHEET_CSV_DIR, f"{range_type}.csv")
+                for range_type in ("students", "attendance", "courses")
+            })
+        elif SHEET_SOURCE == "fixture":
+            _sheet_source = FixtureSheetSource(SHEET_FIXTURE_DIR)
+        else:
+            _sheet_source = GoogleSheetSource()
+            if SHEET_RECORD:
+                _sheet_source = FixtureSheetSource(SHEET_FIXTURE_DIR, record_from=_sheet_source)
+        recording = getattr(_sheet_source, "record_from", None) is not None
+        print(f"[DEBUG] Sheet source: {_sheet_source.name}" + (" (recording)" if recording else ""))
+    return _sheet_source
+
+def _first_sheet_values(source, range_type):
+    """Rows of the first sheet of a kind, raising when it could not be read."""
+    fetched = source.fetch(range_type)
+    if not fetched:
+        raise FileNotFoundError(f"No {range_type} sheet available from the {source.name} source")
+    _, values, error = fetched[0]
+    if error is not None:
+        raise error
+    return values
+
+
+# --- LOADERS (written against SheetSource) ---
+
+
+STUDENT_INSERT_COLUMNS = (
+    "reg_no", "rollno", "name", "dob", "gender", "aadhar", "student_mobile", "blood_group",
+    "parent_name", "parent_mobile", "address", "nationality", "religion", "community", "caste",
+    "day_scholar_or_hosteller", "current_semester", "seat_type", "quota_type", "email",
+    "pmss", "remarks", "bus_no", "hosteller_room_no", "outside_staying_address", "owner_ph_no",
+    "user_id", "password_hash", "password_plain", "extra_json"
+)
+
+# -------------------------------
+# Compiled header plans (student importers, /students)
+# -------------------------------
+# Sheet header aliases per student field, in STUDENT_INSERT_COLUMNS order; the first
+# alias with a non-empty cell wins (matched case-insensitively)
+STUDENT_IMPORT_FIELDS = (
+    ("reg_no", ("REG NO", "Reg no", "regno")),
+    ("rollno", ("ROLL NO", "Roll no", "RollNo", "rollno")),
+    ("name", ("NAME", "Name", "name")),
+    ("dob", ("DOB(DDNOMMNOYYYY)", "DOB", "dob", "Date of Birth")),
+    ("gender", ("GENDER(MALE(or)FEMALE)", "GENDER", "Gender", "gender")),
+    ("aadhar", ("AADHAR(12 DIGITS)", "AADHAR", "Aadhar", "aadhar")),
+    ("student_mobile", (
+        "STUDENT MOBILE NUMBER(10 DIGITS)", "Student Mobile Number", "student mobile number(10 digits)",
+        "STUDENT MOBILE", "student_mobile", "student mobile", "Phone", "phone"
+    )),
+    ("blood_group", ("BLOOD GROUP", "Blood Group", "blood group", "blood_group")),
+    ("parent_name", ("PARENT/GAURDIAN NAME", "Parent Name", "parent name")),
+    ("parent_mobile", (
+        "PARENT/GAURDIAN MOBILE NUMBER", "Parent Mobile", "parent mobile",
+        "PARENT MOBILE NUMBER", "parent_mobile", "parent mobile number"
+    )),
+    ("address", ("ADDRESS", "Address", "address")),
+    ("nationality", ("NATIONALITY", "Nationality", "nationality")),
+    ("religion", ("RELIGION", "Religion", "religion")),
+    ("community", ("COMMUNITY", "Community", "community")),
+    ("caste", ("CASTE", "Caste", "caste")),
+    ("day_scholar_or_hosteller", ("DAYSCHOLAR OR HOSTELLER", "Day Scholar or Hosteller", "day scholar or hosteller")),
+    ("current_semester", ("DEPARTMENT", "Department", "CURRENT SEMESTER", "Current Semester", "current semester")),
+    ("seat_type", ("SEAT TYPE(REGULAR(or)LATERAL)", "Seat Type", "seat type")),
+    ("quota_type", ("QUOTA TYPE(GQ(or)MQ)", "Quota Type", "quota type")),
+    ("email", ("EMAIL", "Email", "email")),
+    ("pmss", ("PMSS (YES/NO)", "PMSS", "pmss")),
+    ("remarks", ("REMARKS", "Remarks", "remarks")),
+    ("bus_no", ("BUS", "BUS NO/PRIVATE BUS", "Bus No", "bus no", "BUS NO", "bus_no", "Bus Number")),
+    ("hosteller_room_no", ("HOSTELLER ROOM NO.", "Hosteller Room No", "hosteller room no")),
+    ("outside_staying_address", (
+        "OUTSTAYING  ADDRESS", "OUTSTAYING ADDRESS", "OUTSIDE STAYING FULL ADDRESS", "Outside Staying Address",
+        "outside staying address", "OUTSIDE ADDRESS", "outside_address", "Outside Address"
+    )),
+    ("owner_ph_no", (
+        "OWNER'S PH NO", "Owner's Phone", "owner's phone", "OWNER", "owner_ph_no", "OWNER_PH_NO"
+    )),
+)
+# The Excel roster keeps its own aliases for a few fields: it falls back to the register
+# number when there is no roll number column, and names the phone columns differently
+_STUDENT_EXCEL_ALIASES = {
+    "rollno": ("Roll no", "ROLL NO", "roll no", "rollno", "REG NO", "reg no", "regno"),
+    "student_mobile": ("STUDENT MOBILE NUMBER(10 DIGITS)", "Phone", "PHONE", "phone"),
+    "owner_ph_no": (
+        "OWNER'S PH NO", "Owner's Phone", "owner's phone", "OWNER PH NO", "owner_ph_no", "OWNER_PH_NO", "OWNER"
+    ),
+}
+STUDENT_EXCEL_IMPORT_FIELDS = tuple(
+    (field, _STUDENT_EXCEL_ALIASES.get(field, aliases)) for field, aliases in STUDENT_IMPORT_FIELDS
+)
+STUDENT_ROLLNO_FIELD = [field for field, _ in STUDENT_IMPORT_FIELDS].index("rollno")
+
+# (id(field_aliases), exact, headers) -> plan; field_aliases are module-level constants
+_header_plan_cache = {}
+
+def compile_header_plan(headers, field_aliases, exact=False):
+    """Resolve every field's aliases against a header row once.
+
+    Returns a tuple aligned with field_aliases holding, per field, the candidate column
+    indexes in alias order. Plans are cached per header row."""
+    headers = tuple("" if h is None else str(h) for h in headers)
+    key = (id(field_aliases), exact, headers)
+    plan = _header_plan_cache.get(key)
+    if plan is None:
+        if exact:
+            header_map = {h: idx for idx, h in enumerate(headers)}
+        else:
+            header_map = {h.strip().lower(): idx for idx, h in enumerate(headers)}
+        compiled = []
+        for _, aliases in field_aliases:
+            candidates = []
+            for alias in aliases:
+                idx = header_map.get(alias if exact else alias.lower())
+                if idx is not None and idx not in candidates:
+                    candidates.append(idx)
+            compiled.append(tuple(candidates))
+        plan = tuple(compiled)
+        if len(_header_plan_cache) > 256:
+            _header_plan_cache.clear()
+        _header_plan_cache[key] = plan
+    return plan
+
+def plan_row_values(plan, row):
+    """Stripped value of each planned field for one row ("" when every candidate is empty)."""
+    width = len(row)
+    values = []
+    for candidates in plan:
+        value = ""
+        for idx in candidates:
+            if idx < width and row[idx] is not None:
+                cell = str(row[idx]).strip()
+                if cell:
+                    value = cell
+                    break
+        values.append(value)
+    return values
+
+def _student_extra_columns(headers):
+    """(index, header) of every named column, for the extra_json copy of the row."""
+    return [(idx, str(h)) for idx, h in enumerate(headers) if h is not None and str(h).strip() != ""]
+
+def _student_extra_json(extra_columns, row) -> str:
+    width = len(row)
+    return json.dumps({
+        header: (None if idx >= width or row[idx] is None else str(row[idx])) for idx, header in extra_columns
+    })
+
+# Columns a re-import may overwrite; rollno keys the row and passwords are never touched
+STUDENT_PROFILE_COLUMNS = tuple(
+    col for col in STUDENT_INSERT_COLUMNS if col not in ("rollno", "password_hash", "password_plain")
+)
+
+STUDENT_UPSERT_SQL = (
+    f"INSERT INTO students ({', '.join(STUDENT_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in STUDENT_INSERT_COLUMNS)}) "
+    f"ON CONFLICT(rollno) DO UPDATE SET "
+    + ", ".join(f"{col}=excluded.{col}" for col in STUDENT_PROFILE_COLUMNS)
+    + " WHERE " + " OR ".join(f"students.{col} IS NOT excluded.{col}" for col in STUDENT_PROFILE_COLUMNS)
+)
+
+# Threads hashing new students' passwords; hashlib's scrypt/pbkdf2 release the GIL,
+# so the hashes run on all cores without a process pool
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 4)))
+_STUDENT_PASSWORD_HASH_IDX = STUDENT_INSERT_COLUMNS.index("password_hash")
+_STUDENT_PASSWORD_PLAIN_IDX = STUDENT_INSERT_COLUMNS.index("password_plain")
+
+def hash_passwords(plaintexts) -> list:
+    """generate_password_hash for many passwords concurrently, in input order."""
+    if len(plaintexts) < 2 or PASSWORD_HASH_WORKERS <= 1:
+        return [generate_password_hash(p) for p in plaintexts]
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS) as pool:
+        hashes = list(pool.map(generate_password_hash, plaintexts))
+    print(f"[DEBUG] Hashed {len(plaintexts)} passwords in {time.time() - started:.2f}s on {PASSWORD_HASH_WORKERS} workers")
+    return hashes
+
+def _hash_student_passwords(rows):
+    """Fill password_hash in place for rows that carry a new password_plain."""
+    pending = [
+        i for i, row in enumerate(rows)
+        if row[_STUDENT_PASSWORD_PLAIN_IDX] is not None and row[_STUDENT_PASSWORD_HASH_IDX] is None
+    ]
+    hashes = hash_passwords([rows[i][_STUDENT_PASSWORD_PLAIN_IDX] for i in pending])
+    for i, password_hash in zip(pending, hashes):
+        row = rows[i]
+        rows[i] = row[:_STUDENT_PASSWORD_HASH_IDX] + (password_hash,) + row[_STUDENT_PASSWORD_HASH_IDX + 1:]
+
+# Fallback for tables without a unique rollno index (ON CONFLICT(rollno) needs one)
+STUDENT_INSERT_SQL = (
+    f"INSERT INTO students ({', '.join(STUDENT_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in STUDENT_INSERT_COLUMNS)})"
+)
+STUDENT_UPDATE_SQL = (
+    "UPDATE students SET " + ", ".join(f"{col}=?" for col in STUDENT_PROFILE_COLUMNS)
+    + " WHERE rollno=? AND (" + " OR ".join(f"{col} IS NOT ?" for col in STUDENT_PROFILE_COLUMNS) + ")"
+)
+_STUDENT_PROFILE_IDX = tuple(STUDENT_INSERT_COLUMNS.index(col) for col in STUDENT_PROFILE_COLUMNS)
+_STUDENT_ROLLNO_IDX = STUDENT_INSERT_COLUMNS.index("rollno")
+
+def students_rollno_unique(cur) -> bool:
+    """True when students.rollno has a unique index (the UNIQUE column or idx_students_rollno)."""
+    cur.execute("PRAGMA index_list(students)")
+    for _, name, unique, *_ in cur.fetchall():
+        if unique:
+            cur.execute(f'PRAGMA index_info("{name}")')
+            if [col[2] for col in cur.fetchall()] == ["rollno"]:
+                return True
+    return False
+
+def _write_student_rows(cur, rows) -> int:
+    """Upsert students (STUDENT_INSERT_COLUMNS order) in batches: new roll numbers are
+    inserted, existing ones get their profile columns updated only when something
+    differs; stored passwords are kept. Returns the number of rows actually written."""
+    before = cur.connection.total_changes
+    if students_rollno_unique(cur):
+        bulk_executemany(cur, STUDENT_UPSERT_SQL, rows)
+        return cur.connection.total_changes - before
+    print("[WARNING] students.rollno has no unique index; writing students with INSERT/UPDATE")
+    cur.execute("SELECT rollno FROM students")
+    existing = {r[0] for r in cur.fetchall()}
+    inserts, updates = [], []
+    for row in rows:
+        rollno = row[_STUDENT_ROLLNO_IDX]
+        if rollno in existing:
+            profile = tuple(row[i] for i in _STUDENT_PROFILE_IDX)
+            updates.append(profile + (rollno,) + profile)
+        else:
+            existing.add(rollno)
+            inserts.append(row)
+    bulk_executemany(cur, STUDENT_INSERT_SQL, inserts)
+    bulk_executemany(cur, STUDENT_UPDATE_SQL, updates)
+    return cur.connection.total_changes - before
+
+def load_students_from_gsheets(fetched=None, source=None, db=None):
+    """Import students from a sheet source (Google Sheets unless SHEET_SOURCE says
+    otherwise). `fetched` takes sheets already read, in the SheetSource.fetch shape;
+    `db` is the connection to write through (default: get_sync_connection())."""
+    global _last_students_sync_ts
+    source = source or get_sheet_source()
+    db = db or get_sync_connection()
+    cur = db.cursor()
+    if not source.configured("students"):
+        note_sync_noop()
+        return
+    sheet_ids = source.ids("students")
+    modified_times = source.modified_times("students")
+    if source.use_fingerprints and sheets_unmodified(cur, "students", sheet_ids, modified_times):
+        _note_sheet_skip("students", "unmodified")
+        _last_students_sync_ts = int(time.time())
+        return {"skipped": True}
+    if fetched is None:
+        with sync_phase("fetch"):
+            fetched = source.fetch("students")
+    if source.use_fingerprints and sheets_unchanged(cur, "students", fetched):
+        _note_sheet_skip("students")
+        _last_students_sync_ts = int(time.time())
+        return {"skipped": True}
+
+    # Merge rows from all provided sheet IDs (first row of the first sheet is treated as headers).
+    # Each spreadsheet's tab is resolved once and cached, see get_sheet_range.
+    parse_started = time.time()
     merged = []
     headers = None
-    for sid in _split_ids(STUDENTS_SHEET_ID):
-        try:
-            vals = read_sheet_values(sid, students_range)
-        except Exception as e:
-            # Fallback: if a tab name was specified but doesn't exist in this spreadsheet,
-            # retry using only the column range (first sheet).
-            try:
-                if '!' in students_range:
-                    col_only = students_range.split('!', 1)[1]
-                else:
-                    col_only = students_range
-                print(f"[FALLBACK] Retrying students read for {sid} with range '{col_only}' due to: {e}")
-                vals = read_sheet_values(sid, col_only)
-            except Exception as e2:
-                print(f"Error reading student sheet values for sheet ID {sid} (fallback failed): {e2}")
-                continue
+    for sid, vals, error in fetched:
+        if error is not None:
+            print(f"Error reading student sheet values for sheet ID {sid}: {error}")
+            continue
         if not vals:
             print(f"No values returned for student sheet ID {sid}")
             continue
@@ -731,213 +2664,75 @@ def load_students_from_gsheets():
         print("No student data found in Google Sheet.")
         return
     values = [headers] + merged
-    header_map = {str(h).strip().lower(): idx for idx, h in enumerate(headers)}
-
-    def get_by_alias(row, aliases, default=""):
-        for alias in aliases:
-            idx = header_map.get(alias.lower())
-            if idx is not None and idx < len(row) and row[idx] is not None and str(row[idx]).strip() != "":
-                return str(row[idx]).strip()
-        return default
+    plan = compile_header_plan(headers, STUDENT_IMPORT_FIELDS)
+    extra_columns = _student_extra_columns(headers)
 
-    # Insert missing students, don't overwrite existing
+    # One upsert per row; passwords are generated only for roll numbers not yet stored
+    cur.execute("SELECT rollno FROM students")
+    existing_rollnos = {row[0] for row in cur.fetchall()}
+    student_rows = []
     for row_idx, row in enumerate(values[1:], start=2):
         try:
-            rollno = get_by_alias(row, ['ROLL NO', 'Roll no', 'RollNo', 'rollno'])
+            fields = plan_row_values(plan, row)
+            rollno = fields[STUDENT_ROLLNO_FIELD]
             if not rollno:
                 continue
-
-            # --- Assign all variables before DB operations ---
-            reg_no = get_by_alias(row, ['REG NO', 'Reg no', 'regno'])
-            name = get_by_alias(row, ['NAME', 'Name', 'name'])
-            dob = get_by_alias(row, ['DOB(DDNOMMNOYYYY)', 'DOB', 'dob', 'Date of Birth'])
-            gender = get_by_alias(row, ['GENDER(MALE(or)FEMALE)', 'GENDER', 'Gender', 'gender'])
-            aadhar = get_by_alias(row, ['AADHAR(12 DIGITS)', 'AADHAR', 'Aadhar', 'aadhar'])
-            student_mobile = get_by_alias(row, [
-                'STUDENT MOBILE NUMBER(10 DIGITS)', 'Student Mobile Number', 'student mobile number(10 digits)', 
-                'STUDENT MOBILE', 'student_mobile', 'student mobile', 'Phone', 'phone'
-            ])
-            blood_group = get_by_alias(row, ['BLOOD GROUP', 'Blood Group', 'blood group', 'blood_group'])
-            parent_name = get_by_alias(row, ['PARENT/GAURDIAN NAME', 'Parent Name', 'parent name'])
-            parent_mobile = get_by_alias(row, [
-                'PARENT/GAURDIAN MOBILE NUMBER', 'Parent Mobile', 'parent mobile', 
-                'PARENT MOBILE NUMBER', 'parent_mobile', 'parent mobile number'
-            ])
-            address = get_by_alias(row, ['ADDRESS', 'Address', 'address'])
-            nationality = get_by_alias(row, ['NATIONALITY', 'Nationality', 'nationality'])
-            religion = get_by_alias(row, ['RELIGION', 'Religion', 'religion'])
-            community = get_by_alias(row, ['COMMUNITY', 'Community', 'community'])
-            caste = get_by_alias(row, ['CASTE', 'Caste', 'caste'])
-            day_scholar_or_hosteller = get_by_alias(row, ['DAYSCHOLAR OR HOSTELLER', 'Day Scholar or Hosteller', 'day scholar or hosteller'])
-            current_semester = get_by_alias(row, [
-                'DEPARTMENT', 'Department',
-                'CURRENT SEMESTER', 'Current Semester', 'current semester'
-            ])
-            seat_type = get_by_alias(row, ['SEAT TYPE(REGULAR(or)LATERAL)', 'Seat Type', 'seat type'])
-            quota_type = get_by_alias(row, ['QUOTA TYPE(GQ(or)MQ)', 'Quota Type', 'quota type'])
-            email = get_by_alias(row, ['EMAIL', 'Email', 'email'])
-            pmss = get_by_alias(row, ['PMSS (YES/NO)', 'PMSS', 'pmss'])
-            remarks = get_by_alias(row, ['REMARKS', 'Remarks', 'remarks'])
-            bus_no = get_by_alias(row, [
-                'BUS',
-                'BUS NO/PRIVATE BUS', 'Bus No', 'bus no', 'BUS NO', 'bus_no', 'Bus Number'
-            ])
-            hosteller_room_no = get_by_alias(row, ['HOSTELLER ROOM NO.', 'Hosteller Room No', 'hosteller room no'])
-            outside_staying_address = get_by_alias(row, [
-                'OUTSTAYING  ADDRESS',
-                'OUTSTAYING ADDRESS',
-                'OUTSIDE STAYING FULL ADDRESS', 'Outside Staying Address', 'outside staying address', 
-                'OUTSIDE ADDRESS', 'outside_address', 'Outside Address'
-            ])
-            owner_ph_no = get_by_alias(row, [
-                "OWNER'S PH NO", "Owner's Phone", "owner's phone", "OWNER", "owner_ph_no", "OWNER_PH_NO"
-            ])
-            user_id = f"stu{rollno}"
-
-            # Capture all remaining fields as extra JSON (header:value mapping)
-            extra = {}
-            for idx, header in enumerate(headers):
-                if idx < len(row):
-                    val = row[idx]
-                else:
-                    val = None
-                if header is None or str(header).strip() == "":
-                    continue
-                extra[str(header)] = None if val is None else str(val)
-            try:
-                extra_json = json.dumps(extra)
-            except Exception:
-                extra_json = "{}"
-            # --- End assignments ---
-
-            c.execute("SELECT 1 FROM students WHERE rollno=?", (rollno,))
-            existing_student = c.fetchone()
-            if existing_student:
-                # --- UPDATE EXISTING STUDENT (preserve existing password) ---
-                c.execute('''
-                    UPDATE students SET
-                        reg_no=?, name=?, dob=?, gender=?, aadhar=?, student_mobile=?, blood_group=?,
-                        parent_name=?, parent_mobile=?, address=?, nationality=?, religion=?, community=?, caste=?,
-                        day_scholar_or_hosteller=?, current_semester=?, seat_type=?, quota_type=?, email=?, pmss=?,
-                        remarks=?, bus_no=?, hosteller_room_no=?, outside_staying_address=?, owner_ph_no=?,
-                        user_id=?, extra_json=?
-                    WHERE rollno=?
-                ''', (
-                    reg_no, name, dob, gender, aadhar, student_mobile, blood_group,
-                    parent_name, parent_mobile, address, nationality, religion, community, caste,
-                    day_scholar_or_hosteller, current_semester, seat_type, quota_type, email, pmss,
-                    remarks, bus_no, hosteller_room_no, outside_staying_address, owner_ph_no,
-                    user_id, extra_json, rollno
-                ))
-                continue
-            # --- INSERT NEW STUDENT (generate password only for new students) ---
-            password_plain = str(random.randint(100000, 999999))
-            password_hash = generate_password_hash(password_plain)
-            c.execute('''
-                INSERT INTO students (reg_no, rollno, name, dob, gender, aadhar, student_mobile, blood_group, 
-                                    parent_name, parent_mobile, address, nationality, religion, community, caste,
-                                    day_scholar_or_hosteller, current_semester, seat_type, quota_type, email, 
-                                    pmss, remarks, bus_no, hosteller_room_no, outside_staying_address, owner_ph_no,
-                                    user_id, password_hash, password_plain, extra_json)
-                VALUES (?,?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (reg_no, rollno, name, dob, gender, aadhar, student_mobile, blood_group, 
-                  parent_name, parent_mobile, address, nationality, religion, community, caste,
-                  day_scholar_or_hosteller, current_semester, seat_type, quota_type, email, 
-                  pmss, remarks, bus_no, hosteller_room_no, outside_staying_address, owner_ph_no,
-                  user_id, password_hash, password_plain, extra_json))
+            # New roll numbers get a password now; it is hashed below with the others
+            password_plain = None
+            if rollno not in existing_rollnos:
+                password_plain = generate_password()
+                existing_rollnos.add(rollno)
+            # extra_json keeps every named column (header:value mapping)
+            student_rows.append((
+                *fields, f"stu{rollno}", None, password_plain, _student_extra_json(extra_columns, row)
+            ))
         except Exception as e:
             print(f"Error processing student row {row_idx}: {e}")
             continue
-        quota_type = get_by_alias(row, ['QUOTA TYPE(GQ(or)MQ)', 'Quota Type', 'quota type'])
-        email = get_by_alias(row, ['EMAIL', 'Email', 'email'])
-        pmss = get_by_alias(row, ['PMSS (YES/NO)', 'PMSS', 'pmss'])
-        remarks = get_by_alias(row, ['REMARKS', 'Remarks', 'remarks'])
-        bus_no = get_by_alias(row, [
-            'BUS',
-            'BUS NO/PRIVATE BUS', 'Bus No', 'bus no', 'BUS NO', 'bus_no', 'Bus Number'
-        ])
-        hosteller_room_no = get_by_alias(row, ['HOSTELLER ROOM NO.', 'Hosteller Room No', 'hosteller room no'])
-        outside_staying_address = get_by_alias(row, [
-            'OUTSTAYING  ADDRESS',
-            'OUTSTAYING ADDRESS',
-            'OUTSIDE STAYING FULL ADDRESS', 'Outside Staying Address', 'outside staying address', 
-            'OUTSIDE ADDRESS', 'outside_address', 'Outside Address'
-        ])
-        owner_ph_no = get_by_alias(row, [
-            "OWNER'S PH NO", "Owner's Phone", "owner's phone", "OWNER", "owner_ph_no", "OWNER_PH_NO"
-        ])
-        user_id = f"stu{rollno}"
-
-        # Capture all remaining fields as extra JSON (header:value mapping)
-        extra = {}
-        for idx, header in enumerate(headers):
-            if idx < len(row):
-                val = row[idx]
-            else:
-                val = None
-            if header is None or str(header).strip() == "":
-                continue
-            extra[str(header)] = None if val is None else str(val)
-        try:
-            extra_json = json.dumps(extra)
-        except Exception:
-            extra_json = "{}"
-        # --- End assignments ---
-
-        c.execute("SELECT 1 FROM students WHERE rollno=?", (rollno,))
-        existing_student = c.fetchone()
-        if existing_student:
-            # --- UPDATE EXISTING STUDENT (preserve existing password) ---
-            c.execute('''
-                UPDATE students SET
-                    reg_no=?, name=?, dob=?, gender=?, aadhar=?, student_mobile=?, blood_group=?,
-                    parent_name=?, parent_mobile=?, address=?, nationality=?, religion=?, community=?, caste=?,
-                    day_scholar_or_hosteller=?, current_semester=?, seat_type=?, quota_type=?, email=?, pmss=?,
-                    remarks=?, bus_no=?, hosteller_room_no=?, outside_staying_address=?, owner_ph_no=?,
-                    user_id=?, extra_json=?
-                WHERE rollno=?
-            ''', (
-                reg_no, name, dob, gender, aadhar, student_mobile, blood_group,
-                parent_name, parent_mobile, address, nationality, religion, community, caste,
-                day_scholar_or_hosteller, current_semester, seat_type, quota_type, email, pmss,
-                remarks, bus_no, hosteller_room_no, outside_staying_address, owner_ph_no,
-                user_id, extra_json, rollno
-            ))
-            continue
-        # --- INSERT NEW STUDENT (generate password only for new students) ---
-        password_plain = str(random.randint(100000, 999999))
-        password_hash = generate_password_hash(password_plain)
-        
-        c.execute('''
-            INSERT INTO students (reg_no, rollno, name, dob, gender, aadhar, student_mobile, blood_group, 
-                                parent_name, parent_mobile, address, nationality, religion, community, caste,
-                                day_scholar_or_hosteller, current_semester, seat_type, quota_type, email, 
-                                pmss, remarks, bus_no, hosteller_room_no, outside_staying_address, owner_ph_no,
-                                user_id, password_hash, password_plain, extra_json)
-            VALUES (?,?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (reg_no, rollno, name, dob, gender, aadhar, student_mobile, blood_group, 
-              parent_name, parent_mobile, address, nationality, religion, community, caste,
-              day_scholar_or_hosteller, current_semester, seat_type, quota_type, email, 
-              pmss, remarks, bus_no, hosteller_room_no, outside_staying_address, owner_ph_no,
-              user_id, password_hash, password_plain, extra_json))
-    conn.commit()
+    mark_sync_phase("parse", parse_started)
+    _note_sync(rows=len(student_rows))
+    with sync_phase("hash"):
+        _hash_student_passwords(student_rows)
+    with sync_phase("write"), bulk_import(f"Students import from the {source.name} sheet source", db) as import_stats:
+        import_stats["rows"] = _write_student_rows(cur, student_rows)
+        if import_stats["rows"]:
+            # Roster changes can move students between departments
+            refresh_dept_daily_rollup(cur)
+        record_sheet_fingerprints(cur, "students", fetched, modified_times)
+    print(f"Students sync: {import_stats['rows']} of {len(student_rows)} rows inserted or changed")
     _last_students_sync_ts = int(time.time())
     try:
-        c.execute("SELECT COUNT(*) FROM students")
-        total = c.fetchone()[0]
-        print(f"Students import from Google Sheets completed successfully. Total students in DB: {total}")
+        cur.execute("SELECT COUNT(*) FROM students")
+        total = cur.fetchone()[0]
+        print(f"Students import from the {source.name} sheet source completed successfully. Total students in DB: {total}")
     except Exception:
         pass
 
-def load_courses_from_gsheets():
-    if not COURSES_SHEET_ID:
+def load_courses_from_gsheets(fetched=None, source=None, db=None):
+    """Import courses from a sheet source; arguments as for load_students_from_gsheets."""
+    source = source or get_sheet_source()
+    db = db or get_sync_connection()
+    cur = db.cursor()
+    if not source.configured("courses"):
+        note_sync_noop()
         return
+    sheet_ids = source.ids("courses")
+    modified_times = source.modified_times("courses")
+    if source.use_fingerprints and sheets_unmodified(cur, "courses", sheet_ids, modified_times):
+        _note_sheet_skip("courses", "unmodified")
+        return {"skipped": True}
+    if fetched is None:
+        with sync_phase("fetch"):
+            fetched = source.fetch("courses")
+    if source.use_fingerprints and sheets_unchanged(cur, "courses", fetched):
+        _note_sheet_skip("courses")
+        return {"skipped": True}
+    parse_started = time.time()
     merged = []
     headers = None
-    for sid in _split_ids(COURSES_SHEET_ID):
-        # Get the correct sheet range for courses
-        courses_range = get_sheet_range(sid, "A:C", "courses")
-        vals = read_sheet_values(sid, courses_range)
+    for sid, vals, error in fetched:
+        if error is not None:
+            raise error
         if not vals:
             continue
         if headers is None and vals:
@@ -958,7 +2753,9 @@ def load_courses_from_gsheets():
     name_idx = col_idx('course name', 'name', 'course')
     code_idx = col_idx('course code', 'code')
     link_idx = col_idx('drive link', 'link', 'url')
-    inserted, updated = 0, 0
+    cur.execute("SELECT course_code, id FROM courses")
+    course_ids = dict(cur.fetchall())
+    course_inserts, course_updates = {}, []
     for row in values[1:]:
         course_name = (str(row[name_idx]).strip() if name_idx is not None and name_idx < len(row) and row[name_idx] is not None else "")
         course_code = (str(row[code_idx]).strip() if code_idx is not None and code_idx < len(row) and row[code_idx] is not None else "")
@@ -966,214 +2763,127 @@ def load_courses_from_gsheets():
         if not (course_name or course_code or drive_link):
             continue
         if not course_code and course_name:
-            course_code = course_name.replace(" ", "_").upper()
-        if not course_code:
-            continue
-        c.execute("SELECT id FROM courses WHERE course_code=?", (course_code,))
-        existing = c.fetchone()
-        if existing:
-            c.execute(
-                "UPDATE courses SET course_name=?, drive_link=? WHERE id=?",
-                (course_name, drive_link, existing[0])
-            )
-            updated += 1
-        else:
-            c.execute(
-                "INSERT INTO courses (course_name, course_code, drive_link) VALUES (?, ?, ?)",
-                (course_name, course_code, drive_link)
-            )
-            inserted += 1
-    conn.commit()
-    print(f"Courses sync: inserted={inserted}, updated={updated}")
-
-def load_students_from_excel():
-    global _last_students_sync_ts
-    values = read_excel_values(STUDENTS_XLSX)
-    if not values:
-        print("No student data found in Excel.")
-        return
-    headers = [str(h).strip() for h in values[0]]
-    header_map = {str(h).strip().lower(): idx for idx, h in enumerate(headers)}
-
-    def get_by_alias(row, aliases, default=""):
-        for alias in aliases:
-            idx = header_map.get(alias.lower())
-            if idx is not None and idx < len(row) and row[idx] is not None and str(row[idx]).strip() != "":
-                return str(row[idx]).strip()
-        return default
-
-    for row in values[1:]:
-        rollno = get_by_alias(row, ['Roll no', 'ROLL NO', 'roll no', 'rollno', 'REG NO', 'reg no', 'regno'])
-        if not rollno:
-            continue
-        c.execute("SELECT 1 FROM students WHERE rollno= ?", (rollno,))
-        if c.fetchone():
-            continue
-        reg_no = get_by_alias(row, ['REG NO', 'reg no', 'regno'])
-        name = get_by_alias(row, ['Name', 'NAME', 'name'])
-        dob = get_by_alias(row, ['DOB(DDNOMMNOYYYY)', 'DOB', 'dob', 'Date of Birth'])
-        gender = get_by_alias(row, ['GENDER(MALE(or)FEMALE)', 'GENDER', 'gender'])
-        aadhar = get_by_alias(row, ['AADHAR(12 DIGITS)', 'AADHAR', 'aadhar'])
-        student_mobile = get_by_alias(row, [
-            'STUDENT MOBILE NUMBER(10 DIGITS)', 'Phone', 'PHONE', 'phone'
-        ])
-        blood_group = get_by_alias(row, ['BLOOD GROUP', 'Blood Group', 'blood group', 'blood_group'])
-        parent_name = get_by_alias(row, ['PARENT/GAURDIAN NAME', 'Parent Name', 'parent name'])
-        parent_mobile = get_by_alias(row, [
-            'PARENT/GAURDIAN MOBILE NUMBER', 'Parent Mobile', 'parent mobile', 
-            'PARENT MOBILE NUMBER', 'parent_mobile', 'parent mobile number'
-        ])
-        address = get_by_alias(row, ['ADDRESS', 'Address', 'address'])
-        nationality = get_by_alias(row, ['NATIONALITY', 'Nationality', 'nationality'])
-        religion = get_by_alias(row, ['RELIGION', 'Religion', 'religion'])
-        community = get_by_alias(row, ['COMMUNITY', 'Community', 'community'])
-        caste = get_by_alias(row, ['CASTE', 'Caste', 'caste'])
-        day_scholar_or_hosteller = get_by_alias(row, ['DAYSCHOLAR OR HOSTELLER', 'Day Scholar or Hosteller', 'day scholar or hosteller'])
-        current_semester = get_by_alias(row, [
-            'DEPARTMENT', 'Department',
-            'CURRENT SEMESTER', 'Current Semester', 'current semester'
-        ])
-        seat_type = get_by_alias(row, ['SEAT TYPE(REGULAR(or)LATERAL)', 'Seat Type', 'seat type'])
-        quota_type = get_by_alias(row, ['QUOTA TYPE(GQ(or)MQ)', 'Quota Type', 'quota type'])
-        email = get_by_alias(row, ['Email', 'EMAIL', 'email'])
-        pmss = get_by_alias(row, ['PMSS (YES/NO)', 'PMSS', 'pmss'])
-        remarks = get_by_alias(row, ['REMARKS', 'Remarks', 'remarks'])
-        bus_no = get_by_alias(row, [
-            'BUS',
-            'BUS NO/PRIVATE BUS', 'Bus No', 'bus no', 'BUS NO', 'bus_no', 'Bus Number'
-        ])
-        hosteller_room_no = get_by_alias(row, ['HOSTELLER ROOM NO.', 'Hosteller Room No', 'hosteller room no'])
-        outside_staying_address = get_by_alias(row, [
-            'OUTSTAYING  ADDRESS',
-            'OUTSTAYING ADDRESS',
-            'OUTSIDE STAYING FULL ADDRESS', 'Outside Staying Address', 'outside staying address', 
-            'OUTSIDE ADDRESS', 'outside_address', 'Outside Address'
-        ])
-        owner_ph_no = get_by_alias(row, [
-            "OWNER'S PH NO", "Owner's Phone", "owner's phone", "OWNER PH NO", "owner_ph_no", "OWNER_PH_NO", "OWNER"
-        ])
-
-        user_id = f"stu{rollno}"
-
-        extra = {}
-        for idx, header in enumerate(headers):
-            val = row[idx] if idx < len(row) else None
-            if header is None or str(header).strip() == "":
-                continue
-            extra[str(header)] = None if val is None else str(val)
-        try:
-            extra_json = json.dumps(extra)
-        except Exception:
-            extra_json = "{}"
-
-        # Check if student already exists
-        c.execute("SELECT 1 FROM students WHERE rollno= ?", (rollno,))
-        existing_student = c.fetchone()
-        if existing_student:
-            # --- UPDATE EXISTING STUDENT (preserve existing password) ---
-            c.execute('''
-                UPDATE students SET
-                    reg_no=?, name=?, dob=?, gender=?, aadhar=?, student_mobile=?, blood_group=?,
-                    parent_name=?, parent_mobile=?, address=?, nationality=?, religion=?, community=?, caste=?,
-                    day_scholar_or_hosteller=?, current_semester=?, seat_type=?, quota_type=?, email=?, pmss=?,
-                    remarks=?, bus_no=?, hosteller_room_no=?, outside_staying_address=?, owner_ph_no=?,
-                    user_id=?, extra_json=?
-                WHERE rollno=?
-            ''', (
-                reg_no, name, dob, gender, aadhar, student_mobile, blood_group,
-                parent_name, parent_mobile, address, nationality, religion, community, caste,
-                day_scholar_or_hosteller, current_semester, seat_type, quota_type, email, pmss,
-                remarks, bus_no, hosteller_room_no, outside_staying_address, owner_ph_no,
-                user_id, extra_json, rollno
-            ))
+            course_code = course_name.replace(" ", "_").upper()
+        if not course_code:
             continue
+        if course_code in course_ids:
+            course_updates.append((course_name, drive_link, course_ids[course_code]))
+        else:
+            # A repeated code in the sheet overwrites the pending insert, as an update would
+            course_inserts[course_code] = (course_name, course_code, drive_link)
+    mark_sync_phase("parse", parse_started)
+    _note_sync(rows=len(course_inserts) + len(course_updates))
+    with sync_phase("write"), bulk_import(f"Courses import from the {source.name} sheet source", db) as import_stats:
+        inserted = bulk_executemany(
+            cur, "INSERT INTO courses (course_name, course_code, drive_link) VALUES (?, ?, ?)", course_inserts.values()
+        )
+        updated = bulk_executemany(cur, "UPDATE courses SET course_name=?, drive_link=? WHERE id=?", course_updates)
+        import_stats["rows"] = inserted + updated
+        record_sheet_fingerprints(cur, "courses", fetched, modified_times)
+    print(f"Courses sync: inserted={inserted}, updated={updated}")
 
-        # --- INSERT NEW STUDENT (generate password only for new students) ---
-        password_plain = str(random.randint(100000, 999999))
-        password_hash = generate_password_hash(password_plain)
-        
-        c.execute('''
-            INSERT INTO students (reg_no, rollno, name, dob, gender, aadhar, student_mobile, blood_group, 
-                                parent_name, parent_mobile, address, nationality, religion, community, caste,
-                                day_scholar_or_hosteller, current_semester, seat_type, quota_type, email, 
-                                pmss, remarks, bus_no, hosteller_room_no, outside_staying_address, owner_ph_no,
-                                user_id, password_hash, password_plain, extra_json)
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        ''', (
-            reg_no, rollno, name, dob, gender, aadhar, student_mobile, blood_group, 
-            parent_name, parent_mobile, address, nationality, religion, community, caste,
-            day_scholar_or_hosteller, current_semester, seat_type, quota_type, email, 
-            pmss, remarks, bus_no, hosteller_room_no, outside_staying_address, owner_ph_no,
-            user_id, password_hash, password_plain, extra_json
+def load_students_from_excel(db=None):
+    global _last_students_sync_ts
+    db = db or get_sync_connection()
+    cur = db.cursor()
+    with sync_phase("fetch"):
+        values = _first_sheet_values(EXCEL_SOURCE, "students")
+    if not values:
+        print("No student data found in Excel.")
+        return
+    parse_started = time.time()
+    headers = [str(h).strip() for h in values[0]]
+    plan = compile_header_plan(headers, STUDENT_EXCEL_IMPORT_FIELDS)
+    extra_columns = _student_extra_columns(headers)
+
+    # The Excel roster only adds students that are not stored yet
+    cur.execute("SELECT rollno FROM students")
+    existing_rollnos = {row[0] for row in cur.fetchall()}
+    student_rows = []
+    for row in values[1:]:
+        fields = plan_row_values(plan, row)
+        rollno = fields[STUDENT_ROLLNO_FIELD]
+        if not rollno or rollno in existing_rollnos:
+            continue
+        password_plain = generate_password()
+        student_rows.append((
+            *fields, f"stu{rollno}", None, password_plain, _student_extra_json(extra_columns, row)
         ))
-    conn.commit()
+        existing_rollnos.add(rollno)
+    mark_sync_phase("parse", parse_started)
+    _note_sync(rows=len(student_rows))
+    with sync_phase("hash"):
+        _hash_student_passwords(student_rows)
+    with sync_phase("write"), bulk_import("Students import from Excel", db) as import_stats:
+        import_stats["rows"] = _write_student_rows(cur, student_rows)
+        if import_stats["rows"]:
+            # Roster changes can move students between departments
+            refresh_dept_daily_rollup(cur)
+        clear_sheet_fingerprints(cur, "students")
+    print(f"Students import: {import_stats['rows']} of {len(student_rows)} rows inserted or changed")
     _last_students_sync_ts = int(time.time())
     try:
-        c.execute("SELECT COUNT(*) FROM students")
-        total = c.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM students")
+        total = cur.fetchone()[0]
         print(f"Students import from Excel completed successfully. Total students in DB: {total}")
     except Exception:
         pass
 
 
-def load_attendance_from_gsheets():
+def load_attendance_from_gsheets(fetched=None, source=None, db=None):
+    """Sync attendance from a sheet source; arguments as for load_students_from_gsheets."""
     global _last_attendance_sync_ts
-    print(f"[DEBUG] Starting attendance sync from Google Sheets...")
+    source = source or get_sheet_source()
+    db = db or get_sync_connection()
+    cur = db.cursor()
+    print(f"[DEBUG] Starting attendance sync from the {source.name} sheet source...")
     print(f"[DEBUG] ATTENDANCE_SHEET_ID: {ATTENDANCE_SHEET_ID}")
     print(f"[DEBUG] ATTENDANCE_RANGE: {ATTENDANCE_RANGE}")
 
-    if not ATTENDANCE_SHEET_ID:
-        print("[ERROR] No attendance sheet ID configured!")
+    if not source.configured("attendance"):
+        print("[ERROR] No attendance sheet configured!")
+        note_sync_noop()
         return
 
-    # Get the correct sheet range for attendance
-    attendance_range = get_sheet_range(ATTENDANCE_SHEET_ID, "A:ZZ", "attendance")
-    print(f"[DEBUG] Using attendance range: {attendance_range}")
-
     # NOTE: Do NOT clear the table up-front. Only clear after we have validated
     # that we actually fetched usable data, to avoid wiping existing data on failures.
 
     merged = []
     headers = None
-    sheet_ids = _split_ids(ATTENDANCE_SHEET_ID)
+    sheet_ids = source.ids("attendance")
     print(f"[DEBUG] Processing {len(sheet_ids)} sheet IDs: {sheet_ids}")
 
-    for sid in sheet_ids:
-        print(f"[DEBUG] Processing sheet ID: {sid}")
-        try:
-            vals = read_sheet_values(sid, attendance_range)
-            print(f"[DEBUG] Retrieved {len(vals) if vals else 0} rows from sheet {sid}")
-            if not vals:
-                print(f"[WARNING] No values returned for sheet ID: {sid}")
-                continue
-            if headers is None and vals:
-                headers = [str(h).strip() for h in vals[0]]
-                print(f"[DEBUG] Headers found for {sid}: {headers[:10]}...")  # Show first 10 headers
-            merged.extend(vals[1:])
-            print(f"[DEBUG] Added {len(vals[1:])} data rows from sheet {sid}")
-        except Exception as e:
-            print(f"[ERROR] Failed to read sheet {sid}: {e}")
-            # Fallback: if a tab name was specified but doesn't exist in this spreadsheet,
-            # retry using only the column range (first sheet)
-            try:
-                if '!' in attendance_range:
-                    col_only = attendance_range.split('!', 1)[1]
-                else:
-                    col_only = attendance_range
-                print(f"[FALLBACK] Retrying attendance read for {sid} with range '{col_only}'")
-                vals = read_sheet_values(sid, col_only)
-                print(f"[DEBUG] Retrieved {len(vals) if vals else 0} rows from sheet {sid} (fallback)")
-                if not vals:
-                    print(f"[WARNING] No values returned for sheet ID (fallback): {sid}")
-                    continue
-                if headers is None and vals:
-                    headers = [str(h).strip() for h in vals[0]]
-                    print(f"[DEBUG] Headers found (fallback) for {sid}: {headers[:10]}...")
-                merged.extend(vals[1:])
-                print(f"[DEBUG] Added {len(vals[1:])} data rows from sheet {sid} (fallback)")
-            except Exception as e2:
-                print(f"[ERROR] Failed to read sheet {sid} (fallback failed): {e2}")
-                continue
+    modified_times = source.modified_times("attendance")
+    if source.use_fingerprints and sheets_unmodified(cur, "attendance", sheet_ids, modified_times):
+        _note_sheet_skip("attendance", "unmodified")
+        _last_attendance_sync_ts = int(time.time())
+        return {"inserted": 0, "updated": 0, "deleted": 0, "changed": [], "skipped": True}
+    if fetched is None:
+        with sync_phase("fetch"):
+            fetched, full_ids = source.fetch_attendance()
+    else:
+        full_ids = {sid for sid, _, error in fetched if error is None}
+    if source.use_fingerprints and sheets_unchanged(cur, "attendance", fetched):
+        _note_sheet_skip("attendance")
+        # A full read that found nothing new still counts as a reconcile
+        record_attendance_snapshots(cur, fetched, full_ids)
+        db.commit()
+        _last_attendance_sync_ts = int(time.time())
+        return {"inserted": 0, "updated": 0, "deleted": 0, "changed": [], "skipped": True}
+    parse_started = time.time()
+    for sid, vals, error in fetched:
+        if error is not None:
+            print(f"[ERROR] Failed to read sheet {sid}: {error}")
+            continue
+        print(f"[DEBUG] Retrieved {len(vals) if vals else 0} rows from sheet {sid}")
+        if not vals:
+            print(f"[WARNING] No values returned for sheet ID: {sid}")
+            continue
+        if headers is None and vals:
+            headers = [str(h).strip() for h in vals[0]]
+            print(f"[DEBUG] Headers found for {sid}: {headers[:10]}...")  # Show first 10 headers
+        merged.extend(vals[1:])
+        print(f"[DEBUG] Added {len(vals[1:])} data rows from sheet {sid}")
 
     if not headers or not merged:
         print("[ERROR] No attendance data found in Google Sheet.")
@@ -1182,25 +2892,10 @@ def load_attendance_from_gsheets():
         return
     values = [headers] + merged
 
-    # Enhanced roll number column detection - try multiple patterns
-    rollno_idx = None
-    rollno_patterns = [
-        'roll no', 'rollno', 'roll_no', 'roll number', 'rollnumber',
-        'reg no', 'regno', 'registration no', 'registration number',
-        'student id', 'student_id', 'student roll', 'student_roll',
-        'enrollment no', 'enrollment_no', 'enroll no', 'enroll_no'
-    ]
-
     print(f"[DEBUG] Looking for roll number column in headers: {headers}")
-    for i, header in enumerate(headers):
-        header_lower = str(header).strip().lower()
-        for pattern in rollno_patterns:
-            if pattern in header_lower or header_lower in pattern:
-                rollno_idx = i
-                print(f"[DEBUG] Found roll number column at index {i}: '{header}' (matched pattern: '{pattern}')")
-                break
-        if rollno_idx is not None:
-            break
+    rollno_idx = find_rollno_column(headers)
+    if rollno_idx is not None:
+        print(f"[DEBUG] Found roll number column at index {rollno_idx}: '{headers[rollno_idx]}'")
 
     if rollno_idx is None:
         print("[ERROR] No roll number column found in attendance sheet")
@@ -1246,6 +2941,9 @@ def load_attendance_from_gsheets():
         print("[ERROR] No date columns found in attendance sheet")
         return
 
+    # Parse each date header once into its canonical ISO form
+    date_iso_by_idx = {idx: _to_date_iso(headers[idx]) for idx in date_columns}
+
     # Debug: Show unique status values found in the data
     unique_statuses = set()
     for row in merged[:20]:  # Check first 20 rows for status variety
@@ -1265,15 +2963,7 @@ def load_attendance_from_gsheets():
                 it_rollnos_in_sheet.add(rollno)
     print(f"[DEBUG] Found {len(it_rollnos_in_sheet)} potential IT roll numbers in attendance sheet: {sorted(list(it_rollnos_in_sheet))[:10]}...")
 
-    # Clear existing attendance data now that we have valid headers and rows
-    try:
-        c.execute("DELETE FROM attendance")
-        conn.commit()
-        print("Cleared existing attendance records before inserting new data.")
-    except Exception as e:
-        print(f"[ERROR] Could not clear attendance table prior to insert: {e}")
-        # If we cannot clear safely, abort to avoid mixing old/new rows
-        return
+    cells = []
 
     inserted_count = 0
     it_attendance_count = 0
@@ -1293,56 +2983,72 @@ def load_attendance_from_gsheets():
             if not date_label:
                 print(f"[DEBUG] Skipping column (no date label): idx={idx}, row={row}")
                 continue
-            status = str(row[idx]).strip() if idx < len(row) and row[idx] is not None else ''
-            # Normalize status to single char P/A when possible
-            s_up = status.upper()
-            if s_up in ('PRESENT','P','1','YES','Y'):
-                status = 'P'
-            elif s_up in ('ABSENT','A','0','NO','N'):
-                status = 'A'
-
-            c.execute("INSERT INTO attendance (rollno, date, status) VALUES (?, ?, ?)", (rollno, date_label, status))
+            status_code, status_raw = normalize_attendance_status(row[idx] if idx < len(row) else None)
+
+            cells.append((rollno, date_label, date_iso_by_idx[idx], status_code, status_raw))
             inserted_count += 1
             if is_it_student:
                 it_attendance_count += 1
 
-    print(f"[DEBUG] Attendance import: total rows inserted={inserted_count}, IT student rows={it_attendance_count}")
-    conn.commit()
+    mark_sync_phase("parse", parse_started)
+    _note_sync(rows=len(merged), cells=len(cells))
+
+    # Apply only the changed cells, in one transaction so a failed write keeps the old data
+    try:
+        with bulk_import(f"Attendance import from the {source.name} sheet source", db) as import_stats:
+            with sync_phase("write"):
+                sync_result = sync_attendance_cells(cur, cells)
+            changed = sync_result["changed"]
+            with sync_phase("refresh"):
+                refresh_attendance_summary(cur, changed)
+                refresh_dept_daily_rollup(cur, sync_result["days"])
+            record_sheet_fingerprints(cur, "attendance", fetched, modified_times)
+            record_attendance_snapshots(cur, fetched, full_ids)
+            import_stats["rows"] = len(cells)
+    except Exception as e:
+        # Rolled back; re-raise so the run and the caller see the failure
+        print(f"[ERROR] Could not write attendance cells ({ATTENDANCE_STORAGE} storage): {e}")
+        raise
+    print(f"[DEBUG] Attendance import: sheet cells={inserted_count}, IT student cells={it_attendance_count}")
+    print(f"[DEBUG] Attendance diff: inserted={sync_result['inserted']}, updated={sync_result['updated']}, deleted={sync_result['deleted']}")
+    print(f"[DEBUG] Attendance summary refreshed for {len(changed)} changed students")
+    if attendance_diff_changed(sync_result):
+        bump_attendance_sync_version()
+        with sync_phase("refresh"):
+            refresh_attendance_caches()
     _last_attendance_sync_ts = int(time.time())
 
     # Verify the data was actually inserted
     try:
-        c.execute("SELECT COUNT(*) FROM attendance")
-        total = c.fetchone()[0]
-        print(f"Attendance import from Google Sheets completed successfully. Total attendance rows in DB: {total}")
+        cur.execute(f"SELECT COUNT(*) FROM {attendance_source()}")
+        total = cur.fetchone()[0]
+        print(f"Attendance import from the {source.name} sheet source completed successfully. Total attendance rows in DB: {total}")
 
         # Show sample of inserted data
-        c.execute("SELECT rollno, date, status FROM attendance LIMIT 5")
-        sample_records = c.fetchall()
+        cur.execute(f"SELECT rollno, date, status_code FROM {attendance_source()} LIMIT 5")
+        sample_records = cur.fetchall()
         print(f"[DEBUG] Sample attendance records: {sample_records}")
 
         # Check for IT students with attendance data
-        c.execute("SELECT DISTINCT rollno FROM attendance WHERE rollno LIKE '%IT%' OR rollno LIKE '3%' OR rollno LIKE '4%' LIMIT 10")
-        it_students_with_attendance = c.fetchall()
+        cur.execute(f"SELECT DISTINCT rollno FROM {attendance_source()} WHERE rollno LIKE '%IT%' OR rollno LIKE '3%' OR rollno LIKE '4%' LIMIT 10")
+        it_students_with_attendance = cur.fetchall()
         print(f"[DEBUG] IT students with attendance data: {[s[0] for s in it_students_with_attendance]}")
 
     except Exception as e:
         print(f"[ERROR] Failed to verify attendance data: {e}")
-        print("Attendance import from Google Sheets completed with errors.")
+        print(f"Attendance import from the {source.name} sheet source completed with errors.")
+    return sync_result
 
-def load_attendance_from_excel():
+def load_attendance_from_excel(db=None):
     global _last_attendance_sync_ts
+    db = db or get_sync_connection()
+    cur = db.cursor()
     
-    # Clear existing attendance data to prevent duplicates
-    try:
-        c.execute("DELETE FROM attendance")
-        conn.commit()
-        print("Cleared existing attendance records before syncing from Excel.")
-    except Exception as e:
-        print(f"Error clearing attendance table: {e}")
-        return
+    cells = []
 
-    values = read_excel_values(ATTENDANCE_XLSX)
+    with sync_phase("fetch"):
+        values = _first_sheet_values(EXCEL_SOURCE, "attendance")
+    parse_started = time.time()
     if not values or len(values) < 2:
         print("No attendance data found in Excel.")
         return
@@ -1357,6 +3063,7 @@ def load_attendance_from_excel():
             print("Neither ROLL NO nor REG NO found in attendance Excel")
             return
     date_columns = [i for i, h in enumerate(headers) if i != rollno_idx]
+    date_iso_by_idx = {idx: _to_date_iso(headers[idx]) for idx in date_columns}
     for row in values[1:]:
         if rollno_idx >= len(row):
             continue
@@ -1368,47 +3075,243 @@ def load_attendance_from_excel():
             if not date_label:
                 continue
             # Always insert, even if blank or other value
-            status = str(row[idx]).strip() if idx < len(row) and row[idx] is not None else ''
-            c.execute("INSERT INTO attendance (rollno, date, status) VALUES (?, ?, ?)", (rollno, date_label, status))
-    conn.commit()
+            status_code, status_raw = normalize_attendance_status(row[idx] if idx < len(row) else None)
+            cells.append((rollno, date_label, date_iso_by_idx[idx], status_code, status_raw))
+    mark_sync_phase("parse", parse_started)
+    _note_sync(rows=len(values) - 1, cells=len(cells))
+    # Apply only the changed cells, once the file has been read
+    try:
+        with bulk_import("Attendance import from Excel", db) as import_stats:
+            with sync_phase("write"):
+                sync_result = sync_attendance_cells(cur, cells)
+            with sync_phase("refresh"):
+                refresh_attendance_summary(cur, sync_result["changed"])
+                refresh_dept_daily_rollup(cur, sync_result["days"])
+            clear_sheet_fingerprints(cur, "attendance")
+            import_stats["rows"] = len(cells)
+    except Exception as e:
+        print(f"Error writing attendance cells: {e}")
+        raise
+    print(f"Attendance diff: inserted={sync_result['inserted']}, updated={sync_result['updated']}, deleted={sync_result['deleted']}")
+    if attendance_diff_changed(sync_result):
+        bump_attendance_sync_version()
+        with sync_phase("refresh"):
+            refresh_attendance_caches()
     _last_attendance_sync_ts = int(time.time())
     try:
-        c.execute("SELECT COUNT(*) FROM attendance")
-        total = c.fetchone()[0]
+        cur.execute(f"SELECT COUNT(*) FROM {attendance_source()}")
+        total = cur.fetchone()[0]
         print(f"Attendance import from Excel completed successfully. Total attendance rows in DB: {total}")
     except Exception:
         print("Attendance import from Excel completed successfully.")
+    return sync_result
 
-# Initial data load: Google Sheets only
+# -------------------------------
+# Background sync scheduler
+# -------------------------------
+# All Google Sheets / Excel syncs run on this thread through get_sync_connection();
+# request handlers only read the DB.
 # Note: Passwords are only generated for NEW students, existing students keep their current passwords
-try:
-    if not USE_EXCEL_ONLY and STUDENTS_SHEET_ID:
-        load_students_from_gsheets()
-except Exception as e:
-    print("Error loading students:", e)
-    try:
+SYNC_SCHEDULER_ENABLED = os.environ.get("SYNC_SCHEDULER", "1") in ("1", "true", "True")
+SYNC_SCHEDULER_TICK_SECONDS = 5
+STUDENTS_SYNC_INTERVAL_SECONDS = int(os.environ.get("STUDENTS_SYNC_INTERVAL_SECONDS", "900"))
+ATTENDANCE_SYNC_INTERVAL_SECONDS = int(os.environ.get("ATTENDANCE_SYNC_INTERVAL_SECONDS", str(SYNC_TTL_SECONDS)))
+COURSES_SYNC_INTERVAL_SECONDS = int(os.environ.get("COURSES_SYNC_INTERVAL_SECONDS", "3600"))
+# Floor between two runs of the same job, however they are triggered
+SYNC_MIN_INTERVAL_SECONDS = int(os.environ.get("SYNC_MIN_INTERVAL_SECONDS", "30"))
+
+def sync_students(fetched=None, db=None):
+    """Students from the sheet source, falling back to the local Excel file."""
+    if USE_EXCEL_ONLY or not get_sheet_source().configured("students"):
         if os.path.exists(STUDENTS_XLSX):
-            load_students_from_excel()
-    except Exception as e2:
-        print("Excel load students failed:", e2)
-
-try:
-    if not USE_EXCEL_ONLY and ATTENDANCE_SHEET_ID:
-        load_attendance_from_gsheets()
-except Exception as e:
-    print("Error loading attendance:", e)
+            return load_students_from_excel(db)
+        note_sync_noop()
+        return None
     try:
+        return load_students_from_gsheets(fetched, db=db)
+    except Exception as e:
+        print("Error loading students:", e)
+        if not os.path.exists(STUDENTS_XLSX):
+            raise
+        return load_students_from_excel(db)
+
+def sync_attendance(fetched=None, db=None):
+    """Attendance from the sheet source, falling back to the local Excel file."""
+    if USE_EXCEL_ONLY or not get_sheet_source().configured("attendance"):
         if os.path.exists(ATTENDANCE_XLSX):
-            load_attendance_from_excel()
-    except Exception as e2:
-        print("Excel load attendance failed:", e2)
+            return load_attendance_from_excel(db)
+        note_sync_noop()
+        return None
+    try:
+        return load_attendance_from_gsheets(fetched, db=db)
+    except Exception as e:
+        print("Error loading attendance:", e)
+        if not os.path.exists(ATTENDANCE_XLSX):
+            raise
+        return load_attendance_from_excel(db)
+
+def sync_courses(fetched=None, db=None):
+    """Courses from the sheet source (no Excel fallback defined)."""
+    if USE_EXCEL_ONLY or not get_sheet_source().configured("courses"):
+        note_sync_noop()
+        return None
+    return load_courses_from_gsheets(fetched, db=db)
+
+# Jobs run in this order (students first so attendance rolls up against fresh departments)
+_sync_jobs = {
+    "students": {"fn": sync_students, "interval": STUDENTS_SYNC_INTERVAL_SECONDS},
+    "attendance": {"fn": sync_attendance, "interval": ATTENDANCE_SYNC_INTERVAL_SECONDS},
+    "courses": {"fn": sync_courses, "interval": COURSES_SYNC_INTERVAL_SECONDS},
+}
+for _job in _sync_jobs.values():
+    _job.update({
+        "last_run": 0, "last_finished": 0, "last_success": 0, "last_error": None,
+        "last_duration": None, "last_result": None, "inflight": None, "coalesced": 0
+    })
+
+# Serializes syncs: the loaders share the sync connection
+_sync_lock = threading.Lock()
+# Guards the per-job in-flight bookkeeping
+_sync_state_lock = threading.Lock()
+_sync_scheduler_thread = None
+# Guards starting the scheduler thread only; _sync_lock is held for whole sync runs
+_sync_scheduler_start_lock = threading.Lock()
+
+def run_sync_job(name, wait=True, fetched=None, with_outcome=False):
+    """Run a sync job single-flight and return the loader's result.
+
+    A caller arriving while the job is running joins that run and gets its result
+    (or, with wait=False, the previous result straight away). Within
+    SYNC_MIN_INTERVAL_SECONDS of the last run the previous result is returned
+    without running again. `fetched` hands the job sheets already read by sync_all.
+    With with_outcome, returns (result, outcome): "ran", "joined" (another caller's
+    run), "coalesced" (a recent run's result, nothing ran) or "previous" (wait=False)."""
+    job = _sync_jobs[name]
+
+    def _done(result, outcome):
+        return (result, outcome) if with_outcome else result
+
+    with _sync_state_lock:
+        flight = job["inflight"]
+        if flight is None:
+            if time.time() - job["last_finished"] < SYNC_MIN_INTERVAL_SECONDS:
+                job["coalesced"] += 1
+                return _done(job["last_result"], "coalesced")
+            flight = job["inflight"] = {"done": threading.Event(), "result": None, "error": None}
+            leader = True
+        else:
+            job["coalesced"] += 1
+            leader = False
+    if not leader:
+        if not wait:
+            return _done(job["last_result"], "previous")
+        flight["done"].wait()
+        if flight["error"] is not None:
+            raise flight["error"]
+        return _done(flight["result"], "joined")
+
+    try:
+        with _sync_lock:
+            job["last_run"] = time.time()
+            started = time.time()
+            try:
+                with sync_run(name):
+                    flight["result"] = job["fn"](fetched, db=get_sync_connection())
+                job["last_result"] = flight["result"]
+                job["last_success"] = int(time.time())
+                job["last_error"] = None
+            except Exception as e:
+                flight["error"] = e
+                job["last_error"] = str(e)
+            finally:
+                job["last_finished"] = time.time()
+                job["last_duration"] = round(job["last_finished"] - started, 3)
+    finally:
+        with _sync_state_lock:
+            job["inflight"] = None
+        flight["done"].set()
+    if flight["error"] is not None:
+        raise flight["error"]
+    return _done(flight["result"], "ran")
+
+def sync_all(names=None) -> dict:
+    """Run several sync jobs (default: all), letting the sheet source prefetch their
+    sheets together first (for Google, one batchGet per spreadsheet).
+    Returns {name: result or {"error": ...}}."""
+    names = [n for n in _sync_jobs if names is None or n in names]
+    source = get_sheet_source()
+    # Skip prefetching for jobs that will be coalesced or don't read the sheet source
+    now = time.time()
+    wanted = [
+        n for n in names
+        if not USE_EXCEL_ONLY and source.configured(n)
+        and _sync_jobs[n]["inflight"] is None
+        and now - _sync_jobs[n]["last_finished"] >= SYNC_MIN_INTERVAL_SECONDS
+    ]
+    prefetched = {}
+    if len(wanted) > 1:
+        try:
+            with _sync_lock, sync_run("batch_fetch"), sync_phase("fetch"):
+                prefetched = source.fetch_many(wanted)
+                if not prefetched:
+                    note_sync_noop()
+        except Exception as e:
+            print(f"[SYNC] Batched fetch failed, jobs will fetch on their own: {e}")
 
-# Try to load courses at startup (no Excel fallback defined)
-try:
-    if not USE_EXCEL_ONLY and COURSES_SHEET_ID:
-        load_courses_from_gsheets()
-except Exception as e:
-    print("Error loading courses:", e)
+    results = {}
+    for name in names:
+        try:
+            results[name] = run_sync_job(name, fetched=prefetched.get(name))
+        except Exception as e:
+            print(f"[SYNC] {name} sync failed: {e}")
+            results[name] = {"error": str(e)}
+    return results
+
+def _sync_scheduler_loop():
+    while True:
+        due = [name for name, job in _sync_jobs.items() if time.time() - job["last_run"] >= job["interval"]]
+        if due:
+            sync_all(due)
+        time.sleep(SYNC_SCHEDULER_TICK_SECONDS)
+
+def start_sync_scheduler():
+    """Start the scheduler thread once per process (the first run happens immediately)."""
+    global _sync_scheduler_thread
+    if not SYNC_SCHEDULER_ENABLED or _sync_scheduler_thread is not None:
+        return
+    with _sync_scheduler_start_lock:
+        if _sync_scheduler_thread is not None:
+            return
+        _sync_scheduler_thread = threading.Thread(target=_sync_scheduler_loop, name="sync-scheduler", daemon=True)
+        _sync_scheduler_thread.start()
+    print("[SYNC] Background sync scheduler started")
+
+def sync_status() -> dict:
+    """Last run/success/error per sync job, for /health and /sync_status."""
+    return {
+        name: {
+            "interval_seconds": job["interval"],
+            "last_run": int(job["last_run"]) or None,
+            "last_success": job["last_success"] or None,
+            "last_error": job["last_error"],
+            "last_duration_seconds": job["last_duration"],
+            "running": job["inflight"] is not None,
+            "coalesced_calls": job["coalesced"]
+        }
+        for name, job in _sync_jobs.items()
+    }
+
+# Started from the first request so only the process that serves requests syncs
+# (the debug reloader's parent process never does)
+@app.before_request
+def _ensure_sync_scheduler():
+    start_sync_scheduler()
+
+@app.after_request
+def _add_sync_headers(response):
+    if _last_attendance_sync_ts:
+        response.headers['X-Attendance-Last-Sync'] = str(_last_attendance_sync_ts)
+    return response
 
 def login_required(role):
     def decorator(f):
@@ -1445,6 +3348,15 @@ admin_credentials = {
     "password": generate_password_hash("admin123")
 }
 
+def _manual_sync_message(label, outcome, sync_result) -> str:
+    """Status line for a manual sync route: tells a fresh run from a reused result."""
+    if outcome == "coalesced":
+        return (f"{label} sync not run: the last one finished less than "
+                f"{SYNC_MIN_INTERVAL_SECONDS}s ago; showing its result.")
+    if sync_result.get("skipped"):
+        return f"{label} sync ran; the sheets were unchanged since the last import."
+    return f"{label} sync completed."
+
 # === MANUAL ATTENDANCE SYNC ENDPOINT ===
 @app.route('/sync_attendance', methods=['POST'])
 @login_required('admin')
@@ -1452,19 +3364,26 @@ def manual_sync_attendance():
     """Manually trigger attendance sync from Google Sheets"""
     try:
         print("[MANUAL SYNC] Starting manual attendance sync...")
-        load_attendance_from_gsheets()
+        sync_result, outcome = run_sync_job("attendance", with_outcome=True)
+        sync_result = sync_result or {}
         
         # Check how many records were inserted
         conn_local = sqlite3.connect('school.db')
         cur = conn_local.cursor()
-        cur.execute("SELECT COUNT(*) FROM attendance")
+        cur.execute(f"SELECT COUNT(*) FROM {attendance_source()}")
         total_records = cur.fetchone()[0]
         conn_local.close()
         
         return jsonify({
             "success": True,
-            "message": f"Attendance sync completed. Total records in database: {total_records}",
-            "total_records": total_records
+            "message": f"{_manual_sync_message('Attendance', outcome, sync_result)} Total records in database: {total_records}",
+            "outcome": outcome,
+            "coalesced": outcome == "coalesced",
+            "skipped": bool(sync_result.get("skipped")),
+            "total_records": total_records,
+            "inserted": sync_result.get("inserted", 0),
+            "updated": sync_result.get("updated", 0),
+            "deleted": sync_result.get("deleted", 0)
         })
     except Exception as e:
         print(f"[MANUAL SYNC ERROR] {e}")
@@ -1473,6 +3392,19 @@ def manual_sync_attendance():
             "message": f"Attendance sync failed: {str(e)}"
         }), 500
 
+# === MANUAL FULL SYNC ENDPOINT ===
+@app.route('/sync_all', methods=['POST'])
+@login_required('admin')
+def manual_sync_all():
+    """Manually sync students, attendance and courses together (one batchGet per spreadsheet)"""
+    results = sync_all()
+    failed = {name: r["error"] for name, r in results.items() if isinstance(r, dict) and "error" in r}
+    return jsonify({
+        "success": not failed,
+        "message": "Full sync completed" if not failed else f"Sync failed for: {', '.join(failed)}",
+        "errors": failed
+    }), (500 if failed else 200)
+
 # === MANUAL STUDENTS SYNC ENDPOINT ===
 @app.route('/sync_students', methods=['POST'])
 @login_required('admin')
@@ -1480,10 +3412,8 @@ def manual_sync_students():
     """Manually trigger students sync from Google Sheets"""
     try:
         # Run sync
-        if USE_EXCEL_ONLY:
-            load_students_from_excel()
-        else:
-            load_students_from_gsheets()
+        sync_result, outcome = run_sync_job("students", with_outcome=True)
+        sync_result = sync_result or {}
 
         # Count students
         conn_local = sqlite3.connect('school.db')
@@ -1494,7 +3424,10 @@ def manual_sync_students():
 
         return jsonify({
             "success": True,
-            "message": f"Students sync completed. Total students in database: {total}",
+            "message": f"{_manual_sync_message('Students', outcome, sync_result)} Total students in database: {total}",
+            "outcome": outcome,
+            "coalesced": outcome == "coalesced",
+            "skipped": bool(sync_result.get("skipped")),
             "total_students": total
         })
     except Exception as e:
@@ -1737,10 +3670,25 @@ def manual_attendance_sync():
         import subprocess
         import sys
 
-        # Run the attendance generator script
-        result = subprocess.run([
-            sys.executable, 'generate_attendance.py'
-        ], capture_output=True, text=True, cwd=os.getcwd())
+        # Run the attendance generator script (holding the sync lock so the
+        # scheduler does not write attendance at the same time)
+        with _sync_lock:
+            result = subprocess.run([
+                sys.executable, 'generate_attendance.py'
+            ], capture_output=True, text=True, cwd=os.getcwd())
+
+            if result.returncode == 0:
+                # The generator writes raw date headers only; fill in date_iso for the new rows
+                ensure_attendance_schema()
+                ensure_attendance_storage()
+                db = get_sync_connection()
+                cur = db.cursor()
+                cur.execute("DELETE FROM attendance_row_hashes")
+                clear_sheet_fingerprints(cur, "attendance")
+                refresh_attendance_summary(cur)
+                refresh_dept_daily_rollup(cur)
+                db.commit()
+                bump_attendance_sync_version()
 
         if result.returncode == 0:
             return jsonify({
@@ -2053,10 +4001,8 @@ def teacher_dashboard():
     try:
         conn_local = sqlite3.connect('school.db')
         cur = conn_local.cursor()
-        cur.execute("SELECT COUNT(*) FROM students WHERE rollno LIKE '323UIT%' OR current_semester = 'IT'")
-        it_count = int(cur.fetchone()[0] or 0)
-        cur.execute("SELECT COUNT(*) FROM students WHERE rollno LIKE '323UAM%' OR current_semester = 'AI & ML'")
-        aiml_count = int(cur.fetchone()[0] or 0)
+        it_count = count_department_students(cur, 'IT')
+        aiml_count = count_department_students(cur, 'AI & ML')
         conn_local.close()
     except Exception:
         it_count = it_count or 0
@@ -2110,13 +4056,12 @@ def hod_dashboard():
     c.execute("SELECT * FROM courses")
     courses = c.fetchall()
     
-    # Fetch attendance data for the department
-    if department == 'IT':
-        c.execute("SELECT * FROM attendance WHERE rollno LIKE '323UIT%'")
-    elif department == 'AI & ML':
-        c.execute("SELECT * FROM attendance WHERE rollno LIKE '323UAM%'")
-    else:
-        c.execute("SELECT * FROM attendance")
+    # Per-student attendance totals for the department (precomputed, no fact-table scan)
+    student_where, params = _department_students_where(department, alias="")
+    c.execute(
+        "SELECT * FROM attendance_summary" + (f" WHERE {_students_where_sql(student_where)}" if student_where else ""),
+        params
+    )
     attendance = c.fetchall()
     # Compute overall department counts for IT and AI & ML
     it_count = 0
@@ -2124,10 +4069,8 @@ def hod_dashboard():
     try:
         conn_local = sqlite3.connect('school.db')
         cur = conn_local.cursor()
-        cur.execute("SELECT COUNT(*) FROM students WHERE rollno LIKE '323UIT%' OR current_semester = 'IT'")
-        it_count = int(cur.fetchone()[0] or 0)
-        cur.execute("SELECT COUNT(*) FROM students WHERE rollno LIKE '323UAM%' OR current_semester = 'AI & ML'")
-        aiml_count = int(cur.fetchone()[0] or 0)
+        it_count = count_department_students(cur, 'IT')
+        aiml_count = count_department_students(cur, 'AI & ML')
         conn_local.close()
     except Exception:
         it_count = it_count or 0
@@ -2173,12 +4116,8 @@ def principal_dashboard():
         try:
             conn_local = sqlite3.connect('school.db')
             cur = conn_local.cursor()
-            cur.execute("SELECT COUNT(*) FROM students WHERE rollno LIKE '323UIT%' OR current_semester = 'IT'")
-            result = cur.fetchone()
-            it_count = int(result[0] or 0) if result else 0
-            cur.execute("SELECT COUNT(*) FROM students WHERE rollno LIKE '323UAM%' OR current_semester = 'AI & ML'")
-            result = cur.fetchone()
-            aiml_count = int(result[0] or 0) if result else 0
+            it_count = count_department_students(cur, 'IT')
+            aiml_count = count_department_students(cur, 'AI & ML')
             conn_local.close()
         except Exception as e:
             print(f"Error computing counts: {e}")
@@ -2229,6 +4168,37 @@ def logout():
 # ====================================================
 # API ENDPOINTS
 # ====================================================
+# /students: DB column -> extra_json keys tried after it (exact header names)
+STUDENT_API_FIELDS = tuple((field, (field,) + aliases) for field, aliases in (
+    ("owner_ph_no", ("OWNER'S PH NO", "OWNER PH NO", "Owner's Phone", "owner's phone", "OWNER_PH_NO", "OWNER")),
+    ("reg_no", ("REG NO", "Reg No", "RegNo")),
+    ("rollno", ("ROLL NO", "Roll No", "RollNo")),
+    ("name", ("NAME",)),
+    ("dob", ("DOB",)),
+    ("gender", ("GENDER",)),
+    ("aadhar", ("AADHAR", "AADHAAR")),
+    ("student_mobile", ("STUDENT MOBILE", "STUDENT MOBILE NUMBER", "STUDENT PHONE")),
+    ("blood_group", ("BLOOD GROUP", "BLOODGROUP")),
+    ("parent_name", ("PARENT NAME", "FATHER NAME", "GUARDIAN NAME")),
+    ("parent_mobile", ("PARENT MOBILE NUMBER", "PARENT MOBILE", "PARENT PHONE")),
+    ("address", ("ADDRESS",)),
+    ("nationality", ("NATIONALITY",)),
+    ("religion", ("RELIGION",)),
+    ("community", ("COMMUNITY", "Community")),
+    ("caste", ("CASTE",)),
+    ("day_scholar_or_hosteller", ("DAYSCHOLAR OR HOSTELLER", "DAY SCHOLAR OR HOSTELLER")),
+    ("department", ("DEPARTMENT",)),
+    ("current_semester", ("CURRENT SEMESTER", "CLASS", "SECTION", "SEMESTER")),
+    ("seat_type", ("SEAT TYPE",)),
+    ("quota_type", ("QUOTA TYPE",)),
+    ("email", ("EMAIL", "Email")),
+    ("pmss", ("PMSS",)),
+    ("scholarship", ("SCHOLARSHIP", "Scholarship")),
+    ("bus_no", ("BUS", "BUS NO", "BUS NUMBER")),
+    ("hosteller_room_no", ("HOSTELLER ROOM NO", "HOSTEL ROOM NO", "ROOM NO")),
+    ("outside_staying_address", ("OUTSTAYING  ADDRESS", "OUTSTAYING ADDRESS", "OUTSIDE STAYING ADDRESS", "OUT-STAYING ADDRESS")),
+))
+
 @app.route('/students', methods=['GET'])
 def get_students():
     conn = sqlite3.connect("school.db")
@@ -2250,35 +4220,20 @@ def get_students():
 
     if role in ('admin', 'principal'):
         # Admin/Principal can view any department
-        if q_dept:
-            cur.execute("SELECT * FROM students WHERE current_semester = ?", (q_dept,))
-        else:
-            cur.execute("SELECT * FROM students")
+        student_where, params = _department_students_where(q_dept, alias="")
+        cur.execute("SELECT * FROM students" + (f" WHERE {student_where}" if student_where else ""), params)
     elif role == 'hod':
         # HOD can ONLY see their own department (no cross-department access)
-        if dept:
-            if dept == 'IT':
-                cur.execute("SELECT * FROM students WHERE current_semester = ? OR rollno LIKE '323UIT%'", (dept,))
-            elif dept == 'AI & ML':
-                cur.execute("SELECT * FROM students WHERE current_semester = ? OR rollno LIKE '323UAM%'", (dept,))
-            else:
-                cur.execute("SELECT * FROM students WHERE current_semester = ?", (dept,))
-        else:
-            cur.execute("SELECT * FROM students")
+        student_where, params = _department_students_where(dept, alias="")
+        cur.execute("SELECT * FROM students" + (f" WHERE {student_where}" if student_where else ""), params)
     else:
         # Teacher remains restricted to their department
-        if dept:
-            if dept == 'IT':
-                cur.execute("SELECT * FROM students WHERE current_semester = ? OR rollno LIKE '323UIT%'", (dept,))
-            elif dept == 'AI & ML':
-                cur.execute("SELECT * FROM students WHERE current_semester = ? OR rollno LIKE '323UAM%'", (dept,))
-            else:
-                cur.execute("SELECT * FROM students WHERE current_semester = ?", (dept,))
-        else:
-            cur.execute("SELECT * FROM students")
+        student_where, params = _department_students_where(dept, alias="")
+        cur.execute("SELECT * FROM students" + (f" WHERE {student_where}" if student_where else ""), params)
     rows = cur.fetchall()
     conn.close()
 
+    row_keys = set(rows[0].keys()) if rows else set()
     student_list = []
     for s in rows:
         # Parse extra_json if present
@@ -2296,69 +4251,52 @@ def get_students():
                 return extra.get(col, fallback)
             return val
 
-        # Alias-aware getter for fields that may come under different header names in extra_json
-        def get_with_alias(primary_key, aliases, fallback=""):
+        # Fields that may come under different header names in extra_json, resolved
+        # through a plan compiled once per distinct set of sheet headers
+        plan = compile_header_plan(tuple(extra), STUDENT_API_FIELDS, exact=True)
+        extra_values = list(extra.values())
+        resolved = {}
+        for (field, _), candidates in zip(STUDENT_API_FIELDS, plan):
             # 1) Prefer DB column value if present
-            if primary_key in s.keys():
-                db_val = s[primary_key]
-                if db_val is not None and str(db_val).strip() != "":
-                    return db_val
-            # 2) Try exact primary key inside extra_json
-            if primary_key in extra and str(extra.get(primary_key, "")).strip() != "":
-                return extra.get(primary_key)
-            # 3) Try aliases inside extra_json
-            for k in aliases:
-                v = extra.get(k)
-                if v is not None and str(v).strip() != "":
-                    return v
-            return fallback
+            value = s[field] if field in row_keys else None
+            if value is None or str(value).strip() == "":
+                # 2) Then the field's own key and its aliases inside extra_json
+                value = ""
+                for idx in candidates:
+                    v = extra_values[idx]
+                    if v is not None and str(v).strip() != "":
+                        value = v
+                        break
+            resolved[field] = value
 
         # Normalize common fields coming from Google Sheet headers
-        owner_value = get_with_alias(
-            "owner_ph_no",
-            [
-                "OWNER'S PH NO",
-                "OWNER PH NO",
-                "Owner's Phone",
-                "owner's phone",
-                "OWNER_PH_NO",
-                "OWNER"
-            ]
-        )
-        reg_no_value = get_with_alias("reg_no", ["REG NO", "Reg No", "RegNo"]) or safe_get("reg_no")
-        rollno_value = get_with_alias("rollno", ["ROLL NO", "Roll No", "RollNo"]) or safe_get("rollno")
-        name_value = get_with_alias("name", ["NAME"]) or safe_get("name")
-        dob_value = get_with_alias("dob", ["DOB"]) or safe_get("dob")
-        gender_value = get_with_alias("gender", ["GENDER"]) or safe_get("gender")
-        aadhar_value = get_with_alias("aadhar", ["AADHAR", "AADHAAR"]) or safe_get("aadhar")
-        student_mobile_value = get_with_alias("student_mobile", ["STUDENT MOBILE", "STUDENT MOBILE NUMBER", "STUDENT PHONE"]) or safe_get("student_mobile")
-        blood_group_value = get_with_alias("blood_group", ["BLOOD GROUP", "BLOODGROUP"]) or safe_get("blood_group")
-        parent_name_value = get_with_alias("parent_name", ["PARENT NAME", "FATHER NAME", "GUARDIAN NAME"]) or safe_get("parent_name")
-        parent_mobile_value = get_with_alias("parent_mobile", ["PARENT MOBILE NUMBER", "PARENT MOBILE", "PARENT PHONE"]) or safe_get("parent_mobile")
-        address_value = get_with_alias("address", ["ADDRESS"]) or safe_get("address")
-        nationality_value = get_with_alias("nationality", ["NATIONALITY"]) or safe_get("nationality")
-        religion_value = get_with_alias("religion", ["RELIGION"]) or safe_get("religion")
-        community_value = get_with_alias("community", ["COMMUNITY", "Community"]) or safe_get("community")
-        caste_value = get_with_alias("caste", ["CASTE"]) or safe_get("caste")
-        dsh_value = get_with_alias("day_scholar_or_hosteller", ["DAYSCHOLAR OR HOSTELLER", "DAY SCHOLAR OR HOSTELLER"]) or safe_get("day_scholar_or_hosteller")
-        department_value = get_with_alias("department", ["DEPARTMENT"])  # separate from current_semester if present
-        current_semester_value = get_with_alias("current_semester", ["CURRENT SEMESTER", "CLASS", "SECTION", "SEMESTER"]) or safe_get("current_semester")
-        seat_type_value = get_with_alias("seat_type", ["SEAT TYPE"]) or safe_get("seat_type")
-        quota_type_value = get_with_alias("quota_type", ["QUOTA TYPE"]) or safe_get("quota_type")
-        email_value = get_with_alias("email", ["EMAIL", "Email"]) or safe_get("email")
-        pmss_value = get_with_alias("pmss", ["PMSS"]) or safe_get("pmss")
-        scholarship_value = get_with_alias("scholarship", ["SCHOLARSHIP", "Scholarship"]) or safe_get("scholarship")
-        bus_no_value = get_with_alias("bus_no", ["BUS", "BUS NO", "BUS NUMBER"]) or safe_get("bus_no")
-        hosteller_room_no_value = get_with_alias("hosteller_room_no", ["HOSTELLER ROOM NO", "HOSTEL ROOM NO", "ROOM NO"]) or safe_get("hosteller_room_no")
-        outside_addr_value = get_with_alias(
-            "outside_staying_address",
-            [
-                "OUTSTAYING  ADDRESS",
-                "OUTSTAYING ADDRESS",
-                "OUTSIDE STAYING ADDRESS",
-                "OUT-STAYING ADDRESS"
-            ]
-        ) or safe_get("outside_staying_address")
+        owner_value = resolved["owner_ph_no"]
+        reg_no_value = resolved["reg_no"] or safe_get("reg_no")
+        rollno_value = resolved["rollno"] or safe_get("rollno")
+        name_value = resolved["name"] or safe_get("name")
+        dob_value = resolved["dob"] or safe_get("dob")
+        gender_value = resolved["gender"] or safe_get("gender")
+        aadhar_value = resolved["aadhar"] or safe_get("aadhar")
+        student_mobile_value = resolved["student_mobile"] or safe_get("student_mobile")
+        blood_group_value = resolved["blood_group"] or safe_get("blood_group")
+        parent_name_value = resolved["parent_name"] or safe_get("parent_name")
+        parent_mobile_value = resolved["parent_mobile"] or safe_get("parent_mobile")
+        address_value = resolved["address"] or safe_get("address")
+        nationality_value = resolved["nationality"] or safe_get("nationality")
+        religion_value = resolved["religion"] or safe_get("religion")
+        community_value = resolved["community"] or safe_get("community")
+        caste_value = resolved["caste"] or safe_get("caste")
+        dsh_value = resolved["day_scholar_or_hosteller"] or safe_get("day_scholar_or_hosteller")
+        department_value = resolved["department"]  # separate from current_semester if present
+        current_semester_value = resolved["current_semester"] or safe_get("current_semester")
+        seat_type_value = resolved["seat_type"] or safe_get("seat_type")
+        quota_type_value = resolved["quota_type"] or safe_get("quota_type")
+        email_value = resolved["email"] or safe_get("email")
+        pmss_value = resolved["pmss"] or safe_get("pmss")
+        scholarship_value = resolved["scholarship"] or safe_get("scholarship")
+        bus_no_value = resolved["bus_no"] or safe_get("bus_no")
+        hosteller_room_no_value = resolved["hosteller_room_no"] or safe_get("hosteller_room_no")
+        outside_addr_value = resolved["outside_staying_address"] or safe_get("outside_staying_address")
 
         student_data = {
             "id": s["id"],
@@ -2421,15 +4359,7 @@ def get_courses():
     cur = conn_local.cursor()
     cur.execute("SELECT id, course_name, course_code, drive_link FROM courses ORDER BY course_name")
     rows = cur.fetchall()
-    # Auto-sync from Google Sheets if table is empty
-    if not rows:
-        try:
-            if not USE_EXCEL_ONLY and COURSES_SHEET_ID:
-                load_courses_from_gsheets()
-                cur.execute("SELECT id, course_name, course_code, drive_link FROM courses ORDER BY course_name")
-                rows = cur.fetchall()
-        except Exception as e:
-            print("Auto-sync courses failed:", e)
+    # Courses are synced by the background scheduler; an empty table just means no sync yet
     conn_local.close()
     return jsonify([
         {
@@ -3019,14 +4949,18 @@ def health():
         return value[:6] + '...' + value[-4:]
     
     # Check database status
+    conn_local = sqlite3.connect('school.db')
+    cur = conn_local.cursor()
     try:
-        c.execute("SELECT COUNT(*) FROM attendance")
-        attendance_count = c.fetchone()[0]
-        c.execute("SELECT COUNT(*) FROM students")
-        students_count = c.fetchone()[0]
+        cur.execute(f"SELECT COUNT(*) FROM {attendance_source()}")
+        attendance_count = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM students")
+        students_count = cur.fetchone()[0]
     except Exception as e:
         attendance_count = f"Error: {e}"
         students_count = f"Error: {e}"
+    fingerprints = sheet_fingerprint_status(cur)
+    conn_local.close()
     
     return jsonify({
         'success': True,
@@ -3038,13 +4972,49 @@ def health():
         'attendance_sheet_id': mask(ATTENDANCE_SHEET_ID),
         'students_range': STUDENTS_RANGE,
         'attendance_range': ATTENDANCE_RANGE,
+        'sheet_fingerprints': fingerprints,
         'excel_mode': USE_EXCEL_ONLY,
+        'sheet_source': SHEET_SOURCE,
         'students_xlsx_found': os.path.exists(STUDENTS_XLSX),
         'attendance_xlsx_found': os.path.exists(ATTENDANCE_XLSX),
         'database_status': {
             'attendance_records': attendance_count,
             'students_records': students_count
-        }
+        },
+        'sync': sync_status(),
+        'sync_runs': sync_metrics(limit=5)
+    })
+
+@app.route('/sync_status', methods=['GET'])
+@login_required('admin')
+def get_sync_status():
+    """Last sync times of the background scheduler's jobs."""
+    return jsonify({
+        "success": True,
+        "scheduler_running": _sync_scheduler_thread is not None,
+        "last_attendance_sync": _last_attendance_sync_ts or None,
+        "last_students_sync": _last_students_sync_ts or None,
+        "jobs": sync_status()
+    })
+
+@app.route('/sync/status', methods=['GET'])
+@login_required('admin')
+def get_sync_run_metrics():
+    """Recent sync runs with phase timings and counters, plus per-job averages.
+    ?job= filters by job, ?limit= caps the number of runs (default 20)."""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), SYNC_RUNS_HISTORY))
+    except ValueError:
+        limit = 20
+    metrics = sync_metrics()
+    job = (request.args.get('job') or '').strip()
+    recent = [run for run in metrics["recent"] if not job or run["job"] == job]
+    return jsonify({
+        "success": True,
+        "scheduler_running": _sync_scheduler_thread is not None,
+        "jobs": sync_status(),
+        "runs": recent[:limit],
+        "averages": metrics["averages"]
     })
 
 # Add this new route to your app.py file
@@ -3224,12 +5194,6 @@ def reset_teacher_password():
 @app.route('/student_attendance_average', methods=['GET'])
 @login_required('student')
 def get_student_attendance_average():
-    # Always sync attendance from Google Sheets before calculation
-    try:
-        load_attendance_from_gsheets()
-    except Exception as e:
-        print("Attendance sync failed:", e)
-
     user_id = session.get('user')
     try:
         conn_local = sqlite3.connect('school.db')
@@ -3240,8 +5204,7 @@ def get_student_attendance_average():
             conn_local.close()
             return jsonify({"success": False, "message": "Student not found"}), 404
         rollno = student[0]
-        cur.execute("SELECT status FROM attendance WHERE rollno=?", (rollno,))
-        attendance_records = cur.fetchall()
+        stats = get_attendance_stats_cached(cur, "rollno = ?", (rollno,)).get(rollno)
         conn_local.close()
     except Exception as e:
         try:
@@ -3250,7 +5213,7 @@ def get_student_attendance_average():
             pass
         return jsonify({"success": False, "message": f"Database error: {e}"}), 500
     
-    if not attendance_records:
+    if not stats:
         return jsonify({
             "success": True, 
             "attendance_average": 0, 
@@ -3258,45 +5221,13 @@ def get_student_attendance_average():
             "present_days": 0,
             "message": "No attendance records found"
         })
-    # Count only non-blank days as working days, and handle various present/absent formats
-    def present_status(s):
-        if not s or not s.strip():
-            return False
-        status = s.strip().upper()
-        return status in ['P', 'PRESENT', '1', 'YES', 'Y']
-    
-    def absent_status(s):
-        if not s or not s.strip():
-            return False
-        status = s.strip().upper()
-        return status in ['A', 'ABSENT', '0', 'NO', 'N']
-    
-    def valid_status(s):
-        return s and s.strip() != ''
-    total_days = sum(1 for record in attendance_records if valid_status(record[0]))
-    present_days = sum(1 for record in attendance_records if present_status(record[0]))
-    absent_days = sum(1 for record in attendance_records if absent_status(record[0]))
-    attendance_average = (present_days / total_days * 100) if total_days > 0 else 0
-    return jsonify({
-        "success": True,
-        "attendance_average": round(attendance_average, 2),
-        "total_days": total_days,
-        "present_days": present_days,
-        "absent_days": absent_days
-    })
+    return jsonify({"success": True, **stats})
 
 
 # === ALL STUDENTS ATTENDANCE AVERAGES ROUTE ===
 @app.route('/all_students_attendance_averages', methods=['GET'])
 @login_required('admin')
 def get_all_students_attendance_averages():
-    # Auto-sync attendance before computing
-    # Always sync attendance from Google Sheets before calculation
-    try:
-        load_attendance_from_gsheets()
-    except Exception as e:
-        print("Attendance sync failed:", e)
-    
     # Use a local connection to avoid cursor recursion
     conn_local = sqlite3.connect('school.db')
     cur_local = conn_local.cursor()
@@ -3304,44 +5235,8 @@ def get_all_students_attendance_averages():
     # Get all students (use current_semester instead of student_class)
     cur_local.execute("SELECT id, name, rollno, reg_no, current_semester FROM students")
     students = cur_local.fetchall()
-    
-    attendance_data = []
-    
-    for student in students:
-        student_id, name, rollno, reg_no, student_class = student
-        
-        # Get attendance records for this student
-        cur_local.execute("SELECT status FROM attendance WHERE rollno=?", (rollno,))
-        attendance_records = cur_local.fetchall()
-        def present_status(s):
-            if not s or not s.strip():
-                return False
-            status = s.strip().upper()
-            return status in ['P', 'PRESENT', '1', 'YES', 'Y']
-        
-        def absent_status(s):
-            if not s or not s.strip():
-                return False
-            status = s.strip().upper()
-            return status in ['A', 'ABSENT', '0', 'NO', 'N']
-        
-        def valid_status(s):
-            return s and s.strip() != ''
-        total_days = sum(1 for record in attendance_records if valid_status(record[0]))
-        present_days = sum(1 for record in attendance_records if present_status(record[0]))
-        absent_days = sum(1 for record in attendance_records if absent_status(record[0]))
-        attendance_average = (present_days / total_days * 100) if total_days > 0 else 0
-        attendance_data.append({
-            "student_id": student_id,
-            "name": name,
-            "rollno": rollno,
-            "reg_no": reg_no,
-            "class": student_class,
-            "attendance_average": round(attendance_average, 2),
-            "total_days": total_days,
-            "present_days": present_days,
-            "absent_days": absent_days
-        })
+    stats_by_rollno = get_attendance_stats_cached(cur_local)
+    attendance_data = [_attendance_average_entry(student, stats_by_rollno) for student in students]
     
     conn_local.close()
     return jsonify({
@@ -3352,12 +5247,6 @@ def get_all_students_attendance_averages():
 @app.route('/teacher/all_students_attendance_averages', methods=['GET'])
 @login_required('teacher')
 def teacher_all_students_attendance_averages():
-    # Auto-sync attendance before computing
-    # Always sync attendance from Google Sheets before calculation
-    try:
-        load_attendance_from_gsheets()
-    except Exception as e:
-        print("Attendance sync failed:", e)
     # Scope to teacher's department
     try:
         conn_local = sqlite3.connect('school.db')
@@ -3372,67 +5261,18 @@ def teacher_all_students_attendance_averages():
         except Exception:
             pass
         dept = None
-    if dept:
-        norm = (dept or '').strip().upper().replace(' ', '')
-        if norm == 'IT':
-            # Match by roll prefix or any current_semester containing IT
-            c.execute(
-                """
-                SELECT id, name, rollno, reg_no, current_semester
-                FROM students
-                WHERE rollno LIKE '323UIT%'
-                   OR UPPER(REPLACE(current_semester, ' ', '')) LIKE '%IT%'
-                """
-            )
-        elif norm in ('AI&ML','AIML','AIANDML'):
-            c.execute(
-                """
-                SELECT id, name, rollno, reg_no, current_semester
-                FROM students
-                WHERE rollno LIKE '323UAM%'
-                   OR UPPER(REPLACE(current_semester, ' ', '')) LIKE '%AI%ML%'
-                """
-            )
-        else:
-            c.execute("SELECT id, name, rollno, reg_no, current_semester FROM students WHERE current_semester = ?", (dept,))
-    else:
-        c.execute("SELECT id, name, rollno, reg_no, current_semester FROM students")
-    students = c.fetchall()
-    
-    attendance_data = []
-    for student in students:
-        student_id, name, rollno, reg_no, student_class = student
-        c.execute("SELECT status FROM attendance WHERE rollno=?", (rollno,))
-        attendance_records = c.fetchall()
-        def present_status(s):
-            if not s or not s.strip():
-                return False
-            status = s.strip().upper()
-            return status in ['P', 'PRESENT', '1', 'YES', 'Y']
-        
-        def absent_status(s):
-            if not s or not s.strip():
-                return False
-            status = s.strip().upper()
-            return status in ['A', 'ABSENT', '0', 'NO', 'N']
-        
-        def valid_status(s):
-            return s and s.strip() != ''
-        total_days = sum(1 for record in attendance_records if valid_status(record[0]))
-        present_days = sum(1 for record in attendance_records if present_status(record[0]))
-        absent_days = sum(1 for record in attendance_records if absent_status(record[0]))
-        attendance_average = (present_days / total_days * 100) if total_days > 0 else 0
-        attendance_data.append({
-            "student_id": student_id,
-            "name": name,
-            "rollno": rollno,
-            "reg_no": reg_no,
-            "class": student_class,
-            "attendance_average": round(attendance_average, 2),
-            "total_days": total_days,
-            "present_days": present_days,
-            "absent_days": absent_days
-        })
+    student_where, params = _department_students_where(dept, alias="")
+
+    conn_local = sqlite3.connect('school.db')
+    cur_local = conn_local.cursor()
+    cur_local.execute(
+        "SELECT id, name, rollno, reg_no, current_semester FROM students" + (f" WHERE {student_where}" if student_where else ""),
+        params
+    )
+    students = cur_local.fetchall()
+    stats_by_rollno = get_attendance_stats_cached(cur_local, _students_where_sql(student_where) if student_where else None, params)
+    attendance_data = [_attendance_average_entry(student, stats_by_rollno) for student in students]
+    conn_local.close()
     
     return jsonify({
         "success": True,
@@ -3442,16 +5282,6 @@ def teacher_all_students_attendance_averages():
 @app.route('/teacher/daily_absent_students', methods=['GET'])
 @login_required('teacher')
 def teacher_daily_absent_students():
-    # Auto-sync attendance before checking
-    try:
-        if int(time.time()) - _last_attendance_sync_ts > SYNC_TTL_SECONDS:
-            if USE_EXCEL_ONLY or not ATTENDANCE_SHEET_ID:
-                load_attendance_from_excel()
-            else:
-                load_attendance_from_gsheets()
-    except Exception as e:
-        print("Attendance auto-sync failed:", e)
-
     # Scope to teacher's department
     try:
         conn_local = sqlite3.connect('school.db')
@@ -3471,26 +5301,9 @@ def teacher_daily_absent_students():
         if 'conn_local' not in locals():
             conn_local = sqlite3.connect('school.db')
             cur_local = conn_local.cursor()
-        if dept:
-            cur_local.execute("SELECT rollno, name, current_semester FROM students WHERE current_semester=?", (dept,))
-        else:
-            cur_local.execute("SELECT rollno, name, current_semester FROM students")
-        students = cur_local.fetchall()
-
-        today_iso = time.strftime('%Y-%m-%d').lower()
-        today_dmy = time.strftime('%d-%m-%Y').lower()
-        today_dmy_mon = time.strftime('%d-%b-%Y').lower()
-        today_dmy_mon2 = time.strftime('%d-%b-%y').lower()
-        for rollno, name, current_semester in students:
-            c.execute("SELECT status FROM attendance WHERE rollno=? AND LOWER(date) IN (?, ?, ?, ?)", (rollno, today_iso, today_dmy, today_dmy_mon, today_dmy_mon2))
-            attendance_record = c.fetchone()
-            if not attendance_record or (attendance_record[0] and attendance_record[0].lower() in ['absent', 'a', '0', 'no']):
-                absent_students.append({
-                    "rollno": rollno,
-                    "name": name,
-                    "class": current_semester,
-                    "status": "Absent" if attendance_record else "No record"
-                })
+        today_iso = datetime.date.today().isoformat()
+        student_where, params = _department_students_where(dept)
+        absent_students = resolve_daily_absent(cur_local, today_iso, student_where, params)
         conn_local.close()
     except Exception as e:
         print("Error fetching teacher daily absent:", e)
@@ -3502,16 +5315,49 @@ def teacher_daily_absent_students():
 
     return jsonify({"success": True, "absent_students": absent_students})
 
+@app.route('/attendance/stats', methods=['GET'])
+@login_required_any(('teacher', 'hod', 'principal', 'admin'))
+def attendance_window_stats_api():
+    """Attendance stats over a date window: ?from=&to= (any sheet date format) and ?dept=."""
+    date_from = _to_date_iso(request.args.get('from')) if request.args.get('from') else None
+    date_to = _to_date_iso(request.args.get('to')) if request.args.get('to') else None
+    if (request.args.get('from') and not date_from) or (request.args.get('to') and not date_to):
+        return jsonify({"success": False, "message": "Invalid from/to date"}), 400
+
+    conn_local = sqlite3.connect('school.db')
+    cur_local = conn_local.cursor()
+    role = session.get('role')
+    dept = (request.args.get('dept') or '').strip() or None
+    if role in ('teacher', 'hod'):
+        # Teachers and HODs only see their own department
+        cur_local.execute("SELECT department FROM teachers WHERE user_id=?", (session.get('user'),))
+        row = cur_local.fetchone()
+        dept = (row[0] or '').strip() if row and row[0] else None
+
+    student_where, params = _department_students_where(dept)
+    cur_local.execute(
+        "SELECT s.id, s.name, s.rollno, s.reg_no, s.current_semester FROM students s"
+        + (f" WHERE {student_where}" if student_where else ""),
+        params
+    )
+    students = cur_local.fetchall()
+    conn_local.close()
+
+    prefix = get_attendance_prefix_sums()
+    stats_by_rollno = attendance_window_stats(prefix, date_from, date_to, [student[2] for student in students])
+    lo, hi = _attendance_window_bounds(prefix["dates"], date_from, date_to)
+    return jsonify({
+        "success": True,
+        "from": date_from,
+        "to": date_to,
+        "department": dept,
+        "days": hi - lo,
+        "students": [_attendance_average_entry(student, stats_by_rollno) for student in students]
+    })
+
 @app.route('/hod/all_students_attendance_averages', methods=['GET'])
 @login_required('hod')
 def hod_all_students_attendance_averages():
-    # Auto-sync attendance before computing
-    # Always sync attendance from Google Sheets before calculation
-    try:
-        load_attendance_from_gsheets()
-    except Exception as e:
-        print("Attendance sync failed:", e)
-    
     # Use a local connection to avoid cursor recursion
     conn_local = sqlite3.connect('school.db')
     cur_local = conn_local.cursor()
@@ -3525,17 +5371,11 @@ def hod_all_students_attendance_averages():
         department = None
 
     # Return only students from HOD's department
-    if department:
-        if department == 'IT':
-            cur_local.execute("SELECT * FROM students WHERE current_semester = ? OR rollno LIKE '323UIT%'", (department,))
-        elif department == 'AI & ML':
-            cur_local.execute("SELECT * FROM students WHERE current_semester = ? OR rollno LIKE '323UAM%'", (department,))
-        else:
-            cur_local.execute("SELECT * FROM students WHERE current_semester = ?", (department,))
-    else:
-        cur_local.execute("SELECT * FROM students")
+    student_where, params = _department_students_where(department, alias="")
+    cur_local.execute("SELECT * FROM students" + (f" WHERE {student_where}" if student_where else ""), params)
     students = cur_local.fetchall()
     columns = [desc[0] for desc in cur_local.description]
+    stats_by_rollno = get_attendance_stats_cached(cur_local, _students_where_sql(student_where) if student_where else None, params)
     attendance_data = []
     for student in students:
         student_dict = dict(zip(columns, student))
@@ -3552,31 +5392,8 @@ def hod_all_students_attendance_averages():
                 student_dict[k] = v
         # Attendance calculation
         rollno = student_dict.get("rollno", "")
-        cur_local.execute("SELECT status FROM attendance WHERE rollno= ?", (rollno,))
-        attendance_records = cur_local.fetchall()
-        def present_status(s):
-            if not s or not s.strip():
-                return False
-            status = s.strip().upper()
-            return status in ['P', 'PRESENT', '1', 'YES', 'Y']
-        
-        def absent_status(s):
-            if not s or not s.strip():
-                return False
-            status = s.strip().upper()
-            return status in ['A', 'ABSENT', '0', 'NO', 'N']
-        
-        def valid_status(s):
-            return s and s.strip() != ''
-        total_days = sum(1 for record in attendance_records if valid_status(record[0]))
-        present_days = sum(1 for record in attendance_records if present_status(record[0]))
-        absent_days = sum(1 for record in attendance_records if absent_status(record[0]))
-        attendance_average = (present_days / total_days * 100) if total_days > 0 else 0
         # Add attendance stats to student_dict
-        student_dict["attendance_average"] = round(attendance_average, 2)
-        student_dict["total_days"] = total_days
-        student_dict["present_days"] = present_days
-        student_dict["absent_days"] = absent_days
+        student_dict.update(stats_by_rollno.get(rollno) or _empty_attendance_stats())
         # Remove sensitive fields
         student_dict.pop("password_hash", None)
         student_dict.pop("password_plain", None)
@@ -3589,16 +5406,6 @@ def hod_all_students_attendance_averages():
 @app.route('/hod/daily_absent_students', methods=['GET'])
 @login_required('hod')
 def hod_daily_absent_students():
-    # Auto-sync attendance before checking
-    try:
-        if int(time.time()) - _last_attendance_sync_ts > SYNC_TTL_SECONDS:
-            if USE_EXCEL_ONLY or not ATTENDANCE_SHEET_ID:
-                load_attendance_from_excel()
-            else:
-                load_attendance_from_gsheets()
-    except Exception as e:
-        print("Attendance auto-sync failed:", e)
-
     # Get HOD's department using a local connection
     try:
         conn_local = sqlite3.connect('school.db')
@@ -3616,31 +5423,10 @@ def hod_daily_absent_students():
             conn_local = sqlite3.connect('school.db')
             cur_local = conn_local.cursor()
         # HOD can only see their own department
-        if department:
-            if department == 'IT':
-                cur_local.execute("SELECT rollno, name, current_semester FROM students WHERE current_semester=? OR rollno LIKE '323UIT%'", (department,))
-            elif department == 'AI & ML':
-                cur_local.execute("SELECT rollno, name, current_semester FROM students WHERE current_semester=? OR rollno LIKE '323UAM%'", (department,))
-            else:
-                cur_local.execute("SELECT rollno, name, current_semester FROM students WHERE current_semester=?", (department,))
-        else:
-            cur_local.execute("SELECT rollno, name, current_semester FROM students")
-        students = cur_local.fetchall()
-
-        date_variants = _get_target_date_variants_for_attendance()
-        for rollno, name, current_semester in students:
-            cur_local.execute(
-                "SELECT status FROM attendance WHERE rollno=? AND LOWER(date) IN (?, ?, ?, ?)",
-                (rollno, *(date_variants + ['',''])[:4])
-            )
-            attendance_record = cur_local.fetchone()
-            if not attendance_record or (attendance_record[0] and attendance_record[0].lower() in ['absent', 'a', '0', 'no']):
-                absent_students.append({
-                    "rollno": rollno,
-                    "name": name,
-                    "class": current_semester,
-                    "status": "Absent" if attendance_record else "No record"
-                })
+        student_where, params = _department_students_where(department)
+
+        target_date = _get_target_attendance_date()
+        absent_students = resolve_daily_absent(cur_local, target_date, student_where, params)
         conn_local.close()
     except Exception as e:
         print("Error fetching daily absent students:", e)
@@ -3656,36 +5442,12 @@ def hod_daily_absent_students():
 @app.route('/principal/daily_absent_students', methods=['GET'])
 @login_required('principal')
 def principal_daily_absent_students():
-    # Auto-sync attendance before checking
-    try:
-        if int(time.time()) - _last_attendance_sync_ts > SYNC_TTL_SECONDS:
-            if USE_EXCEL_ONLY or not ATTENDANCE_SHEET_ID:
-                load_attendance_from_excel()
-            else:
-                load_attendance_from_gsheets()
-    except Exception as e:
-        print("Attendance auto-sync failed:", e)
-
     absent_students = []
     try:
         conn_local = sqlite3.connect('school.db')
         cur_local = conn_local.cursor()
-        cur_local.execute("SELECT rollno, name, current_semester FROM students")
-        students = cur_local.fetchall()
-        date_variants = _get_target_date_variants_for_attendance()
-        for rollno, name, current_semester in students:
-            cur_local.execute(
-                "SELECT status FROM attendance WHERE rollno=? AND LOWER(date) IN (?, ?, ?, ?)",
-                (rollno, *(date_variants + ['',''])[:4])
-            )
-            attendance_record = cur_local.fetchone()
-            if not attendance_record or (attendance_record[0] and attendance_record[0].lower() in ['absent', 'a', '0', 'no']):
-                absent_students.append({
-                    "rollno": rollno,
-                    "name": name,
-                    "class": current_semester,
-                    "status": "Absent" if attendance_record else "No record"
-                })
+        target_date = _get_target_attendance_date()
+        absent_students = resolve_daily_absent(cur_local, target_date)
         conn_local.close()
     except Exception as e:
         print("Error fetching principal daily absent:", e)
@@ -3701,33 +5463,10 @@ def principal_daily_absent_students():
 @app.route('/daily_absent_students', methods=['GET'])
 @login_required('admin')
 def admin_daily_absent_students():
-    try:
-        if int(time.time()) - _last_attendance_sync_ts > SYNC_TTL_SECONDS:
-            if USE_EXCEL_ONLY or not ATTENDANCE_SHEET_ID:
-                load_attendance_from_excel()
-            else:
-                load_attendance_from_gsheets()
-    except Exception as e:
-        print("Attendance auto-sync failed:", e)
-
     absent_students = []
     try:
-        c.execute("SELECT rollno, name, current_semester FROM students")
-        students = c.fetchall()
-        date_variants = _get_target_date_variants_for_attendance()
-        for rollno, name, current_semester in students:
-            c.execute(
-                "SELECT status FROM attendance WHERE rollno=? AND LOWER(date) IN (?, ?, ?, ?)",
-                (rollno, *(date_variants + ['',''])[:4])
-            )
-            attendance_record = c.fetchone()
-            if not attendance_record or (attendance_record[0] and attendance_record[0].lower() in ['absent', 'a', '0', 'no']):
-                absent_students.append({
-                    "rollno": rollno,
-                    "name": name,
-                    "class": current_semester,
-                    "status": "Absent" if attendance_record else "No record"
-                })
+        target_date = _get_target_attendance_date()
+        absent_students = resolve_daily_absent(c, target_date)
     except Exception as e:
         print("Error fetching admin daily absent:", e)
         return jsonify({"success": False, "message": "Error fetching daily absent students"}), 500
@@ -3738,55 +5477,66 @@ def admin_daily_absent_students():
 @app.route('/principal/all_students_attendance_averages', methods=['GET'])
 @login_required('principal')
 def principal_all_students_attendance_averages():
-       # Always sync attendance from Google Sheets before calculation
-    try:
-        load_attendance_from_gsheets()
-    except Exception as e:
-        pass
-
     conn_local = sqlite3.connect('school.db')
     cur_local = conn_local.cursor()
 
     cur_local.execute("SELECT id, name, rollno, reg_no, current_semester FROM students")
     students = cur_local.fetchall()
-    attendance_data = []
-    for student in students:
-        student_id, name, rollno, reg_no, student_class = student
-        cur_local.execute("SELECT status FROM attendance WHERE rollno=?", (rollno,))
-        attendance_records = cur_local.fetchall()
-        def present_status(s):
-            if not s or not s.strip():
-                return False
-            status = s.strip().upper()
-            return status in ['P', 'PRESENT', '1', 'YES', 'Y']
-        
-        def absent_status(s):
-            if not s or not s.strip():
-                return False
-            status = s.strip().upper()
-            return status in ['A', 'ABSENT', '0', 'NO', 'N']
-        
-        def valid_status(s):
-            return s and s.strip() != ''
-        total_days = sum(1 for record in attendance_records if valid_status(record[0]))
-        present_days = sum(1 for record in attendance_records if present_status(record[0]))
-        absent_days = sum(1 for record in attendance_records if absent_status(record[0]))
-        attendance_average = (present_days / total_days * 100) if total_days > 0 else 0
-        attendance_data.append({
-            "student_id": student_id,
-            "name": name,
-            "rollno": rollno,
-            "reg_no": reg_no,
-            "class": student_class,
-            "attendance_average": round(attendance_average, 2),
-            "total_days": total_days,
-            "present_days": present_days,
-            "absent_days": absent_days
-        })
+    stats_by_rollno = get_attendance_stats_cached(cur_local)
+    attendance_data = [_attendance_average_entry(student, stats_by_rollno) for student in students]
     
     conn_local.close()
     return jsonify({"success": True, "students": attendance_data})
  
+# --- Principal: department attendance trend ---
+@app.route('/principal/attendance_trend', methods=['GET'])
+@login_required('principal')
+def principal_attendance_trend():
+    """Daily present/absent/blank series per department from dept_daily_rollup.
+    Optional ?dept=, ?from= and ?to= narrow the series."""
+    date_from = _to_date_iso(request.args.get('from')) if request.args.get('from') else None
+    date_to = _to_date_iso(request.args.get('to')) if request.args.get('to') else None
+    if (request.args.get('from') and not date_from) or (request.args.get('to') and not date_to):
+        return jsonify({"success": False, "message": "Invalid from/to date"}), 400
+    dept = (request.args.get('dept') or '').strip()
+
+    conditions, params = [], []
+    if dept:
+        conditions.append("dept = ?")
+        params.append(dept)
+    if date_from:
+        conditions.append("day >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("day <= ?")
+        params.append(date_to)
+    try:
+        conn_local = sqlite3.connect('school.db')
+        cur_local = conn_local.cursor()
+        cur_local.execute(
+            "SELECT dept, day, present, absent, blank FROM dept_daily_rollup"
+            + (" WHERE " + " AND ".join(conditions) if conditions else "")
+            + " ORDER BY dept, day",
+            params
+        )
+        rows = cur_local.fetchall()
+        conn_local.close()
+    except Exception as e:
+        print("Error fetching attendance trend:", e)
+        return jsonify({"success": False, "message": "Error fetching attendance trend"}), 500
+
+    series = {}
+    for row_dept, day, present, absent, blank in rows:
+        marked = (present or 0) + (absent or 0)
+        series.setdefault(row_dept, []).append({
+            "day": day,
+            "present": present or 0,
+            "absent": absent or 0,
+            "blank": blank or 0,
+            "attendance_percentage": round(present / marked * 100, 2) if marked else 0
+        })
+    return jsonify({"success": True, "series": series})
+
 # === DEBUG: Analyze IT Student Attendance ===
 @app.route('/debug/it_attendance_analysis', methods=['GET'])
 @login_required('admin')
@@ -3809,10 +5559,10 @@ def debug_it_attendance_analysis():
         results["steps"].append(f"✓ Found {it_students_count} IT students in database")
 
         # Step 2: Check attendance data for IT students
-        cur.execute("""
-            SELECT s.rollno, s.name, s.current_semester, COUNT(a.id) as attendance_count
+        cur.execute(f"""
+            SELECT s.rollno, s.name, s.current_semester, COUNT(a.rollno) as attendance_count
             FROM students s
-            LEFT JOIN attendance a ON s.rollno = a.rollno
+            LEFT JOIN {attendance_source()} a ON s.rollno = a.rollno
             WHERE s.current_semester LIKE '%IT%'
             GROUP BY s.rollno, s.name, s.current_semester
             ORDER BY attendance_count DESC
@@ -3841,18 +5591,18 @@ def debug_it_attendance_analysis():
         # Step 4: Check attendance sheet structure
         try:
             # Get a sample of attendance data to analyze patterns
-            cur.execute("""
-                SELECT DISTINCT rollno, date, status
-                FROM attendance
+            cur.execute(f"""
+                SELECT DISTINCT rollno, date, status_code, status_raw
+                FROM {attendance_source()}
                 WHERE rollno IN (SELECT rollno FROM students WHERE current_semester LIKE '%IT%')
-                ORDER BY date DESC
+                ORDER BY date_iso DESC
                 LIMIT 10
             """)
             sample_attendance = cur.fetchall()
 
             if sample_attendance:
                 results["data_analysis"]["sample_it_attendance"] = [
-                    {"rollno": row[0], "date": row[1], "status": row[2]}
+                    {"rollno": row[0], "date": row[1], "status": attendance_status_label(row[2], row[3])}
                     for row in sample_attendance
                 ]
                 results["steps"].append("✓ Sample IT attendance data found")
@@ -3863,10 +5613,10 @@ def debug_it_attendance_analysis():
             results["errors"].append(f"Error analyzing attendance data: {e}")
 
         # Step 5: Check for roll number mismatches
-        cur.execute("""
+        cur.execute(f"""
             SELECT s.rollno as student_rollno, a.rollno as attendance_rollno
             FROM students s
-            LEFT JOIN attendance a ON s.rollno = a.rollno
+            LEFT JOIN {attendance_source()} a ON s.rollno = a.rollno
             WHERE s.current_semester LIKE '%IT%'
             AND (a.rollno IS NULL OR s.rollno != a.rollno)
             LIMIT 5
@@ -3883,16 +5633,16 @@ def debug_it_attendance_analysis():
             results["steps"].append("✓ No obvious roll number mismatches")
 
         # Step 6: Check unique statuses for IT students
-        cur.execute("""
-            SELECT DISTINCT status
-            FROM attendance
+        cur.execute(f"""
+            SELECT DISTINCT status_code, status_raw
+            FROM {attendance_source()}
             WHERE rollno IN (SELECT rollno FROM students WHERE current_semester LIKE '%IT%')
-            AND status IS NOT NULL AND status != ''
+            AND status_code != {STATUS_BLANK}
         """)
         unique_statuses = cur.fetchall()
 
         if unique_statuses:
-            results["data_analysis"]["it_unique_statuses"] = [row[0] for row in unique_statuses]
+            results["data_analysis"]["it_unique_statuses"] = sorted({attendance_status_label(code, raw) for code, raw in unique_statuses})
             results["steps"].append(f"✓ Found unique statuses for IT students: {results['data_analysis']['it_unique_statuses']}")
         else:
             results["steps"].append("✗ No status values found for IT students")
@@ -3912,7 +5662,7 @@ if __name__ == '__main__':
     except Exception:
         stu_count = 0
     try:
-        c.execute("SELECT COUNT(*) FROM attendance")
+        c.execute(f"SELECT COUNT(*) FROM {attendance_source()}")
         att_count = c.fetchone()[0]
     except Exception:
         att_count = 0
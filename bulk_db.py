@@ -0,0 +1,70 @@
+"""
+Bulk SQLite write helpers
+Shared by app.py and the attendance generator scripts
+"""
+
+import contextlib
+import os
+import time
+
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "5000"))
+BULK_CACHE_SIZE_KB = int(os.environ.get("BULK_CACHE_SIZE_KB", "65536"))
+
+def bulk_executemany(cur, sql, rows, chunk_size=None) -> int:
+    """Stream `rows` (any iterable of tuples) into executemany in chunks. Returns the row count."""
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            cur.executemany(sql, chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        cur.executemany(sql, chunk)
+        total += len(chunk)
+    return total
+
+@contextlib.contextmanager
+def bulk_import(label, db):
+    """Run an import on `db` as one transaction with synchronous=OFF and a larger page
+    cache, then restore both pragmas and print rows/sec. Yields a dict; set its "rows".
+
+    The safety level cannot change inside a transaction, so `db` must not have one
+    open: pass a connection of the import's own, never one shared with other threads."""
+    if db.in_transaction:
+        raise RuntimeError(f"{label}: bulk_import needs a connection without an open transaction")
+    cur = db.cursor()
+    cur.execute("PRAGMA synchronous")
+    old_synchronous = cur.fetchone()[0]
+    cur.execute("PRAGMA cache_size")
+    old_cache_size = cur.fetchone()[0]
+    cur.execute("PRAGMA synchronous = OFF")
+    cur.execute(f"PRAGMA cache_size = {-BULK_CACHE_SIZE_KB}")
+    stats = {"rows": 0}
+    started = time.time()
+    try:
+        # Explicit BEGIN: sqlite3 would let DDL (a shadow table swap) run outside the transaction
+        cur.execute("BEGIN")
+        yield stats
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.execute(f"PRAGMA synchronous = {int(old_synchronous)}")
+        cur.execute(f"PRAGMA cache_size = {int(old_cache_size)}")
+        elapsed = time.time() - started
+        rate = stats["rows"] / elapsed if elapsed > 0 else 0
+        print(f"[DEBUG] {label}: {stats['rows']} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+
+def bulk_insert(conn, sql, rows, clear_sql=None, chunk_size=None) -> int:
+    """Insert rows in one bulk_import transaction (after running `clear_sql`, if given).
+    Returns the number of rows inserted."""
+    with bulk_import("Bulk insert", conn) as stats:
+        cur = conn.cursor()
+        if clear_sql:
+            cur.execute(clear_sql)
+        stats["rows"] = bulk_executemany(cur, sql, rows, chunk_size)
+    return stats["rows"]
@@ -6,6 +6,8 @@ Creates sample attendance data for testing
 
 import pandas as pd
 import sqlite3
+import os
+from bulk_db import bulk_insert
 from datetime import datetime, timedelta
 import random
 
@@ -65,7 +67,7 @@ def generate_attendance_data():
             'XENA S', 'YASH K', 'ZOE R', 'ADAM M', 'BELLA S'
         ]
 
-        name = student_names[i-1] if i-1 < len(student_names) else f'Student {i"03d"}'
+        name = student_names[i-1] if i-1 < len(student_names) else f'Student {i:03d}'
 
         row = {'S. No.': i, 'ROLL NO': rollno, 'NAME': name, 'BRANCH': 'IT'}
 
@@ -130,12 +132,8 @@ def load_to_database():
         conn = sqlite3.connect('school.db')
         cursor = conn.cursor()
 
-        # Clear existing attendance
-        cursor.execute('DELETE FROM attendance')
-        print("✅ Cleared existing attendance data")
-
-        # Insert attendance data
-        inserted_count = 0
+        # Collect attendance rows, then replace the table in one transaction
+        rows = []
         it_count = 0
 
         for _, row in df.iterrows():
@@ -156,13 +154,16 @@ def load_to_database():
                         elif status in ['A', 'ABSENT', '0', 'NO', 'N']:
                             status = 'A'
 
-                        cursor.execute('INSERT INTO attendance (rollno, date, status) VALUES (?, ?, ?)',
-                                     (rollno, str(col), status))
-                        inserted_count += 1
+                        rows.append((rollno, str(col), status))
                         if is_it:
                             it_count += 1
 
-        conn.commit()
+        # Clear existing attendance and insert the new rows together
+        inserted_count = bulk_insert(
+            conn, 'INSERT INTO attendance (rollno, date, status) VALUES (?, ?, ?)', rows,
+            clear_sql='DELETE FROM attendance'
+        )
+        print("✅ Replaced existing attendance data")
         conn.close()
 
         print(f"✅ Successfully inserted {inserted_count} attendance records")
@@ -0,0 +1,63 @@
+import csv
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tables the sync tests write; emptied before each test
+SYNC_TABLES = (
+    "attendance", "attendance_row_hashes", "attendance_summary", "attendance_sheet_snapshots",
+    "dept_daily_rollup", "sheet_fingerprints", "students", "sync_runs",
+)
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """Import app.py once, against a fresh school.db and the CSV sheet source in a temp dir."""
+    workdir = tmp_path_factory.mktemp("school")
+    os.chdir(workdir)  # app.py opens school.db in the working directory
+    os.environ.update({
+        "SYNC_SCHEDULER": "0",
+        "SHEET_SOURCE": "csv",
+        "SHEET_CSV_DIR": str(workdir),
+        "SYNC_MIN_INTERVAL_SECONDS": "0",
+        "PASSWORD_HASH_WORKERS": "1",
+    })
+    sys.path.insert(0, REPO_ROOT)
+    import app
+    return app
+
+
+@pytest.fixture
+def app(app_module):
+    db = app_module.get_sync_connection()
+    for table in SYNC_TABLES:
+        db.execute(f"DELETE FROM {table}")
+    db.commit()
+    for job in app_module._sync_jobs.values():
+        job["last_finished"] = 0
+    for range_type in ("students", "attendance", "courses"):
+        path = os.path.join(app_module.SHEET_CSV_DIR, f"{range_type}.csv")
+        if os.path.exists(path):
+            os.remove(path)
+    return app_module
+
+
+@pytest.fixture
+def write_sheet(app):
+    """Write rows to the CSV sheet the source reads for a range type."""
+    def _write(range_type, rows):
+        with open(os.path.join(app.SHEET_CSV_DIR, f"{range_type}.csv"), "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+    return _write
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = "admin"
+        session["role"] = "admin"
+    return client
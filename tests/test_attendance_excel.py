@@ -0,0 +1,57 @@
+import datetime
+
+import pytest
+from openpyxl import Workbook
+
+
+@pytest.fixture
+def write_excel_attendance(app, tmp_path, monkeypatch):
+    """Save rows as the attendance workbook load_attendance_from_excel reads."""
+    def _write(rows):
+        workbook = Workbook()
+        for row in rows:
+            workbook.active.append(row)
+        path = tmp_path / "attendance.xlsx"
+        workbook.save(path)
+        monkeypatch.setitem(app.EXCEL_SOURCE.paths, "attendance", str(path))
+    return _write
+
+
+def test_excel_datetime_headers_get_date_iso(app, write_excel_attendance):
+    write_excel_attendance([
+        ["S. No.", "ROLL NO", datetime.datetime(2025, 6, 30), datetime.datetime(2025, 7, 1)],
+        [1, "323UIT001", "P", "A"],
+        [2, "323UIT002", "A", "P"],
+    ])
+
+    app.load_attendance_from_excel(db=app.get_sync_connection())
+
+    cur = app.get_sync_connection().cursor()
+    cur.execute("SELECT rollno, date_iso FROM attendance WHERE date != 'S. No.'")
+    assert sorted(cur.fetchall()) == [
+        ("323UIT001", "2025-06-30"), ("323UIT001", "2025-07-01"),
+        ("323UIT002", "2025-06-30"), ("323UIT002", "2025-07-01"),
+    ]
+    assert app.get_attendance_dates(cur) == ["2025-06-30", "2025-07-01"]
+
+
+def test_summary_matrix_and_prefix_sums_count_the_same_cells(app, write_excel_attendance, monkeypatch):
+    # The Excel import stores NAME as cells too; "X" is an unknown status, blank is no working day
+    write_excel_attendance([
+        ["S. No.", "ROLL NO", "NAME", "2025-07-01", "2025-07-02", "2025-07-03"],
+        [1, "323UIT001", "Asha", "P", "X", "A"],
+        [2, "323UIT002", "Bala", "A", None, "P"],
+    ])
+    app.load_attendance_from_excel(db=app.get_sync_connection())
+    monkeypatch.setattr(app, "ATTENDANCE_MATRIX_ENABLED", True)
+    cur = app.get_sync_connection().cursor()
+
+    summary = app.get_attendance_summary(cur)
+    matrix = app.get_attendance_stats_cached(cur)
+    window = app.attendance_window_stats(app.get_attendance_prefix_sums())
+
+    assert summary["323UIT001"]["total_days"] == 3
+    assert summary["323UIT002"]["total_days"] == 2
+    for rollno, stats in summary.items():
+        assert matrix[rollno] == stats
+        assert window[rollno] == {key: value for key, value in stats.items() if key != "last_date"}
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+SHEET_ID = "attendance-sheet"
+HEADERS = ["S. No.", "ROLL NO", "2025-07-01", "2025-07-02", "2025-07-03"]
+SNAPSHOT = [
+    HEADERS,
+    ["1", "323UIT001", "P", "A", "P"],
+    ["2", "323UIT002", "A", "P"],  # the API drops trailing empty cells
+]
+
+
+class FakeSheetsService:
+    """Answers values().batchGet with canned valueRanges and records the ranges asked for."""
+
+    def __init__(self, value_ranges):
+        self.value_ranges = value_ranges
+        self.requested = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def batchGet(self, spreadsheetId, ranges):
+        self.requested.append((spreadsheetId, ranges))
+        return self
+
+    def execute(self):
+        return {"valueRanges": [{"values": rows} for rows in self.value_ranges]}
+
+
+@pytest.fixture
+def sheets(app, monkeypatch):
+    """Install a fake Sheets service whose batchGet returns (id columns, tail columns)."""
+    monkeypatch.setattr(app, "get_sheet_range", lambda sid, default, range_type: "Sheet1!A:ZZ")
+
+    def _install(id_rows, tail_rows):
+        service = FakeSheetsService([id_rows, tail_rows])
+        monkeypatch.setattr(app, "get_sheets_service", lambda: service)
+        return service
+    return _install
+
+
+def test_incremental_read_stitches_new_columns_onto_snapshot(app, sheets):
+    service = sheets(
+        [["S. No.", "ROLL NO"], ["1", "323UIT001"], ["2", "323UIT002"]],
+        # Re-read tail: the last ATTENDANCE_REFETCH_COLUMNS dates plus a new one
+        [["2025-07-02", "2025-07-03", "2025-07-04"], ["A", "P", "P"], ["P", "", "A"]],
+    )
+
+    stitched = app._fetch_attendance_incremental(SHEET_ID, (2, SNAPSHOT, int(time.time())))
+
+    assert service.requested == [(SHEET_ID, ["Sheet1!A:B", "Sheet1!D:ZZ"])]
+    assert stitched == [
+        HEADERS + ["2025-07-04"],
+        ["1", "323UIT001", "P", "A", "P", "P"],
+        ["2", "323UIT002", "A", "P", "", "A"],
+    ]
+
+
+def test_incremental_read_pads_short_rows(app, sheets):
+    snapshot = [HEADERS, ["1", "323UIT001"], ["2", "323UIT002", "A", "P", "P"]]
+    sheets(
+        [["S. No.", "ROLL NO"], ["", "323UIT001"], ["2", "323UIT002"]],
+        [["2025-07-02", "2025-07-03"], ["A", "P"], ["P", "P"]],
+    )
+
+    stitched = app._fetch_attendance_incremental(SHEET_ID, (2, snapshot, int(time.time())))
+
+    # 323UIT001 had no snapshot cells: its older columns are padded so the tail lines up
+    assert stitched[1] == ["", "323UIT001", "", "A", "P"]
+    assert stitched[2] == ["2", "323UIT002", "A", "P", "P"]
+
+
+def test_new_rollno_falls_back_to_a_full_read(app, sheets, monkeypatch):
+    full_sheet = SNAPSHOT + [["3", "323UIT003", "P", "P", "P"]]
+    sheets(
+        [["S. No.", "ROLL NO"], ["1", "323UIT001"], ["2", "323UIT002"], ["3", "323UIT003"]],
+        [["2025-07-02", "2025-07-03"], ["A", "P"], ["P"], ["P", "P"]],
+    )
+    assert app._fetch_attendance_incremental(SHEET_ID, (2, SNAPSHOT, int(time.time()))) is None
+
+    monkeypatch.setattr(app, "read_sheet_range", lambda sid, default, range_type: full_sheet)
+    db = app.get_sync_connection()
+    with db:
+        app.record_attendance_snapshots(db.cursor(), [(SHEET_ID, SNAPSHOT, None)], {SHEET_ID})
+
+    fetched, full_ids = app.fetch_attendance_ranges([SHEET_ID])
+
+    assert fetched == [(SHEET_ID, full_sheet, None)]
+    assert full_ids == {SHEET_ID}
@@ -0,0 +1,244 @@
+import pytest
+
+DATES = ["2025-07-01", "2025-07-02"]
+
+
+def attendance_grid(statuses, dates=DATES):
+    """Attendance sheet rows for {rollno: [status per date]}."""
+    rows = [["S. No.", "ROLL NO", *dates]]
+    for i, (rollno, row) in enumerate(statuses.items(), start=1):
+        rows.append([str(i), rollno, *row])
+    return rows
+
+
+def stored_cells(app):
+    cur = app.get_sync_connection().cursor()
+    cur.execute("SELECT rollno, date_iso, status_code, status_raw FROM attendance")
+    return {
+        (rollno, date_iso): app.attendance_status_label(code, raw)
+        for rollno, date_iso, code, raw in cur.fetchall()
+    }
+
+
+def expected_cells(statuses, dates=DATES):
+    return {
+        (rollno, date_iso): status
+        for rollno, row in statuses.items()
+        for date_iso, status in zip(dates, row)
+    }
+
+
+def sync(app):
+    return app.load_attendance_from_gsheets(source=app.get_sheet_source(), db=app.get_sync_connection())
+
+
+def test_diff_sync_inserts_updates_and_deletes(app, write_sheet):
+    before = {f"323UIT00{i}": ["P", "A"] for i in range(1, 7)}
+    write_sheet("attendance", attendance_grid(before))
+    sync(app)
+    assert stored_cells(app) == expected_cells(before)
+
+    after = dict(before)
+    after["323UIT001"] = ["A", "A"]
+    del after["323UIT006"]
+    after["323UIT007"] = ["P", "P"]
+    write_sheet("attendance", attendance_grid(after))
+    cur = app.get_sync_connection().cursor()
+    indexes = app._attendance_index_names(cur, "attendance")
+
+    result = sync(app)
+
+    assert (result["inserted"], result["updated"], result["deleted"]) == (2, 1, 2)
+    assert result["changed"] == {"323UIT001", "323UIT006", "323UIT007"}
+    assert result["days"] == set(DATES)
+    assert stored_cells(app) == expected_cells(after)
+    # Written in place, not through a shadow table reload
+    assert app._attendance_index_names(cur, "attendance") == indexes
+
+
+def test_diff_sync_without_changes_leaves_caches_alone(app, write_sheet):
+    statuses = {"323UIT001": ["P", "A"], "323UIT002": ["A", "P"]}
+    write_sheet("attendance", attendance_grid(statuses))
+    sync(app)
+    version = app._attendance_sync_version
+
+    # Same cells under a different serial number column: fetched sheet differs, cells don't
+    rows = attendance_grid(statuses)
+    rows[1][0], rows[2][0] = "9", "8"
+    write_sheet("attendance", rows)
+    result = sync(app)
+
+    assert not result.get("skipped")
+    assert (result["inserted"], result["updated"], result["deleted"]) == (0, 0, 0)
+    assert not app.attendance_diff_changed(result)
+    assert app._attendance_sync_version == version
+
+
+def test_diff_sync_reports_duplicate_cells(app, write_sheet, capsys):
+    rows = attendance_grid({"323UIT001": ["P", "A"], "323UIT002": ["A", "P"]})
+    rows.append(["3", "323UIT001", "A", "A"])
+    write_sheet("attendance", rows)
+
+    result = sync(app)
+
+    assert result["duplicates"] == 2
+    assert "repeat a (roll number, date) pair" in capsys.readouterr().out
+    assert stored_cells(app)[("323UIT001", DATES[0])] == "A"
+
+
+def test_full_reload_swaps_in_shadow_table(app, write_sheet):
+    before = {f"323UIT00{i}": ["P", "A"] for i in range(1, 5)}
+    write_sheet("attendance", attendance_grid(before))
+    sync(app)
+    cur = app.get_sync_connection().cursor()
+    indexes = app._attendance_index_names(cur, "attendance")
+
+    after = {rollno: ["A", "P"] for rollno in before}
+    write_sheet("attendance", attendance_grid(after))
+    result = sync(app)
+
+    assert result["updated"] == 8
+    assert stored_cells(app) == expected_cells(after)
+    # The shadow table was indexed under the other name set and renamed into place
+    swapped = app._attendance_index_names(cur, "attendance")
+    assert swapped != indexes
+    assert any(swapped == set(names) for names in app._ATTENDANCE_INDEX_NAMES)
+    cur.execute("SELECT name FROM sqlite_master WHERE name = 'attendance_next'")
+    assert cur.fetchone() is None
+
+
+def test_failed_full_reload_keeps_live_table(app, write_sheet):
+    statuses = {"323UIT001": ["P", "A"], "323UIT002": ["A", "P"]}
+    write_sheet("attendance", attendance_grid(statuses))
+    sync(app)
+    db = app.get_sync_connection()
+    cells = [
+        (rollno, date_iso, date_iso, app.STATUS_HOLIDAY, None)
+        for rollno in statuses for date_iso in DATES
+    ]
+
+    with pytest.raises(RuntimeError):
+        with app.bulk_import("Attendance reload", db):
+            app.sync_attendance_cells(db.cursor(), cells)
+            raise RuntimeError("refresh failed")
+
+    assert stored_cells(app) == expected_cells(statuses)
+    assert not db.in_transaction
+    cur = db.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE name = 'attendance_next'")
+    assert cur.fetchone() is None
+
+
+def test_failed_write_is_reported_as_a_failed_sync(app, write_sheet, monkeypatch):
+    before = {"323UIT001": ["P", "A"], "323UIT002": ["A", "P"]}
+    write_sheet("attendance", attendance_grid(before))
+    sync(app)
+    job = app._sync_jobs["attendance"]
+    last_success = job["last_success"]
+    version = app._attendance_sync_version
+
+    write_sheet("attendance", attendance_grid({"323UIT001": ["A", "A"], "323UIT002": ["A", "P"]}))
+
+    def fail(cur, days=None):
+        raise RuntimeError("rollup failed")
+    monkeypatch.setattr(app, "refresh_dept_daily_rollup", fail)
+
+    with pytest.raises(RuntimeError, match="rollup failed"):
+        app.run_sync_job("attendance")
+
+    assert job["last_error"] == "rollup failed"
+    assert job["last_success"] == last_success
+    assert app._attendance_sync_version == version
+    assert app.sync_metrics()["recent"][0]["status"] == "error"
+    assert stored_cells(app) == expected_cells(before)
+
+
+def test_diff_sync_refreshes_summary_for_changed_students_only(app, write_sheet, monkeypatch):
+    before = {f"323UIT00{i}": ["P", "P"] for i in range(1, 7)}
+    write_sheet("attendance", attendance_grid(before))
+    sync(app)
+    refreshed = []
+    refresh = app.refresh_attendance_summary
+
+    def record_refresh(cur, rollnos=None):
+        refreshed.append(set(rollnos))
+        refresh(cur, rollnos)
+    monkeypatch.setattr(app, "refresh_attendance_summary", record_refresh)
+
+    after = dict(before)
+    after["323UIT001"] = ["A", "P"]
+    del after["323UIT006"]
+    write_sheet("attendance", attendance_grid(after))
+    sync(app)
+
+    assert refreshed == [{"323UIT001", "323UIT006"}]
+    cur = app.get_sync_connection().cursor()
+    summary = app.get_attendance_summary(cur)
+    assert set(summary) == set(after)
+    assert summary["323UIT001"] == {
+        "total_days": 2, "present_days": 1, "absent_days": 1, "attendance_average": 50.0, "last_date": DATES[-1]
+    }
+    # Matches a from-scratch aggregation
+    for rollno, stats in app.get_attendance_stats(cur).items():
+        assert {key: summary[rollno][key] for key in stats} == stats
+
+
+def rollup_rows(app):
+    cur = app.get_sync_connection().cursor()
+    cur.execute("SELECT dept, day, present, absent, blank FROM dept_daily_rollup ORDER BY dept, day")
+    return cur.fetchall()
+
+
+def test_diff_sync_refreshes_rollup_for_changed_days_only(app, write_sheet, monkeypatch):
+    db = app.get_sync_connection()
+    db.executemany("INSERT INTO students (rollno, current_semester) VALUES (?, 'IT')", [(f"323UIT00{i}",) for i in range(1, 7)])
+    db.commit()
+    before = {f"323UIT00{i}": ["P", "P"] for i in range(1, 7)}
+    write_sheet("attendance", attendance_grid(before))
+    sync(app)
+    refreshed = []
+    refresh = app.refresh_dept_daily_rollup
+
+    def record_refresh(cur, days=None):
+        refreshed.append(days)
+        refresh(cur, days)
+    monkeypatch.setattr(app, "refresh_dept_daily_rollup", record_refresh)
+
+    after = dict(before, **{"323UIT001": ["P", "A"]})
+    write_sheet("attendance", attendance_grid(after))
+    sync(app)
+
+    assert refreshed == [{DATES[1]}]
+    assert rollup_rows(app) == [("IT", DATES[0], 6, 0, 0), ("IT", DATES[1], 5, 1, 0)]
+    incremental = rollup_rows(app)
+    refresh(db.cursor())
+    assert rollup_rows(app) == incremental
+
+
+def test_rollup_follows_roster_changes_and_feeds_the_trend(app, write_sheet):
+    db = app.get_sync_connection()
+    db.executemany(
+        "INSERT INTO students (rollno, current_semester) VALUES (?, ?)",
+        [("323UAM001", "AI & ML"), ("999X001", "CSE")],
+    )
+    db.commit()
+    write_sheet("attendance", attendance_grid({"323UAM001": ["P", "A"], "999X001": ["A", "A"]}))
+    sync(app)
+    assert rollup_rows(app) == [
+        ("AI & ML", DATES[0], 1, 0, 0), ("AI & ML", DATES[1], 0, 1, 0),
+        ("CSE", DATES[0], 0, 1, 0), ("CSE", DATES[1], 0, 1, 0),
+    ]
+
+    # A students import moving 999X001 into IT re-buckets its existing cells
+    write_sheet("students", [["ROLL NO", "NAME", "DEPARTMENT"], ["999X001", "Bala", "IT"]])
+    app.load_students_from_gsheets(source=app.get_sheet_source(), db=db)
+    assert rollup_rows(app) == [
+        ("AI & ML", DATES[0], 1, 0, 0), ("AI & ML", DATES[1], 0, 1, 0),
+        ("IT", DATES[0], 0, 1, 0), ("IT", DATES[1], 0, 1, 0),
+    ]
+
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session["user"], session["role"] = "principal", "principal"
+    series = client.get(f"/principal/attendance_trend?dept=IT&from={DATES[1]}").get_json()["series"]
+    assert series == {"IT": [{"day": DATES[1], "present": 0, "absent": 1, "blank": 0, "attendance_percentage": 0.0}]}
@@ -0,0 +1,43 @@
+DATES = ["2025-07-01", "2025-07-02", "2025-07-03", "2025-07-04"]
+
+
+def add_attendance(app, statuses):
+    """Store {rollno: [status code per DATES entry]} with students in IT / AI & ML."""
+    db = app.get_sync_connection()
+    db.executemany(
+        "INSERT INTO students (rollno, name, current_semester) VALUES (?, ?, ?)",
+        [(rollno, rollno, "AI & ML" if "UAM" in rollno else "IT") for rollno in statuses]
+    )
+    db.executemany(
+        "INSERT INTO attendance (rollno, date, date_iso, status_code) VALUES (?, ?, ?, ?)",
+        [(rollno, date_iso, date_iso, code) for rollno, codes in statuses.items() for date_iso, code in zip(DATES, codes)]
+    )
+    db.commit()
+    app.bump_attendance_sync_version()
+
+
+def test_window_stats_count_only_dates_in_range(app, admin_client):
+    P, A, H = app.STATUS_PRESENT, app.STATUS_ABSENT, app.STATUS_HOLIDAY
+    add_attendance(app, {"323UIT001": [P, A, H, P], "323UAM001": [A, A, P, P]})
+
+    # Any sheet date format is accepted
+    body = admin_client.get("/attendance/stats?from=02-07-2025&to=2025-07-04").get_json()
+
+    assert (body["from"], body["to"], body["days"]) == ("2025-07-02", "2025-07-04", 3)
+    stats = {student["rollno"]: student for student in body["students"]}
+    assert (stats["323UIT001"]["total_days"], stats["323UIT001"]["present_days"]) == (2, 1)
+    assert (stats["323UAM001"]["total_days"], stats["323UAM001"]["present_days"]) == (3, 2)
+    assert stats["323UAM001"]["attendance_average"] == 66.67
+
+
+def test_window_stats_filter_by_department(app, admin_client):
+    add_attendance(app, {"323UIT001": [app.STATUS_PRESENT] * 4, "323UAM001": [app.STATUS_ABSENT] * 4})
+
+    body = admin_client.get("/attendance/stats?dept=AI %26 ML").get_json()
+
+    assert [student["rollno"] for student in body["students"]] == ["323UAM001"]
+    assert body["students"][0]["absent_days"] == 4
+
+
+def test_window_stats_reject_bad_dates(app, admin_client):
+    assert admin_client.get("/attendance/stats?from=not-a-date").status_code == 400
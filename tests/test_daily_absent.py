@@ -0,0 +1,47 @@
+import datetime
+
+TODAY = datetime.date.today()
+
+
+def day(offset):
+    return (TODAY + datetime.timedelta(days=offset)).isoformat()
+
+
+def add_attendance(app, cells):
+    db = app.get_sync_connection()
+    db.executemany("INSERT OR IGNORE INTO students (rollno, name) VALUES (?, ?)", [(r, r) for r, _, _ in cells])
+    db.executemany(
+        "INSERT INTO attendance (rollno, date, date_iso, status_code) VALUES (?, ?, ?, ?)",
+        [(rollno, date_iso, date_iso, code) for rollno, date_iso, code in cells]
+    )
+    db.commit()
+    app.bump_attendance_sync_version()
+
+
+def absent_on_target_date(app):
+    target = app._get_target_attendance_date()
+    cur = app.get_sync_connection().cursor()
+    return target, [row["rollno"] for row in app.resolve_daily_absent(cur, target, include_no_record=False)]
+
+
+def test_target_date_is_latest_date_not_in_the_future(app):
+    add_attendance(app, [
+        ("323UIT001", day(-3), app.STATUS_ABSENT),
+        ("323UIT001", day(-1), app.STATUS_PRESENT),
+        ("323UIT002", day(-1), app.STATUS_ABSENT),
+        ("323UIT002", day(2), app.STATUS_PRESENT),
+    ])
+
+    assert absent_on_target_date(app) == (day(-1), ["323UIT002"])
+
+
+def test_target_date_falls_back_to_latest_future_date(app):
+    add_attendance(app, [("323UIT001", day(1), app.STATUS_ABSENT), ("323UIT001", day(3), app.STATUS_PRESENT)])
+
+    assert absent_on_target_date(app) == (day(3), [])
+
+
+def test_target_date_is_today_without_attendance(app):
+    app.bump_attendance_sync_version()
+
+    assert app._get_target_attendance_date() == TODAY.isoformat()
@@ -0,0 +1,40 @@
+STUDENTS = [
+    ("323UIT001", ""),         # IT by roll number prefix
+    ("999X001", "IT"),         # IT by current_semester
+    ("323UAM001", "AI & ML"),
+    ("999X002", "MECH"),
+]
+
+
+def add_students(app):
+    db = app.get_sync_connection()
+    db.executemany("INSERT INTO students (rollno, current_semester) VALUES (?, ?)", STUDENTS)
+    db.commit()
+
+
+def test_department_filters_counts_and_rollup_agree(app):
+    add_students(app)
+    db = app.get_sync_connection()
+    db.executemany(
+        "INSERT INTO attendance (rollno, date, date_iso, status_code) VALUES (?, '2025-07-01', '2025-07-01', ?)",
+        [(rollno, app.STATUS_PRESENT) for rollno, _ in STUDENTS]
+    )
+    app.refresh_dept_daily_rollup(db.cursor())
+    db.commit()
+    cur = db.cursor()
+    cur.execute("SELECT dept, present FROM dept_daily_rollup")
+    rollup = dict(cur.fetchall())
+
+    for dept in ("IT", "AI & ML", "MECH"):
+        members = {student["rollno"] for student in app.get_department_students(dept)}
+        assert app.count_department_students(cur, dept) == len(members) == rollup[dept]
+    assert {student["rollno"] for student in app.get_department_students("IT")} == {"323UIT001", "999X001"}
+
+
+def test_department_spellings_share_one_filter(app):
+    add_students(app)
+    cur = app.get_sync_connection().cursor()
+
+    assert app.canonical_department("aiml") == "AI & ML"
+    assert app._department_students_where("AIML", alias="") == app._department_students_where("AI & ML", alias="")
+    assert app.count_department_students(cur, "ai & ml") == 1
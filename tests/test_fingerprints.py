@@ -0,0 +1,55 @@
+HEADERS = ["ROLL NO", "NAME", "DEPARTMENT"]
+
+
+def stored_names(app):
+    cur = app.get_sync_connection().cursor()
+    cur.execute("SELECT rollno, name FROM students ORDER BY rollno")
+    return dict(cur.fetchall())
+
+
+def last_run(app):
+    run = app.sync_metrics()["recent"][0]
+    return run["job"], run["status"], run["skip_reason"]
+
+
+def test_unchanged_sheet_is_skipped_and_an_edit_is_imported(app, write_sheet):
+    write_sheet("students", [HEADERS, ["323UIT001", "Asha", "IT"]])
+    app.run_sync_job("students")
+
+    assert app.run_sync_job("students") == {"skipped": True}
+    assert last_run(app) == ("students", "skipped", "unchanged")
+
+    write_sheet("students", [HEADERS, ["323UIT001", "Asha R", "IT"], ["323UIT002", "Bala", "IT"]])
+    result = app.run_sync_job("students")
+
+    assert not (result or {}).get("skipped")
+    assert last_run(app) == ("students", "ok", None)
+    assert stored_names(app) == {"323UIT001": "Asha R", "323UIT002": "Bala"}
+
+
+def test_unchanged_attendance_sheet_is_skipped(app, write_sheet):
+    rows = [["S. No.", "ROLL NO", "2025-07-01"], ["1", "323UIT001", "P"]]
+    write_sheet("attendance", rows)
+    app.run_sync_job("attendance")
+    version = app._attendance_sync_version
+
+    assert app.run_sync_job("attendance")["skipped"]
+    assert app._attendance_sync_version == version
+
+    write_sheet("attendance", rows + [["2", "323UIT002", "A"]])
+    assert not app.run_sync_job("attendance").get("skipped")
+    assert app._attendance_sync_version != version
+
+
+def test_unmodified_sheet_is_skipped_without_fetching(app, write_sheet, monkeypatch):
+    source = app.get_sheet_source()
+    write_sheet("students", [HEADERS, ["323UIT001", "Asha", "IT"]])
+    sheet_id = source.ids("students")[0]
+    monkeypatch.setattr(source, "modified_times", lambda range_type: {sheet_id: "2025-07-01T08:00:00Z"})
+    app.run_sync_job("students")
+
+    fetches = []
+    monkeypatch.setattr(source, "fetch", lambda range_type: fetches.append(range_type))
+    assert app.run_sync_job("students") == {"skipped": True}
+    assert fetches == []
+    assert last_run(app) == ("students", "skipped", "unmodified")
@@ -0,0 +1,60 @@
+import json
+
+HEADERS = ["ROLL NO", "NAME", "DEPARTMENT"]
+
+
+def write_fixture(directory, range_type, sheets):
+    directory.mkdir(exist_ok=True)
+    (directory / f"{range_type}.json").write_text(json.dumps({"range_type": range_type, "sheets": sheets}))
+
+
+def test_fixture_replays_captured_sheets(app, tmp_path):
+    write_fixture(tmp_path, "students", [
+        {"id": "sheet-a", "values": [HEADERS, ["323UIT001", "Asha", "IT"]], "error": None},
+        {"id": "sheet-b", "values": None, "error": "403 forbidden"},
+    ])
+    source = app.FixtureSheetSource(str(tmp_path))
+
+    fetched = source.fetch("students")
+
+    assert source.ids("students") == ["sheet-a", "sheet-b"]
+    assert fetched[0] == ("sheet-a", [HEADERS, ["323UIT001", "Asha", "IT"]], None)
+    assert fetched[1][:2] == ("sheet-b", None) and str(fetched[1][2]) == "403 forbidden"
+    assert source.fetch("attendance") == [] and not source.configured("attendance")
+
+
+def test_replays_are_imported_every_time(app, tmp_path):
+    write_fixture(tmp_path, "students", [{"id": "sheet-a", "values": [HEADERS, ["323UIT001", "Asha", "IT"]]}])
+    source = app.FixtureSheetSource(str(tmp_path))
+    db = app.get_sync_connection()
+
+    app.load_students_from_gsheets(source=source, db=db)
+    result = app.load_students_from_gsheets(source=source, db=db)
+
+    assert not source.use_fingerprints
+    assert not (result or {}).get("skipped")
+    cur = db.cursor()
+    cur.execute("SELECT rollno, name FROM students")
+    assert cur.fetchall() == [("323UIT001", "Asha")]
+
+
+def test_replays_can_keep_fingerprints(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "SHEET_FIXTURE_IGNORE_FINGERPRINTS", False)
+    write_fixture(tmp_path, "students", [{"id": "sheet-a", "values": [HEADERS, ["323UIT001", "Asha", "IT"]]}])
+    source = app.FixtureSheetSource(str(tmp_path))
+
+    app.load_students_from_gsheets(source=source, db=app.get_sync_connection())
+
+    assert app.load_students_from_gsheets(source=source, db=app.get_sync_connection()) == {"skipped": True}
+
+
+def test_recording_captures_what_the_source_fetched(app, tmp_path, write_sheet):
+    write_sheet("students", [HEADERS, ["323UIT001", "Asha", "IT"]])
+    live = app.get_sheet_source()
+    recorder = app.FixtureSheetSource(str(tmp_path / "fx"), record_from=live)
+
+    fetched = recorder.fetch("students")
+
+    assert recorder.use_fingerprints
+    assert fetched == live.fetch("students")
+    assert app.FixtureSheetSource(str(tmp_path / "fx")).fetch("students") == fetched
@@ -0,0 +1,59 @@
+from openpyxl import Workbook
+
+FIELDS = (("rollno", ("ROLL NO", "RollNo")), ("phone", ("MOBILE", "Phone")), ("email", ("EMAIL",)))
+
+
+def test_plan_lists_matching_columns_in_alias_order(app):
+    plan = app.compile_header_plan([" phone ", "Roll No", "x", "Mobile"], FIELDS)
+
+    assert plan == ((1,), (3, 0), ())
+    assert app.compile_header_plan([" phone ", "Roll No", "x", "Mobile"], FIELDS) is plan
+    assert app.compile_header_plan(["Roll No", "ROLL NO"], FIELDS, exact=True) == ((1,), (), ())
+
+
+def test_row_values_fall_through_empty_cells(app):
+    plan = app.compile_header_plan(["phone", "ROLL NO", "MOBILE"], FIELDS)
+
+    assert app.plan_row_values(plan, ["9000000001", " 323UIT001 ", ""]) == ["323UIT001", "9000000001", ""]
+    assert app.plan_row_values(plan, [None, "323UIT002"]) == ["323UIT002", "", ""]
+
+
+def test_student_fields_line_up_with_the_insert_columns(app):
+    fields = [field for field, _ in app.STUDENT_IMPORT_FIELDS]
+
+    assert tuple(fields) == app.STUDENT_INSERT_COLUMNS[:len(fields)]
+    assert [field for field, _ in app.STUDENT_EXCEL_IMPORT_FIELDS] == fields
+    assert fields[app.STUDENT_ROLLNO_FIELD] == "rollno"
+
+
+def test_each_importer_keeps_its_own_aliases(app):
+    headers = ["REG NO", "STUDENT MOBILE", "PHONE", "OWNER", "OWNER PH NO"]
+    row = ["REG001", "9000000001", "9000000002", "9000000003", "9000000004"]
+    fields = [field for field, _ in app.STUDENT_IMPORT_FIELDS]
+
+    def picked(field_aliases):
+        values = app.plan_row_values(app.compile_header_plan(headers, field_aliases), row)
+        return {f: values[fields.index(f)] for f in ("rollno", "student_mobile", "owner_ph_no")}
+
+    assert picked(app.STUDENT_IMPORT_FIELDS) == {
+        "rollno": "", "student_mobile": "9000000001", "owner_ph_no": "9000000003",
+    }
+    # The Excel roster falls back to the register number and prefers its own phone columns
+    assert picked(app.STUDENT_EXCEL_IMPORT_FIELDS) == {
+        "rollno": "REG001", "student_mobile": "9000000002", "owner_ph_no": "9000000004",
+    }
+
+
+def test_excel_roster_without_roll_numbers_imports_by_register_number(app, tmp_path, monkeypatch):
+    workbook = Workbook()
+    workbook.active.append(["REG NO", "NAME", "PHONE"])
+    workbook.active.append(["REG001", "Asha", "9000000002"])
+    path = tmp_path / "students.xlsx"
+    workbook.save(path)
+    monkeypatch.setitem(app.EXCEL_SOURCE.paths, "students", str(path))
+
+    app.load_students_from_excel(db=app.get_sync_connection())
+
+    cur = app.get_sync_connection().cursor()
+    cur.execute("SELECT reg_no, rollno, name, student_mobile FROM students")
+    assert cur.fetchall() == [("REG001", "REG001", "Asha", "9000000002")]
@@ -0,0 +1,152 @@
+import pytest
+
+SHEET_ID = "range-sheet"
+ROWS = [["S. No.", "ROLL NO", "2025-07-01"], ["1", "323UIT001", "P"]]
+
+
+class FakeRequest:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def execute(self):
+        return self.fn()
+
+
+class FakeSheetsService:
+    """A spreadsheet of {tab title: rows} behind spreadsheets().get and values().get/batchGet.
+    Every request is recorded as (method, range or ranges)."""
+
+    def __init__(self, tabs):
+        self.tabs = tabs
+        self.requested = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def _values(self, a1_range):
+        tab, columns = a1_range.split("!", 1)
+        if tab not in self.tabs:
+            raise RuntimeError(f"Unable to parse range: {a1_range}")
+        rows = self.tabs[tab]
+        return rows[:2] if columns == "1:2" else rows
+
+    def get(self, spreadsheetId, fields=None, range=None):
+        if range is None:
+            self.requested.append(("meta", None))
+            return FakeRequest(lambda: {"sheets": [{"properties": {"title": t}} for t in self.tabs]})
+        self.requested.append(("get", range))
+        return FakeRequest(lambda: {"values": self._values(range)})
+
+    def batchGet(self, spreadsheetId, ranges):
+        self.requested.append(("batchGet", list(ranges)))
+        return FakeRequest(lambda: {"valueRanges": [{"values": self._values(r)} for r in ranges]})
+
+
+@pytest.fixture
+def sheets(app, monkeypatch):
+    """Install a fake Sheets service over the given tabs, with no ranges cached for SHEET_ID."""
+    app.invalidate_sheet_range(SHEET_ID)
+
+    def _install(tabs):
+        service = FakeSheetsService(tabs)
+        monkeypatch.setattr(app, "get_sheets_service", lambda: service)
+        return service
+    yield _install
+    app.invalidate_sheet_range(SHEET_ID)
+
+
+def cached_ranges(app):
+    cur = app.get_sync_connection().cursor()
+    cur.execute("SELECT range_type, a1_range FROM sheet_range_cache WHERE spreadsheet_id = ?", (SHEET_ID,))
+    return dict(cur.fetchall())
+
+
+def test_resolved_range_is_cached_for_later_reads(app, sheets):
+    service = sheets({"Notes": [], "attendance": ROWS})
+
+    assert app.read_sheet_range(SHEET_ID, "A:ZZ", "attendance") == ROWS
+    assert service.requested == [("meta", None), ("get", "attendance!1:2"), ("get", "attendance!A:ZZ")]
+    assert cached_ranges(app) == {"": "Notes", "attendance": "attendance!A:ZZ"}
+
+    service.requested.clear()
+    assert app.read_sheet_range(SHEET_ID, "A:ZZ", "attendance") == ROWS
+    assert service.requested == [("get", "attendance!A:ZZ")]
+
+
+def test_bad_cached_range_is_invalidated_and_resolved_again(app, sheets):
+    # The tab the cached range names was renamed since it was resolved
+    app._store_sheet_range(SHEET_ID, "attendance", "Old!A:ZZ")
+    service = sheets({"attendance": ROWS})
+
+    assert app.read_sheet_range(SHEET_ID, "A:ZZ", "attendance") == ROWS
+
+    assert service.requested == [
+        ("get", "Old!A:ZZ"), ("meta", None), ("get", "attendance!1:2"), ("get", "attendance!A:ZZ"),
+    ]
+    assert app._cached_sheet_range(SHEET_ID, "attendance") == "attendance!A:ZZ"
+    assert cached_ranges(app) == {"": "attendance", "attendance": "attendance!A:ZZ"}
+
+
+def test_unresolvable_range_raises_and_is_not_cached(app, sheets):
+    service = sheets({"attendance": ROWS})
+    app._store_sheet_range(SHEET_ID, "attendance", "attendance!A:ZZ")
+    service.tabs = {}  # the whole spreadsheet became unreadable
+
+    with pytest.raises(RuntimeError):
+        app.read_sheet_range(SHEET_ID, "A:ZZ", "attendance")
+
+    # Resolved once more after the cached range failed (no tabs left), then given up on
+    assert [method for method, _ in service.requested] == ["get", "meta", "meta"]
+    assert app._cached_sheet_range(SHEET_ID, "attendance") is None
+
+
+STUDENT_ROWS = [["ROLL NO", "NAME"], ["323UIT001", "Asha"]]
+
+
+@pytest.fixture
+def one_spreadsheet(app, sheets, monkeypatch):
+    """Students and attendance both configured as tabs of SHEET_ID, their ranges cached."""
+    monkeypatch.setattr(app, "_sheet_sources", lambda: {
+        "students": ([SHEET_ID], "A:AZ"), "attendance": ([SHEET_ID], "A:ZZ"), "courses": ([], "A:C"),
+    })
+    monkeypatch.setattr(app, "attendance_incremental_ready", lambda ids: False)
+    service = sheets({"Students": STUDENT_ROWS, "attendance": ROWS})
+    app._store_sheet_range(SHEET_ID, "students", "Students!A:AZ")
+    app._store_sheet_range(SHEET_ID, "attendance", "attendance!A:ZZ")
+    return service
+
+
+def test_fetch_many_reads_all_kinds_in_one_batch(app, one_spreadsheet):
+    fetched = app.GoogleSheetSource().fetch_many(["students", "attendance"])
+
+    assert one_spreadsheet.requested == [("batchGet", ["Students!A:AZ", "attendance!A:ZZ"])]
+    assert fetched == {
+        "students": [(SHEET_ID, STUDENT_ROWS, None)],
+        "attendance": [(SHEET_ID, ROWS, None)],
+    }
+
+
+def test_failed_batch_falls_back_to_reading_each_range(app, one_spreadsheet, monkeypatch):
+    def fail(spreadsheetId, ranges):
+        one_spreadsheet.requested.append(("batchGet", list(ranges)))
+        raise RuntimeError("quota exceeded")
+    monkeypatch.setattr(one_spreadsheet, "batchGet", fail)
+
+    fetched = app.batch_fetch_sheet_ranges(["students", "attendance"])
+
+    assert one_spreadsheet.requested == [
+        ("batchGet", ["Students!A:AZ", "attendance!A:ZZ"]),
+        ("get", "Students!A:AZ"), ("get", "attendance!A:ZZ"),
+    ]
+    assert fetched == {
+        "students": [(SHEET_ID, STUDENT_ROWS, None)],
+        "attendance": [(SHEET_ID, ROWS, None)],
+    }
+
+
+def test_single_kind_is_not_batched(app, one_spreadsheet):
+    assert app.GoogleSheetSource().fetch_many(["students"]) == {}
+    assert one_spreadsheet.requested == []
@@ -0,0 +1,58 @@
+from werkzeug.security import check_password_hash
+
+HEADERS = ["ROLL NO", "NAME", "DEPARTMENT"]
+
+
+def sync_students(app):
+    return app.load_students_from_gsheets(source=app.get_sheet_source(), db=app.get_sync_connection())
+
+
+def stored_students(app):
+    cur = app.get_sync_connection().cursor()
+    cur.execute("SELECT rollno, name, password_plain, password_hash FROM students ORDER BY rollno")
+    return {rollno: (name, plain, hashed) for rollno, name, plain, hashed in cur.fetchall()}
+
+
+def test_new_students_get_generate_password(app, write_sheet, monkeypatch):
+    monkeypatch.setattr(app, "generate_password", lambda: "424242")
+    write_sheet("students", [HEADERS, ["323UIT001", "Asha", "IT"]])
+
+    sync_students(app)
+
+    _name, plain, hashed = stored_students(app)["323UIT001"]
+    assert plain == "424242"
+    assert check_password_hash(hashed, "424242")
+
+
+def test_resync_keeps_passwords_and_writes_only_changed_rows(app, write_sheet, capsys):
+    write_sheet("students", [HEADERS, ["323UIT001", "Asha", "IT"], ["323UIT002", "Bala", "IT"]])
+    sync_students(app)
+    before = stored_students(app)
+
+    write_sheet("students", [
+        HEADERS, ["323UIT001", "Asha", "IT"], ["323UIT002", "Bala K", "IT"], ["323UIT003", "Chitra", "IT"],
+    ])
+    capsys.readouterr()
+    sync_students(app)
+
+    assert "Students sync: 2 of 3 rows inserted or changed" in capsys.readouterr().out
+    after = stored_students(app)
+    assert after["323UIT001"] == before["323UIT001"]
+    assert after["323UIT002"] == ("Bala K", *before["323UIT002"][1:])
+    assert after["323UIT003"][1] and check_password_hash(after["323UIT003"][2], after["323UIT003"][1])
+
+
+def test_resync_without_a_unique_rollno_index_uses_insert_and_update(app, write_sheet, monkeypatch, capsys):
+    write_sheet("students", [HEADERS, ["323UIT001", "Asha", "IT"]])
+    sync_students(app)
+    before = stored_students(app)
+    monkeypatch.setattr(app, "students_rollno_unique", lambda cur: False)
+
+    write_sheet("students", [HEADERS, ["323UIT001", "Asha R", "IT"], ["323UIT002", "Bala", "IT"]])
+    sync_students(app)
+
+    assert "has no unique index" in capsys.readouterr().out
+    after = stored_students(app)
+    assert after["323UIT001"] == ("Asha R", *before["323UIT001"][1:])
+    assert after["323UIT002"][0] == "Bala"
+    assert len(after) == 2
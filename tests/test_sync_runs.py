@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+
+from googleapiclient.http import HttpMockSequence, HttpRequest
+from googleapiclient.model import JsonModel
+
+
+def test_api_execute_counts_response_bytes(app):
+    body = json.dumps({"values": [["ROLL NO"], ["323UIT001"]]})
+    http = HttpMockSequence([({"status": "200"}, body)])
+    request = HttpRequest(http, JsonModel().response, "https://sheets.googleapis.com/v4/spreadsheets/x/values/A:Z")
+
+    with app.sync_run("test") as run:
+        result = app.api_execute(request)
+
+    assert result == {"values": [["ROLL NO"], ["323UIT001"]]}
+    assert run["api_calls"] == 1
+    assert run["bytes_fetched"] == len(body.encode())
+
+
+def test_file_source_run_records_bytes_read(app, write_sheet):
+    write_sheet("students", [["ROLL NO", "NAME", "DEPARTMENT"], ["323UIT001", "Asha", "IT"]])
+
+    app.run_sync_job("students")
+
+    run = app.sync_metrics()["recent"][0]
+    assert (run["job"], run["status"]) == ("students", "ok")
+    assert run["bytes_fetched"] == os.path.getsize(os.path.join(app.SHEET_CSV_DIR, "students.csv"))
+    cur = app.get_sync_connection().cursor()
+    cur.execute("SELECT bytes_fetched FROM sync_runs WHERE job = 'students' ORDER BY id DESC LIMIT 1")
+    assert cur.fetchone()[0] == run["bytes_fetched"]
+
+
+def test_unconfigured_job_records_no_run(app):
+    recorded = len(app.sync_metrics()["recent"])
+
+    assert app.run_sync_job("courses") is None
+
+    assert len(app.sync_metrics()["recent"]) == recorded
+
+
+def test_starting_the_scheduler_does_not_wait_for_a_running_sync(app, monkeypatch):
+    monkeypatch.setattr(app, "SYNC_SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(app, "_sync_scheduler_thread", None)
+    monkeypatch.setattr(app, "_sync_scheduler_loop", lambda: None)
+    starter = threading.Thread(target=app.start_sync_scheduler)
+
+    with app._sync_lock:  # a sync in progress
+        starter.start()
+        starter.join(timeout=5)
+        assert not starter.is_alive()
+
+    assert app._sync_scheduler_thread is not None
+
+
+def test_manual_sync_reports_a_reused_result(app, admin_client, write_sheet, monkeypatch):
+    write_sheet("students", [["ROLL NO", "NAME", "DEPARTMENT"], ["323UIT001", "Asha", "IT"]])
+    monkeypatch.setattr(app, "SYNC_MIN_INTERVAL_SECONDS", 3600)
+
+    first = admin_client.post("/sync_students").get_json()
+    second = admin_client.post("/sync_students").get_json()
+
+    assert (first["outcome"], first["coalesced"]) == ("ran", False)
+    assert (second["outcome"], second["coalesced"]) == ("coalesced", True)
+    assert second["message"].startswith("Students sync not run")
+
+
+def test_sync_status_is_admin_only(app):
+    client = app.app.test_client()
+    assert client.get("/sync/status", headers={"Accept": "application/json"}).status_code == 401
+
+    with client.session_transaction() as session:
+        session["user"], session["role"] = "teacher1", "teacher"
+    assert client.get("/sync/status", headers={"Accept": "application/json"}).status_code == 401
+
+
+def test_sync_status_reports_runs_with_phases(app, admin_client, write_sheet):
+    write_sheet("students", [["ROLL NO", "NAME", "DEPARTMENT"], ["323UIT001", "Asha", "IT"]])
+    app.run_sync_job("students")
+
+    status = admin_client.get("/sync/status?job=students&limit=1").get_json()
+
+    assert status["success"]
+    [run] = status["runs"]
+    assert (run["job"], run["status"], run["rows"]) == ("students", "ok", 1)
+    assert {"fetch", "parse", "hash", "write"} <= set(run["phases"])
+    assert status["averages"]["students"]["runs"] >= 1
+    assert "students" in status["jobs"]